@@ -2,14 +2,28 @@
 from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, InlineQueryHandler, ChosenInlineResultHandler, filters
 from .handlers import start, search, playlist
 from .middlewares.rate_limiter import setup_rate_limiter
+from spotify_service.spotify.warmup import run_warmup_scheduler
+from .services.feature_index import load_feature_index
+from .services.pools import run_pool_scheduler
+from .services.jobs import run_job_workers
+from .services.provisioner import run_playlist_provisioner
 from config import TELEGRAM_BOT_TOKEN
 import logging
 import asyncio
+from functools import partial
 
 logger = logging.getLogger(__name__)
 
+async def on_startup(application: Application) -> None:
+    # Background jobs that live as long as the bot does
+    application.create_task(run_warmup_scheduler())
+    application.create_task(load_feature_index())
+    application.create_task(run_pool_scheduler())
+    application.create_task(run_playlist_provisioner())
+    application.create_task(run_job_workers(partial(playlist.process_playlist_job, application.bot)))
+
 def create_application() -> Application:
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+    application = Application.builder().token(TELEGRAM_BOT_TOKEN).post_init(on_startup).build()
     
     # Initialize the application
     asyncio.get_event_loop().run_until_complete(application.initialize())
@@ -1,15 +1,23 @@
 #local playlist.py
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import CallbackContext
-from ..services.spotify import create_playlist, create_playlist_from_song,sp, create_playlist_from_genre
-from spotify_service.spotify.cache import cached_get_recommendations
+from telegram.error import TelegramError
+from ..services.spotify import (create_playlist_from_song, stream_playlist_from_song, create_playlist_from_genre, get_seed_profile,
+                                create_playlist_from_mood, create_playlist_from_artist, get_artist_profile)
+from ..services.feature_index import feature_index
+from ..services.pools import sample_pool, mood_seed_tracks
+from ..services.jobs import new_job, enqueue_job, JOB_QUEUED, JOB_DUPLICATE
+from ..services.registry import find_generated_playlist, register_generated_playlist
+from ..services.provisioner import publish_playlist, extend_playlist
+from spotify_service.spotify.catalog import get_tracks_metadata
 from logging_config import setup_logging
 from database_service.database.crud import create_playlist_for_database, get_user, create_playlist_tracks_bulk, update_playlist_track_count
 import asyncio
+import time
 from database_service.database import get_db
-from ..utils.language import get_text
-from config import SPOTIFY_USERNAME
+from ..utils.language import get_text, get_user_language
 logger = setup_logging(logstash_host='localhost', logstash_port=5000)
+PROGRESS_EDIT_INTERVAL = 1.0  # Seconds between "tracks added so far" edits; batches arriving faster are skipped
 
 async def create_playlist_from_inline(update: Update, context: CallbackContext) -> None:
     chosen_result = update.chosen_inline_result
@@ -24,80 +32,184 @@ async def create_playlist_from_inline(update: Update, context: CallbackContext)
                                    reply_markup=reply_markup)
 async def create_playlist_async(name, tracks):
     try:
-        playlist = await asyncio.to_thread(sp.user_playlist_create, SPOTIFY_USERNAME, name, public=True, description="Created by @AR_MUSICLAND_BOT")
-        await asyncio.to_thread(sp.playlist_add_items, playlist['id'], tracks)
-        logger.info(f"Playlist successfully created: {playlist['external_urls']['spotify']}")
-        return playlist['external_urls']['spotify']
+        # Claims a pre-created playlist when the provisioner has one ready
+        playlist_link = await publish_playlist(name, tracks)
+        logger.info(f"Playlist successfully created: {playlist_link}")
+        return playlist_link
     except Exception as e:
         logger.error(f"Error in create_playlist_async: {str(e)}")
         raise
-async def create_playlist_with_count(update: Update, context: CallbackContext, track_count: int, callback_data: str):
-    data_type, data_id = callback_data.split('_', 1)
+async def extend_playlist_async(playlist_link, tracks):
     try:
-        db = next(get_db())
-        user = await asyncio.to_thread(get_user, db, update.effective_user.id)
-        
-        if data_type == 'mood':
-            mood = data_id
-            results = sp.search(q=mood, type='track', limit=5)
-            seed_tracks = [track['id'] for track in results['tracks']['items'][:5]]
-            recommendations = await cached_get_recommendations(','.join(seed_tracks), limit=track_count)
-            track_uris = [track['uri'] for track in recommendations['tracks']]
-            playlist_name = f"{mood.capitalize()} Mood Playlist ({track_count} tracks)"
-        elif data_type == 'genre':
-            genre = data_id
-            track_uris = await create_playlist_from_genre(genre, target_count=track_count)
-            playlist_name = f"{genre.capitalize()} Genre Playlist ({track_count} tracks)"
-        elif data_type in ['song', 'track']:
-            track_uris = await create_playlist_from_song(data_id, target_count=track_count)
-            track = sp.track(data_id)
-            playlist_name = f"Playlist inspired by {track['name']} ({track_count} tracks)"
-        elif data_type == 'artist':
-            artist = sp.artist(data_id)
-            recommendations = sp.recommendations(seed_artists=[data_id], limit=track_count)
-            track_uris = [track['uri'] for track in recommendations['tracks']]
-            playlist_name = f"Playlist inspired by {artist['name']} ({track_count} tracks)"
-        
-        playlist_link = await create_playlist_async(playlist_name, track_uris)
-        
-        db_playlist = await asyncio.to_thread(create_playlist_for_database, db, user.id, playlist_link, playlist_name, f"Created by @AR_MUSICLAND_BOT", created_by=user.username, mood=mood if data_type == 'mood' else None)
-        # Fetch track details in bulk
-        tracks_info = await asyncio.to_thread(sp.tracks, [uri.split(':')[-1] for uri in track_uris])
-        logger.debug(f"Tracks info: {tracks_info}")
+        await extend_playlist(playlist_link, tracks)
+    except Exception as e:
+        logger.error(f"Error in extend_playlist_async: {str(e)}")
+        raise
+async def generate_playlist(data_type: str, data_id: str, track_count: int, fresh: bool = False):
+    """Pick the tracks for a playlist; returns (playlist_name, track_uris). `fresh` asks for a new variant."""
+    if data_type == 'mood':
+        mood = data_id
+        # Served from the precomputed mood pool; while it is still filling, its best matches seed live recommendations
+        track_uris = await sample_pool('mood', mood, track_count)
+        if track_uris is None:
+            track_uris = await create_playlist_from_mood(mood, target_count=track_count, seed_tracks=await mood_seed_tracks(mood))
+        playlist_name = f"{mood.capitalize()} Mood Playlist ({track_count} tracks)"
+    elif data_type == 'genre':
+        genre = data_id
+        track_uris = await sample_pool('genre', genre, track_count) or await create_playlist_from_genre(genre, target_count=track_count)
+        playlist_name = f"{genre.capitalize()} Genre Playlist ({track_count} tracks)"
+    elif data_type in ['song', 'track']:
+        track_uris = await create_playlist_from_song(data_id, target_count=track_count, fresh=fresh)
+        # Cached by create_playlist_from_song, so this costs no Spotify call
+        profile = await get_seed_profile(data_id)
+        playlist_name = f"Playlist inspired by {profile['name']} ({track_count} tracks)"
+    elif data_type == 'artist':
+        track_uris = await create_playlist_from_artist(data_id, target_count=track_count)
+        # Cached by create_playlist_from_artist, so this costs no Spotify call
+        artist = await get_artist_profile(data_id)
+        playlist_name = f"Playlist inspired by {artist['name']} ({track_count} tracks)"
+    else:
+        raise ValueError(f"Unknown playlist type {data_type}")
+    return playlist_name, track_uris
+
+async def stream_playlist(data_type: str, data_id: str, track_count: int, fresh: bool = False):
+    """Yield (playlist_name, track_uris) batches as tracks are picked; only song playlists come in several batches."""
+    if data_type in ['song', 'track']:
+        async for track_uris in stream_playlist_from_song(data_id, target_count=track_count, fresh=fresh):
+            # Cached by stream_playlist_from_song, so this costs no Spotify call
+            profile = await get_seed_profile(data_id)
+            yield f"Playlist inspired by {profile['name']} ({track_count} tracks)", track_uris
+    else:
+        yield await generate_playlist(data_type, data_id, track_count, fresh=fresh)
+
+async def save_playlist(telegram_user_id: int, data_type: str, data_id: str, playlist_name: str, playlist_link: str, track_uris):
+    db = next(get_db())
+    user = await asyncio.to_thread(get_user, db, telegram_user_id)
+    db_playlist = await asyncio.to_thread(create_playlist_for_database, db, user.id, playlist_link, playlist_name, f"Created by @AR_MUSICLAND_BOT", created_by=user.username, mood=data_id if data_type == 'mood' else None, genre=data_id if data_type == 'genre' else None)
+    # Fetch track details from the shared track catalog; only unseen tracks hit Spotify
+    track_ids = [uri.split(':')[-1] for uri in track_uris]
+    tracks_metadata = await get_tracks_metadata(track_ids)
+    logger.debug(f"Track metadata found for {len(tracks_metadata)}/{len(track_ids)} tracks")
+    feature_index.set_popularity({track_id: track.get('popularity') for track_id, track in tracks_metadata.items()})
+    
+    # Prepare bulk insert data with error handling
+    tracks_data = []
+    for track_id in track_ids:
+        try:
+            track = tracks_metadata[track_id]
+            tracks_data.append({
+                'playlist_id': db_playlist.spotify_playlist_id,
+                'spotify_track_id': track['id'],
+                'name': track['name'],
+                'artist': track['artist'],
+                'album': track['album'],
+                'duration_ms': track['duration_ms']
+            })
+        except (KeyError, TypeError, IndexError) as e:
+            logger.warning(f"Error processing track: {str(e)}")
+            continue
+    
+    # Bulk insert tracks
+    await asyncio.to_thread(create_playlist_tracks_bulk, db, tracks_data)
+    
+    # Update playlist track count
+    await asyncio.to_thread(update_playlist_track_count, db, db_playlist.spotify_playlist_id, len(tracks_data))
+    return db_playlist.spotify_playlist_id
+
+def playlist_ready_message(context, data_type, data_id, playlist_name, playlist_link):
+    response = get_text(context, 'playlist_created').format(playlist_name, playlist_link)
+    keyboard = [
+        [InlineKeyboardButton("Create Another Playlist", callback_data=f"create_another_{data_type}_{data_id}")],
+        [InlineKeyboardButton("Explore More Music", callback_data='menu')]
+    ]
+    return response, InlineKeyboardMarkup(keyboard)
+
+async def edit_job_message(bot, job, text, reply_markup=None):
+    # Inline-mode messages only have an inline_message_id. A failed edit (flood control, deleted message, ...)
+    # only costs the user a status update, so it never fails the job
+    target = {'inline_message_id': job['inline_message_id']} if job.get('inline_message_id') else {'chat_id': job['chat_id'], 'message_id': job['message_id']}
+    try:
+        await bot.edit_message_text(text=text, reply_markup=reply_markup, **target)
+    except TelegramError as e:
+        logger.warning(f"Could not update playlist message for job {job['id']}: {str(e)}")
+
+async def process_playlist_job(bot, job):
+    """Build, publish and save one queued playlist, editing the requesting message as it goes."""
+    context = {'language': job.get('language', 'en')}
+    data_type, data_id, track_count = job['data_type'], job['data_id'], job['track_count']
+    try:
+        # An identical job may have finished while this one was queued
+        existing = None if job.get('fresh') else await find_generated_playlist(data_type, data_id, track_count)
+        if existing:
+            await edit_job_message(bot, job, *playlist_ready_message(context, data_type, data_id, existing['name'], existing['link']))
+            return
         
-        # Prepare bulk insert data with error handling
-        tracks_data = []
-        for track in tracks_info['tracks']:
-            try:
-                tracks_data.append({
-                    'playlist_id': db_playlist.spotify_playlist_id,
-                    'spotify_track_id': track['id'],
-                    'name': track['name'],
-                    'artist': track['artists'][0]['name'] if track['artists'] else 'Unknown Artist',
-                    'album': track['album']['name'] if track['album'] else 'Unknown Album',
-                    'duration_ms': track['duration_ms']
-                })
-            except (KeyError, TypeError, IndexError) as e:
-                logger.warning(f"Error processing track: {str(e)}")
+        await edit_job_message(bot, job, get_text(context, 'playlist_progress_tracks'))
+        # The playlist goes up with the first batch; later batches are appended while the user can already open it
+        playlist_link, track_uris = None, []
+        last_progress_edit = 0.0
+        async for playlist_name, batch in stream_playlist(data_type, data_id, track_count, fresh=job.get('fresh', False)):
+            if not batch:
                 continue
+            if playlist_link is None:
+                await edit_job_message(bot, job, get_text(context, 'playlist_progress_spotify'))
+                playlist_link = await create_playlist_async(playlist_name, batch)
+            else:
+                await extend_playlist_async(playlist_link, batch)
+            track_uris += batch
+            if len(track_uris) < track_count and time.monotonic() - last_progress_edit >= PROGRESS_EDIT_INTERVAL:
+                last_progress_edit = time.monotonic()
+                await edit_job_message(bot, job, get_text(context, 'playlist_progress_streaming').format(playlist_link, len(track_uris), track_count))
+        if not track_uris:
+            raise ValueError(f"No tracks generated for {data_type} {data_id}")
         
-        # Bulk insert tracks
-        await asyncio.to_thread(create_playlist_tracks_bulk, db, tracks_data)
+        await edit_job_message(bot, job, get_text(context, 'playlist_progress_saving'))
+        playlist_id = await save_playlist(job['user_id'], data_type, data_id, playlist_name, playlist_link, track_uris)
+        # Only a complete playlist is handed out again; a short one would be served for the whole freshness window
+        if len(track_uris) >= track_count:
+            await register_generated_playlist(data_type, data_id, track_count, playlist_name, playlist_link, playlist_id)
         
-        # Update playlist track count
-        await asyncio.to_thread(update_playlist_track_count, db, db_playlist.spotify_playlist_id, len(tracks_data))
-        
-        response = get_text(context, 'playlist_created').format(playlist_name, playlist_link)
+        await edit_job_message(bot, job, *playlist_ready_message(context, data_type, data_id, playlist_name, playlist_link))
+    except Exception:
+        response = "Oops! We encountered an issue while crafting your perfect playlist. Let's try again!"
+        reply_markup = InlineKeyboardMarkup([[InlineKeyboardButton("Back to Menu", callback_data='menu')]])
+        await edit_job_message(bot, job, response, reply_markup)
+        raise
 
-        keyboard = [
-            [InlineKeyboardButton("Create Another Playlist", callback_data=f"create_playlist_{data_type}_{data_id}")],
-            [InlineKeyboardButton("Explore More Music", callback_data='menu')]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await update.callback_query.edit_message_text(text=response, reply_markup=reply_markup)
+async def create_playlist_with_count(update: Update, context: CallbackContext, track_count: int, callback_data: str, fresh: bool = False):
+    # Generation runs on the job workers; the handler only queues it and tells the user
+    data_type, data_id = callback_data.split('_', 1)
+    query = update.callback_query
+    # The same request within the freshness window gets the playlist already built, unless a new variant was asked for
+    existing = None if fresh else await find_generated_playlist(data_type, data_id, track_count)
+    if existing:
+        response, reply_markup = playlist_ready_message(context, data_type, data_id, existing['name'], existing['link'])
+        await query.edit_message_text(text=response, reply_markup=reply_markup)
+        return
     
+    job = new_job(update.effective_user.id, f"{data_type}:{data_id}:{track_count}",
+                  chat_id=query.message.chat_id if query.message else None,
+                  message_id=query.message.message_id if query.message else None,
+                  inline_message_id=query.inline_message_id,
+                  data_type=data_type, data_id=data_id, track_count=track_count, fresh=fresh,
+                  language=get_user_language(context))
+    # Said before the job is pushed, so a fast worker's final message can't be overwritten by it
+    try:
+        await query.edit_message_text(text=get_text(context, 'playlist_queued'))
+    except TelegramError as e:
+        logger.warning(f"Could not show queued message: {str(e)}")
+    try:
+        status, _ = await enqueue_job(job)
     except Exception as e:
-        logger.error(f"Error creating playlist: {str(e)}", exc_info=True)
-        response = "Oops! We encountered an issue while crafting your perfect playlist. Let's try again!"
+        # No queue without Redis; build the playlist right here instead
+        logger.error(f"Error queueing playlist job, running it inline: {str(e)}")
+        try:
+            await process_playlist_job(context.bot, job)
+        except Exception as e:
+            logger.error(f"Error creating playlist: {str(e)}", exc_info=True)
+        return
+    
+    if status != JOB_QUEUED:
+        text_key = 'playlist_job_duplicate' if status == JOB_DUPLICATE else 'playlist_job_limit'
         reply_markup = InlineKeyboardMarkup([[InlineKeyboardButton("Back to Menu", callback_data='menu')]])
-        await update.callback_query.edit_message_text(text=response, reply_markup=reply_markup)
\ No newline at end of file
+        await query.edit_message_text(text=get_text(context, text_key), reply_markup=reply_markup)
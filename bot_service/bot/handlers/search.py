@@ -4,7 +4,9 @@ from telegram.error import BadRequest
 from ..utils.helpers import check_membership
 from logging_config import setup_logging
 from spotify_service.spotify.cache import cached_spotify_search
+from spotify_service.spotify.catalog import store_tracks_metadata
 from ..utils.language import get_text
+from ..services.genre import SPOTIFY_GENRES, MOOD_PROFILES
 import asyncio
 
 logger = setup_logging(logstash_host='localhost', logstash_port=5000)
@@ -13,7 +15,7 @@ async def genre_command(update: Update, context: CallbackContext) -> None:
     await update.message.reply_text("To search for a genre, type '@AR_MUSICLAND_BOT genre:' followed by the genre name in any chat. For example: @AR_MUSICLAND_BOT genre: rock")
 
 async def mood_command(update: Update, context: CallbackContext) -> None:
-    moods = ["Happy", "Sad", "Energetic", "Calm", "Romantic", "Angry"]
+    moods = [mood.capitalize() for mood in MOOD_PROFILES]
     keyboard = [[InlineKeyboardButton(mood, callback_data=f'mood_{mood.lower()}')] for mood in moods]
     reply_markup = InlineKeyboardMarkup(keyboard)
     message_text = "Please choose a mood:"
@@ -53,6 +55,8 @@ async def inline_search(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
             track_query = query[4:].strip()
             if track_query:
                 track_results = await cached_spotify_search(track_query, 'track', 10)
+                # A tapped result becomes a playlist seed; its metadata is then already in the catalog
+                asyncio.create_task(store_tracks_metadata(track_results['tracks']['items']))
                 results = [
                     InlineQueryResultArticle(
                         id=f"track_{track['id']}",
@@ -80,7 +84,6 @@ async def inline_search(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
                     for artist in artist_results['artists']['items']
                 ]
         elif query.startswith("genre:"):
-            from .start import SPOTIFY_GENRES
             genre_query = query[6:].strip().lower()
             filtered_genres = [genre for genre in SPOTIFY_GENRES if genre_query in genre.lower()]
             
@@ -6,6 +6,7 @@ from logging_config import setup_logging
 from .search import mood_command
 from ..utils.language import get_text, set_user_language
 from .playlist import create_playlist_with_count
+from ..services.genre import SPOTIFY_GENRES
 from database_service.database import get_db
 from database_service.database.crud import get_user, create_user, update_user_language
 import asyncio
@@ -139,12 +140,14 @@ async def button(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         mood = query.data.split('_')[1]
         await ask_track_count(update, context, f"mood_{mood}")
         
-    elif query.data.startswith(('50_', '100_')):
-        parts = query.data.split('_')
+    elif query.data.startswith(('50_', '100_', 'new_')):
+        # new_{count}_... asks for a fresh variant instead of a recently generated playlist
+        fresh = query.data.startswith('new_')
+        parts = query.data.split('_')[1:] if fresh else query.data.split('_')
         count = int(parts[0])
         data_type = parts[1]
         item_id = '_'.join(parts[2:])
-        await create_playlist_with_count(update, context, count, f"{data_type}_{item_id}")
+        await create_playlist_with_count(update, context, count, f"{data_type}_{item_id}", fresh=fresh)
     elif query.data == 'change_language':
         await show_language_menu(update, context)
     elif query.data == 'menu':
@@ -158,6 +161,12 @@ async def button(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         data_type = parts[2]
         item_id = '_'.join(parts[3:])
         await ask_track_count(update, context, f"{data_type}_{item_id}")
+    elif query.data.startswith('create_another_'):
+        # Pressed under a finished playlist, so the user wants a new variant rather than the same one again
+        parts = query.data.split('_')
+        data_type = parts[2]
+        item_id = '_'.join(parts[3:])
+        await ask_track_count(update, context, f"{data_type}_{item_id}", fresh=True)
     elif query.data == 'genre':
         await show_genre_buttons(update, context)
     elif query.data.startswith('genre_page_'):
@@ -169,26 +178,6 @@ async def button(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     else:
         await show_main_menu(update, context)
         
-SPOTIFY_GENRES = [
-    "acoustic", "afrobeat", "alt-rock", "alternative", "ambient", "anime", "black-metal",
-    "bluegrass", "blues", "bossanova", "brazil", "breakbeat", "british", "cantopop",
-    "chicago-house", "children", "chill", "classical", "club", "comedy", "country",
-    "dance", "dancehall", "death-metal", "deep-house", "detroit-techno", "disco", "disney",
-    "drum-and-bass", "dub", "dubstep", "edm", "electro", "electronic", "emo", "folk",
-    "forro", "french", "funk", "garage", "german", "gospel", "goth", "grindcore", "groove",
-    "grunge", "guitar", "happy", "hard-rock", "hardcore", "hardstyle", "heavy-metal",
-    "hip-hop", "holidays", "honky-tonk", "house", "idm", "indian", "indie", "indie-pop",
-    "industrial", "iranian", "j-dance", "j-idol", "j-pop", "j-rock", "jazz", "k-pop", "kids",
-    "latin", "latino", "malay", "mandopop", "metal", "metal-misc", "metalcore",
-    "minimal-techno", "movies", "mpb", "new-age", "new-release", "opera", "pagode",
-    "party", "philippines-opm", "piano", "pop", "pop-film", "post-dubstep", "power-pop",
-    "progressive-house", "psych-rock", "punk", "punk-rock", "r-n-b", "rainy-day", "reggae",
-    "reggaeton", "road-trip", "rock", "rock-n-roll", "rockabilly", "romance", "sad", "salsa",
-    "samba", "sertanejo", "show-tunes", "singer-songwriter", "ska", "sleep", "songwriter",
-    "soul", "soundtracks", "spanish", "study", "summer", "swedish", "synth-pop", "tango",
-    "techno", "trance", "trip-hop", "turkish", "work-out", "world-music"
-]
-
 GENRES_PER_PAGE = 15
 
 async def show_genre_buttons(update: Update, context: ContextTypes.DEFAULT_TYPE, page: int = 0, search_query: str = None) -> None:
@@ -274,10 +263,11 @@ async def show_search_option(update: Update, context: CallbackContext, search_ty
     reply_markup = InlineKeyboardMarkup(keyboard)
     await update.callback_query.edit_message_text(text=text, reply_markup=reply_markup)
 
-async def ask_track_count(update: Update, context: CallbackContext, callback_data):
+async def ask_track_count(update: Update, context: CallbackContext, callback_data, fresh=False):
+    prefix = "new_" if fresh else ""
     keyboard = [
-        [InlineKeyboardButton("50 tracks", callback_data=f"50_{callback_data}"),
-         InlineKeyboardButton("100 tracks", callback_data=f"100_{callback_data}")]
+        [InlineKeyboardButton("50 tracks", callback_data=f"{prefix}50_{callback_data}"),
+         InlineKeyboardButton("100 tracks", callback_data=f"{prefix}100_{callback_data}")]
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
     await update.callback_query.edit_message_text(get_text(context, 'ask_track_count'), reply_markup=reply_markup)
@@ -0,0 +1,131 @@
+#candidates.py
+import random
+import time
+from typing import Dict, Iterable, List, Mapping, Optional
+import numpy as np
+from spotify_service.spotify.codec import encode, decode, Tombstone
+from spotify_service.spotify.redis_client import get_binary_redis_client
+from logging_config import setup_logging
+from .ranking import FEATURE_NAMES, feature_matrix, similarities, mmr_select
+from .feature_index import feature_index
+
+logger = setup_logging(logstash_host='localhost', logstash_port=5000)
+
+SEED_POOL_PREFIX = "seed_candidates"  # seed_candidates:{type}:{id} -> {'ids', 'vectors'}
+SEED_POOL_SIZE = 500
+SEED_POOL_TTL = 6 * 3600
+SEED_POOL_SAMPLE_RATIO = 2  # Candidates drawn per playlist slot before re-ranking, so each variant differs
+SERVED_HISTORY_MAX = 2000  # Tracks remembered as served per seed; the oldest are forgotten first
+
+# Claim the first ARGV[2] candidates no concurrent draw has served yet, in order, or none at all.
+# KEYS[1]: served sorted set (track id -> time served); ARGV: now, count, history cap, ttl, candidates...
+# Returns the 0-based positions of the claimed candidates.
+CLAIM_SCRIPT = """
+local count = tonumber(ARGV[2])
+local claimed = {}
+for i = 5, #ARGV do
+    if redis.call('ZADD', KEYS[1], 'NX', ARGV[1], ARGV[i]) == 1 then
+        claimed[#claimed + 1] = i - 5
+        if #claimed == count then
+            break
+        end
+    end
+end
+if #claimed < count then
+    for _, position in ipairs(claimed) do
+        redis.call('ZREM', KEYS[1], ARGV[position + 5])
+    end
+    return {}
+end
+redis.call('ZREMRANGEBYRANK', KEYS[1], 0, -tonumber(ARGV[3]) - 1)
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return claimed
+"""
+
+seed_pool_stats = {'stored': 0, 'variants': 0, 'dry': 0}
+
+
+def seed_pool_key(seed_key: str) -> str:
+    return f"{SEED_POOL_PREFIX}:{seed_key}"
+
+
+def served_key(seed_key: str) -> str:
+    return f"{SEED_POOL_PREFIX}:{seed_key}:served"
+
+
+def _pool(raw: Optional[bytes]) -> Optional[dict]:
+    decoded = decode(raw)
+    if decoded is None or isinstance(decoded[0], Tombstone):
+        return None
+    return decoded[0]
+
+
+async def remember_candidates(seed_key: str, candidate_ids: Iterable[str], served_ids: Iterable[str]) -> None:
+    """Keep a generation's candidates and their feature vectors so later variants need no recommendation calls.
+
+    Vectors come from the feature index, which ranking has just filled. Served
+    tracks join the seed's served history, which outlives any one pool, so
+    variants keep avoiding them.
+    """
+    try:
+        ids, vectors = feature_index.vectors(list(dict.fromkeys(candidate_ids))[:SEED_POOL_SIZE])
+        if not ids:
+            return
+        redis = await get_binary_redis_client()
+        pool = {'ids': ids, 'vectors': vectors.astype(np.float32).tobytes()}
+        now = time.time()
+        pipe = redis.pipeline(transaction=False)
+        pipe.setex(seed_pool_key(seed_key), SEED_POOL_TTL, encode(pool))
+        served = {track_id: now for track_id in served_ids}
+        if served:
+            pipe.zadd(served_key(seed_key), served)
+            pipe.zremrangebyrank(served_key(seed_key), 0, -SERVED_HISTORY_MAX - 1)
+        pipe.expire(served_key(seed_key), SEED_POOL_TTL)
+        await pipe.execute()
+        seed_pool_stats['stored'] += 1
+    except Exception as e:
+        logger.error(f"Error storing candidate pool for {seed_key}: {str(e)}")
+
+
+async def draw_variant(seed_key: str, seed_features: Mapping[str, float], count: int) -> Optional[List[str]]:
+    """A new playlist from the seed's candidate pool, or None once too few unserved candidates are left.
+
+    The variant is claimed in the served history by one script, so concurrent
+    draws for the same seed never hand out the same track; a pick another draw
+    claimed first is replaced by the next most relevant candidate of the sample.
+    """
+    try:
+        redis = await get_binary_redis_client()
+        pipe = redis.pipeline(transaction=False)
+        pipe.get(seed_pool_key(seed_key))
+        pipe.zrange(served_key(seed_key), 0, -1)
+        raw, served = await pipe.execute()
+        pool = _pool(raw)
+        if pool is None:
+            return None
+        served = {track_id.decode() if isinstance(track_id, bytes) else track_id for track_id in served}
+        available = [i for i, track_id in enumerate(pool['ids']) if track_id not in served]
+        if len(available) < count:
+            seed_pool_stats['dry'] += 1
+            return None
+        vectors = np.frombuffer(pool['vectors'], dtype=np.float32).reshape(len(pool['ids']), len(FEATURE_NAMES))
+        sample = np.array(random.sample(available, min(len(available), count * SEED_POOL_SAMPLE_RATIO)))
+        relevance = similarities(feature_matrix([seed_features]), vectors[sample])[0]
+        picks = mmr_select(relevance, vectors[sample], count)
+        picked = set(picks.tolist())
+        backups = [i for i in np.argsort(-relevance, kind='stable') if i not in picked]
+        ordered = [pool['ids'][sample[i]] for i in list(picks) + backups]
+        claimed = await redis.eval(CLAIM_SCRIPT, 1, served_key(seed_key), time.time(), count,
+                                   SERVED_HISTORY_MAX, SEED_POOL_TTL, *ordered)
+        if not claimed:
+            seed_pool_stats['dry'] += 1
+            return None
+        seed_pool_stats['variants'] += 1
+        return [ordered[int(position)] for position in claimed]
+    except Exception as e:
+        logger.error(f"Error drawing a variant for {seed_key}: {str(e)}")
+        return None
+
+
+def get_seed_pool_stats() -> Dict[str, int]:
+    return dict(seed_pool_stats)
@@ -0,0 +1,153 @@
+#feature_index.py
+import asyncio
+from typing import Dict, Iterable, List, Mapping, Optional, Set, Tuple
+import numpy as np
+from spotify_service.spotify.codec import decode, Tombstone
+from spotify_service.spotify.catalog import AUDIO_FEATURE_PREFIX, TRACK_META_PREFIX
+from spotify_service.spotify.redis_client import get_binary_redis_client
+from logging_config import setup_logging
+from .ranking import FEATURE_NAMES, feature_matrix, similarities, top_k
+
+logger = setup_logging(logstash_host='localhost', logstash_port=5000)
+
+FEATURE_INDEX_MAX_TRACKS = 200000  # ~5.6 MB of float32 vectors
+FEATURE_INDEX_INITIAL_CAPACITY = 4096
+FEATURE_INDEX_SCAN_BATCH = 1000
+UNKNOWN_POPULARITY = -1
+
+
+class FeatureIndex:
+    """In-memory nearest-neighbour index over cached audio-feature vectors.
+
+    Rows are appended (or overwritten) as features arrive, so the index never
+    needs a full rebuild. Popularity and genre tags are optional per track and
+    only used for filtering; tracks without them never match those filters.
+    Queries are brute force over one float32 matrix, which stays in the
+    low milliseconds at the size the index is capped to.
+    """
+
+    def __init__(self, max_tracks: int = FEATURE_INDEX_MAX_TRACKS, capacity: int = FEATURE_INDEX_INITIAL_CAPACITY):
+        self.max_tracks = max_tracks
+        self._ids: List[str] = []
+        self._positions: Dict[str, int] = {}
+        self._matrix = np.zeros((capacity, len(FEATURE_NAMES)), dtype=np.float32)
+        self._popularity = np.full(capacity, UNKNOWN_POPULARITY, dtype=np.int16)
+        self._genres: Dict[str, Set[str]] = {}  # Track ids, so tags may arrive before the features do
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, track_id: str) -> bool:
+        return track_id in self._positions
+
+    def _grow(self, needed: int) -> None:
+        capacity = self._matrix.shape[0]
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        matrix = np.zeros((capacity, len(FEATURE_NAMES)), dtype=np.float32)
+        matrix[:len(self._ids)] = self._matrix[:len(self._ids)]
+        popularity = np.full(capacity, UNKNOWN_POPULARITY, dtype=np.int16)
+        popularity[:len(self._ids)] = self._popularity[:len(self._ids)]
+        self._matrix, self._popularity = matrix, popularity
+
+    def add(self, features: Mapping[str, Optional[Mapping[str, float]]]) -> int:
+        """Add or update feature vectors by track id; returns how many were new."""
+        features = {track_id: feature for track_id, feature in features.items() if feature}
+        new_ids = [track_id for track_id in features if track_id not in self._positions]
+        new_ids = new_ids[:max(0, self.max_tracks - len(self._ids))]
+        self._grow(len(self._ids) + len(new_ids))
+        for track_id in new_ids:
+            self._positions[track_id] = len(self._ids)
+            self._ids.append(track_id)
+        track_ids = [track_id for track_id in features if track_id in self._positions]
+        if track_ids:
+            rows = [self._positions[track_id] for track_id in track_ids]
+            self._matrix[rows] = feature_matrix([features[track_id] for track_id in track_ids])
+        return len(new_ids)
+
+    def set_popularity(self, popularity: Mapping[str, Optional[int]]) -> None:
+        for track_id, value in popularity.items():
+            position = self._positions.get(track_id)
+            if position is not None and value is not None:
+                self._popularity[position] = value
+
+    def tag(self, track_ids: Iterable[str], genres: Iterable[str]) -> None:
+        """Mark tracks as belonging to `genres` (e.g. they were recommended for those genres)."""
+        track_ids = set(track_ids)
+        for genre in genres:
+            self._genres.setdefault(genre, set()).update(track_ids)
+
+    def nearest(self, seed_features: Mapping[str, float], k: int, exclude: Iterable[str] = (),
+                genres: Optional[Iterable[str]] = None, min_popularity: Optional[int] = None,
+                max_popularity: Optional[int] = None) -> List[str]:
+        """Ids of the k indexed tracks most similar to the seed that pass every given filter."""
+        size = len(self._ids)
+        if size == 0 or k <= 0 or not seed_features:
+            return []
+        scores = similarities(feature_matrix([seed_features]), self._matrix[:size])[0]
+        mask = np.ones(size, dtype=bool)
+        if genres is not None:
+            mask[:] = False
+            for genre in genres:
+                positions = [self._positions[track_id] for track_id in self._genres.get(genre, ()) if track_id in self._positions]
+                mask[positions] = True
+        if min_popularity is not None:
+            mask &= self._popularity[:size] >= min_popularity
+        if max_popularity is not None:
+            mask &= (self._popularity[:size] <= max_popularity) & (self._popularity[:size] != UNKNOWN_POPULARITY)
+        for track_id in exclude:
+            position = self._positions.get(track_id)
+            if position is not None:
+                mask[position] = False
+        scores[~mask] = -np.inf
+        return [self._ids[i] for i in top_k(scores, min(k, int(mask.sum())))]
+
+    def vectors(self, track_ids: Iterable[str]) -> Tuple[List[str], np.ndarray]:
+        """The indexed ones of `track_ids` and their normalized feature rows."""
+        found = [track_id for track_id in track_ids if track_id in self._positions]
+        return found, self._matrix[[self._positions[track_id] for track_id in found]]
+
+    def stats(self) -> Dict[str, int]:
+        return {'tracks': len(self._ids), 'capacity': self._matrix.shape[0], 'genres': len(self._genres),
+                'with_popularity': int((self._popularity[:len(self._ids)] != UNKNOWN_POPULARITY).sum())}
+
+
+feature_index = FeatureIndex()
+
+
+async def _scan_cached(redis, prefix: str):
+    """Yield {id: value} batches for every readable `{prefix}:{id}` entry in Redis."""
+    keys = []
+    async for key in redis.scan_iter(match=f"{prefix}:*", count=FEATURE_INDEX_SCAN_BATCH):
+        keys.append(key)
+        if len(keys) >= FEATURE_INDEX_SCAN_BATCH:
+            yield await _read_batch(redis, keys, prefix)
+            keys = []
+    if keys:
+        yield await _read_batch(redis, keys, prefix)
+
+
+async def _read_batch(redis, keys, prefix: str) -> Dict[str, dict]:
+    values = {}
+    for key, raw in zip(keys, await redis.mget(keys)):
+        decoded = decode(raw)
+        if decoded is not None and not isinstance(decoded[0], Tombstone):
+            values[key.decode()[len(prefix) + 1:]] = decoded[0]
+    return values
+
+
+async def load_feature_index() -> None:
+    """Seed the index from every audio feature (and track popularity) already cached in Redis."""
+    try:
+        redis = await get_binary_redis_client()
+        async for features in _scan_cached(redis, AUDIO_FEATURE_PREFIX):
+            feature_index.add(features)
+            await asyncio.sleep(0)  # Let handlers run between batches
+        async for metadata in _scan_cached(redis, TRACK_META_PREFIX):
+            feature_index.set_popularity({track_id: track.get('popularity') for track_id, track in metadata.items()})
+            await asyncio.sleep(0)
+        logger.info(f"Feature index loaded: {feature_index.stats()}")
+    except Exception as e:
+        logger.error(f"Error loading feature index: {str(e)}")
@@ -0,0 +1,32 @@
+#genre.py
+
+# Seed genres Spotify accepts for recommendations; also the genre picker's list
+SPOTIFY_GENRES = [
+    "acoustic", "afrobeat", "alt-rock", "alternative", "ambient", "anime", "black-metal",
+    "bluegrass", "blues", "bossanova", "brazil", "breakbeat", "british", "cantopop",
+    "chicago-house", "children", "chill", "classical", "club", "comedy", "country",
+    "dance", "dancehall", "death-metal", "deep-house", "detroit-techno", "disco", "disney",
+    "drum-and-bass", "dub", "dubstep", "edm", "electro", "electronic", "emo", "folk",
+    "forro", "french", "funk", "garage", "german", "gospel", "goth", "grindcore", "groove",
+    "grunge", "guitar", "happy", "hard-rock", "hardcore", "hardstyle", "heavy-metal",
+    "hip-hop", "holidays", "honky-tonk", "house", "idm", "indian", "indie", "indie-pop",
+    "industrial", "iranian", "j-dance", "j-idol", "j-pop", "j-rock", "jazz", "k-pop", "kids",
+    "latin", "latino", "malay", "mandopop", "metal", "metal-misc", "metalcore",
+    "minimal-techno", "movies", "mpb", "new-age", "new-release", "opera", "pagode",
+    "party", "philippines-opm", "piano", "pop", "pop-film", "post-dubstep", "power-pop",
+    "progressive-house", "psych-rock", "punk", "punk-rock", "r-n-b", "rainy-day", "reggae",
+    "reggaeton", "road-trip", "rock", "rock-n-roll", "rockabilly", "romance", "sad", "salsa",
+    "samba", "sertanejo", "show-tunes", "singer-songwriter", "ska", "sleep", "songwriter",
+    "soul", "soundtracks", "spanish", "study", "summer", "swedish", "synth-pop", "tango",
+    "techno", "trance", "trip-hop", "turkish", "work-out", "world-music"
+]
+
+# Moods offered by the mood picker: seed genres and the audio-feature targets that define them
+MOOD_PROFILES = {
+    'happy': {'seed_genres': ['happy', 'pop'], 'targets': {'target_valence': 0.85, 'target_energy': 0.7, 'target_danceability': 0.7}},
+    'sad': {'seed_genres': ['sad', 'acoustic'], 'targets': {'target_valence': 0.2, 'target_energy': 0.3, 'target_acousticness': 0.6}},
+    'energetic': {'seed_genres': ['work-out', 'edm'], 'targets': {'target_energy': 0.9, 'target_danceability': 0.7, 'target_valence': 0.6}},
+    'calm': {'seed_genres': ['chill', 'ambient'], 'targets': {'target_energy': 0.25, 'target_acousticness': 0.7, 'target_instrumentalness': 0.4}},
+    'romantic': {'seed_genres': ['romance', 'r-n-b'], 'targets': {'target_valence': 0.6, 'target_energy': 0.4, 'target_acousticness': 0.4}},
+    'angry': {'seed_genres': ['metal', 'hardcore'], 'targets': {'target_energy': 0.95, 'target_valence': 0.25}},
+}
@@ -0,0 +1,150 @@
+#jobs.py
+import asyncio
+import json
+import os
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from spotify_service.spotify.near_cache import PROCESS_ID
+from spotify_service.spotify.redis_client import get_redis_pool
+from logging_config import setup_logging
+
+logger = setup_logging(logstash_host='localhost', logstash_port=5000)
+
+JOB_QUEUE_KEY = "playlist_jobs:queue"  # List of JSON jobs shared by every worker process
+JOB_PROCESSING_PREFIX = "playlist_jobs:processing"  # {process id}:{worker} -> the job that worker is running
+JOB_WORKERS_KEY = "playlist_jobs:workers"  # Sorted set: processing list -> last time its worker was seen
+JOB_DEDUPE_PREFIX = "playlist_jobs:dedupe"  # {dedupe key} -> id of the job already queued or running
+JOB_ACTIVE_PREFIX = "playlist_jobs:active"  # {user id} -> jobs queued or running for that user
+JOB_WORKERS = int(os.getenv("PLAYLIST_JOB_WORKERS", 4))  # Per process
+JOB_USER_LIMIT = int(os.getenv("PLAYLIST_JOB_USER_LIMIT", 2))
+JOB_TTL = 600  # Markers expire on their own if a worker dies mid-job
+JOB_POLL_TIMEOUT = 2  # Below the Redis socket timeout
+JOB_STALE_AFTER = JOB_TTL + 60  # A worker unseen for this long is dead; its job goes back on the queue
+
+JOB_QUEUED = 'queued'
+JOB_DUPLICATE = 'duplicate'
+JOB_LIMITED = 'limited'
+
+# Dedupe check, per-user cap and push in one atomic step. Returns {status, job id}
+ENQUEUE_SCRIPT = """
+local existing = redis.call('get', KEYS[1])
+if existing then
+    return {'duplicate', existing}
+end
+if tonumber(redis.call('get', KEYS[2]) or '0') >= tonumber(ARGV[2]) then
+    return {'limited', ''}
+end
+redis.call('incr', KEYS[2])
+redis.call('expire', KEYS[2], ARGV[3])
+redis.call('set', KEYS[1], ARGV[1], 'EX', ARGV[3])
+redis.call('lpush', KEYS[3], ARGV[4])
+return {'queued', ARGV[1]}
+"""
+
+# Release the dedupe marker (if it is still ours) and the user's slot
+FINISH_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    redis.call('del', KEYS[1])
+end
+if tonumber(redis.call('get', KEYS[2]) or '0') > 0 then
+    redis.call('decr', KEYS[2])
+end
+return 1
+"""
+
+job_stats = {'queued': 0, 'duplicates': 0, 'limited': 0, 'completed': 0, 'failed': 0, 'requeued': 0}
+
+
+def _keys(job: Dict[str, Any]):
+    return f"{JOB_DEDUPE_PREFIX}:{job['user_id']}:{job['dedupe_key']}", f"{JOB_ACTIVE_PREFIX}:{job['user_id']}"
+
+
+def new_job(user_id: int, dedupe_key: str, **payload) -> Dict[str, Any]:
+    return {'id': uuid.uuid4().hex, 'user_id': user_id, 'dedupe_key': dedupe_key, **payload}
+
+
+async def enqueue_job(job: Dict[str, Any]) -> Tuple[str, str]:
+    """Queue `job` unless the user already has it in flight or is at JOB_USER_LIMIT; returns (status, job id)."""
+    redis = await get_redis_pool()
+    dedupe_key, active_key = _keys(job)
+    status, job_id = await redis.eval(ENQUEUE_SCRIPT, 3, dedupe_key, active_key, JOB_QUEUE_KEY,
+                                      job['id'], JOB_USER_LIMIT, JOB_TTL, json.dumps(job))
+    job_stats[{JOB_QUEUED: 'queued', JOB_DUPLICATE: 'duplicates', JOB_LIMITED: 'limited'}[status]] += 1
+    return status, job_id
+
+
+async def finish_job(job: Dict[str, Any]) -> None:
+    try:
+        redis = await get_redis_pool()
+        dedupe_key, active_key = _keys(job)
+        await redis.eval(FINISH_SCRIPT, 2, dedupe_key, active_key, job['id'])
+    except Exception as e:
+        logger.error(f"Error releasing job {job['id']}: {str(e)}")
+
+
+async def run_job(process: Callable[[Dict[str, Any]], Awaitable[None]], job: Dict[str, Any]) -> None:
+    try:
+        await process(job)
+        job_stats['completed'] += 1
+    except Exception as e:
+        job_stats['failed'] += 1
+        logger.error(f"Job {job['id']} failed: {str(e)}", exc_info=True)
+    finally:
+        await finish_job(job)
+
+
+async def requeue_stale_jobs() -> int:
+    """Put jobs held by workers that stopped checking in back on the queue; returns how many were moved."""
+    redis = await get_redis_pool()
+    requeued = 0
+    for processing_key in await redis.zrangebyscore(JOB_WORKERS_KEY, 0, time.time() - JOB_STALE_AFTER):
+        # LMOVE is atomic, so two processes starting together never requeue the same job twice.
+        # Claims pop from the right, so these jobs run next
+        while await redis.lmove(processing_key, JOB_QUEUE_KEY, 'RIGHT', 'RIGHT') is not None:
+            requeued += 1
+        await redis.zrem(JOB_WORKERS_KEY, processing_key)
+    if requeued:
+        job_stats['requeued'] += requeued
+        logger.warning(f"Requeued {requeued} jobs left behind by dead workers")
+    return requeued
+
+
+async def _worker(process: Callable[[Dict[str, Any]], Awaitable[None]], processing_key: str) -> None:
+    # A job moves to this worker's processing list as it is taken and leaves it once done,
+    # so a job whose worker dies is found there and requeued instead of being lost
+    while True:
+        try:
+            redis = await get_redis_pool()
+            await redis.zadd(JOB_WORKERS_KEY, {processing_key: time.time()})
+            raw = await redis.blmove(JOB_QUEUE_KEY, processing_key, JOB_POLL_TIMEOUT, 'RIGHT', 'LEFT')
+        except Exception as e:
+            logger.error(f"Error polling the job queue: {str(e)}")
+            await asyncio.sleep(1)
+            continue
+        if raw is None:
+            continue
+        await run_job(process, json.loads(raw))
+        try:
+            await redis.lrem(processing_key, 1, raw)
+        except Exception as e:
+            logger.error(f"Error clearing finished job from {processing_key}: {str(e)}")
+
+
+async def run_job_workers(process: Callable[[Dict[str, Any]], Awaitable[None]], workers: Optional[int] = None) -> None:
+    """Run `workers` coroutines that take jobs off the shared queue and hand them to `process`.
+
+    Any process with a bot can run workers, so generation can be scaled out
+    separately from the processes that receive Telegram updates. Jobs left
+    behind by workers that died are requeued first.
+    """
+    try:
+        await requeue_stale_jobs()
+    except Exception as e:
+        logger.error(f"Error requeueing stale jobs: {str(e)}")
+    await asyncio.gather(*(_worker(process, f"{JOB_PROCESSING_PREFIX}:{PROCESS_ID}:{n}")
+                           for n in range(workers or JOB_WORKERS)))
+
+
+def get_job_stats() -> Dict[str, int]:
+    return dict(job_stats)
@@ -0,0 +1,178 @@
+#pools.py
+import asyncio
+import os
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from spotify_service.spotify.codec import encode, decode, Tombstone
+from spotify_service.spotify.near_cache import near_cache, publish_invalidation, PROCESS_ID
+from spotify_service.spotify.quota import spotify_quota, endpoint_cost, SPOTIFY_QUOTA_PER_HOUR
+from spotify_service.spotify.redis_client import get_redis_pool, get_binary_redis_client
+from logging_config import setup_logging
+from .genre import SPOTIFY_GENRES, MOOD_PROFILES
+from .ranking import FEATURE_NAMES
+from .feature_index import feature_index
+from .spotify import get_recommendations, get_audio_features_batch, _jittered
+
+logger = setup_logging(logstash_host='localhost', logstash_port=5000)
+
+POOL_PREFIX = "candidate_pool"  # candidate_pool:{genre|mood}:{name} -> {'tracks': {id: features}, 'refreshed_at'}
+POOL_SIZE = 400  # Newest tracks kept per pool; older ones rotate out
+POOL_MIN_RATIO = 1.5  # A pool serves a playlist only with this many candidates per requested track
+POOL_TTL = 7 * 86400
+POOL_NEAR_TTL = 300
+POOL_REFRESH_ROUNDS = 3  # Recommendation calls per refresh, 100 tracks each
+POOL_REFRESH_INTERVAL = int(os.getenv("CANDIDATE_POOL_REFRESH_INTERVAL", 900))
+POOL_QUOTA_SHARE = float(os.getenv("CANDIDATE_POOL_QUOTA_SHARE", 0.2))
+POOL_MIN_AGE = 6 * 3600  # Pools refreshed more recently than this are left alone
+POOL_REFRESHED_KEY = "candidate_pool:refreshed"  # Sorted set: "{kind}:{name}" -> last refresh time
+POOL_LOCK_KEY = "candidate_pool:lock"
+
+pool_stats = {'hits': 0, 'misses': 0, 'refreshes': 0, 'errors': 0, 'spent': 0}
+
+
+def pool_key(kind: str, name: str) -> str:
+    return f"{POOL_PREFIX}:{kind}:{name}"
+
+
+def all_pools() -> List[Tuple[str, str]]:
+    return [('genre', genre) for genre in SPOTIFY_GENRES] + [('mood', mood) for mood in MOOD_PROFILES]
+
+
+def refresh_cost() -> int:
+    # Every round can add up to one chunk of audio features
+    return POOL_REFRESH_ROUNDS * (endpoint_cost('recommendations') + endpoint_cost('audio-features'))
+
+
+def _pool_seeds(kind: str, name: str) -> Tuple[List[str], Dict[str, float]]:
+    if kind == 'mood':
+        return MOOD_PROFILES[name]['seed_genres'], MOOD_PROFILES[name]['targets']
+    return [name], {}
+
+
+def _round_targets(targets: Dict[str, float]) -> Dict[str, float]:
+    # Every refresh asks for different moods, otherwise Spotify keeps returning the tracks already pooled
+    if targets:
+        return _jittered(targets, 1)
+    return {'target_energy': random.uniform(0.2, 0.8), 'target_valence': random.uniform(0.2, 0.8)}
+
+
+async def _read_pool(redis, kind: str, name: str) -> Optional[dict]:
+    raw = await redis.get(pool_key(kind, name))
+    decoded = decode(raw)
+    if decoded is None or isinstance(decoded[0], Tombstone):
+        return None
+    near_cache.set(pool_key(kind, name), decoded[0], len(raw), ttl=POOL_NEAR_TTL)
+    return decoded[0]
+
+
+async def load_pool(kind: str, name: str) -> Optional[dict]:
+    pool = near_cache.get(pool_key(kind, name))
+    if pool is not None:
+        return pool
+    try:
+        return await _read_pool(await get_binary_redis_client(), kind, name)
+    except Exception as e:
+        logger.error(f"Error loading candidate pool {kind}:{name}: {str(e)}")
+        return None
+
+
+async def sample_pool(kind: str, name: str, count: int) -> Optional[List[str]]:
+    """`count` random track ids from a precomputed pool, or None if the pool can't serve the request."""
+    pool = await load_pool(kind, name)
+    if pool is None or len(pool['tracks']) < count * POOL_MIN_RATIO:
+        pool_stats['misses'] += 1
+        return None
+    pool_stats['hits'] += 1
+    return random.sample(list(pool['tracks']), count)
+
+
+async def mood_seed_tracks(mood: str, count: int = 2) -> List[str]:
+    """The pooled tracks closest to the mood's target features, to seed live recommendations."""
+    pool = await load_pool('mood', mood)
+    if not pool or not pool['tracks'] or mood not in MOOD_PROFILES:
+        return []
+    targets = MOOD_PROFILES[mood]['targets']
+    names = [key[len('target_'):] for key in targets]
+    track_ids = list(pool['tracks'])
+    values = np.array([[pool['tracks'][track_id].get(name) or 0.0 for name in names] for track_id in track_ids])
+    distances = np.abs(values - np.array([targets[f"target_{name}"] for name in names])).mean(axis=1)
+    return [track_ids[i] for i in np.argsort(distances, kind='stable')[:count]]
+
+
+async def refresh_pool(kind: str, name: str) -> int:
+    """Add fresh recommendations (with their features) to the front of a pool; returns the pool size."""
+    seed_genres, targets = _pool_seeds(kind, name)
+    rounds = await asyncio.gather(*(get_recommendations(seed_genres=seed_genres, limit=50, **_round_targets(targets))
+                                    for _ in range(POOL_REFRESH_ROUNDS)), return_exceptions=True)
+    errors = [result for result in rounds if isinstance(result, BaseException)]
+    new_ids = list(dict.fromkeys(track_id for result in rounds if not isinstance(result, BaseException) for track_id in result))
+    if not new_ids:
+        if errors:
+            raise errors[0]
+        return 0
+    features = await get_audio_features_batch(new_ids)
+    feature_index.tag(new_ids, seed_genres)
+
+    redis = await get_binary_redis_client()
+    previous = await _read_pool(redis, kind, name) or {'tracks': {}}
+    tracks = {track_id: {key: features[track_id][key] for key in FEATURE_NAMES if key in features[track_id]}
+              for track_id in new_ids if features.get(track_id)}
+    for track_id, track_features in previous['tracks'].items():
+        if len(tracks) >= POOL_SIZE:
+            break
+        tracks.setdefault(track_id, track_features)
+
+    refreshed_at = time.time()
+    pipe = redis.pipeline(transaction=False)
+    pipe.setex(pool_key(kind, name), POOL_TTL, encode({'tracks': tracks, 'refreshed_at': refreshed_at}))
+    pipe.zadd(POOL_REFRESHED_KEY, {f"{kind}:{name}": refreshed_at})
+    await pipe.execute()
+    near_cache.invalidate(pool_key(kind, name))
+    await publish_invalidation(redis, pool_key(kind, name))
+    return len(tracks)
+
+
+async def refresh_pools(budget: Optional[float] = None) -> Dict[str, int]:
+    """Refresh missing pools first, then the stalest ones, within `budget` quota tokens."""
+    if budget is None:
+        budget = SPOTIFY_QUOTA_PER_HOUR * POOL_QUOTA_SHARE * POOL_REFRESH_INTERVAL / 3600
+    redis = await get_redis_pool()
+    refreshed = dict(await redis.zrange(POOL_REFRESHED_KEY, 0, -1, withscores=True))
+    pools = sorted(all_pools(), key=lambda pool: refreshed.get(f"{pool[0]}:{pool[1]}", 0))
+    run_stats = {'refreshes': 0, 'errors': 0, 'spent': 0}
+    cost = refresh_cost()
+    for kind, name in pools:
+        if run_stats['spent'] + cost > budget or spotify_quota.is_paused():
+            break
+        if time.time() - refreshed.get(f"{kind}:{name}", 0) < POOL_MIN_AGE:
+            break  # Sorted by age, so every remaining pool is fresh too
+        run_stats['spent'] += cost
+        try:
+            size = await refresh_pool(kind, name)
+            run_stats['refreshes'] += 1
+            logger.debug(f"Candidate pool {kind}:{name} refreshed with {size} tracks")
+        except Exception as e:
+            run_stats['errors'] += 1
+            logger.error(f"Error refreshing candidate pool {kind}:{name}: {str(e)}")
+    for stat, value in run_stats.items():
+        pool_stats[stat] += value
+    logger.info(f"Candidate pool refresh finished: {run_stats} (budget {budget:.0f})")
+    return run_stats
+
+
+async def run_pool_scheduler() -> None:
+    """Refresh candidate pools once per interval; only one process in the cluster refreshes per interval."""
+    while True:
+        try:
+            redis = await get_redis_pool()
+            if await redis.set(POOL_LOCK_KEY, PROCESS_ID, nx=True, ex=max(60, POOL_REFRESH_INTERVAL - 60)):
+                await refresh_pools()
+        except Exception as e:
+            logger.error(f"Error in candidate pool scheduler: {str(e)}")
+        await asyncio.sleep(POOL_REFRESH_INTERVAL)
+
+
+def get_pool_stats() -> Dict[str, int]:
+    return dict(pool_stats)
@@ -0,0 +1,184 @@
+#provisioner.py
+import asyncio
+import json
+import math
+import os
+import time
+from typing import Any, Dict, List, Optional
+from config import SPOTIFY_USERNAME
+from spotify_service.spotify.client import spotify_client, spotify_circuit
+from spotify_service.spotify.near_cache import PROCESS_ID
+from spotify_service.spotify.quota import spotify_quota
+from spotify_service.spotify.redis_client import get_redis_pool
+from logging_config import setup_logging
+
+logger = setup_logging(logstash_host='localhost', logstash_port=5000)
+
+sp = spotify_client
+
+PROVISION_POOL_KEY = "playlist_pool:ready"  # List of JSON {'id', 'url', 'created_at'}: empty playlists ready to claim
+PROVISION_CLAIMS_KEY = "playlist_pool:claims"  # Sorted set: claimed playlist id -> claim time, for the demand rate
+PROVISION_LOCK_KEY = "playlist_pool:lock"
+PROVISION_INTERVAL = int(os.getenv("PLAYLIST_POOL_INTERVAL", 30))
+PROVISION_RATE_WINDOW = 3600  # Claims counted over the last hour
+PROVISION_LEAD = 600  # Keep enough playlists for this many seconds of demand
+PROVISION_MIN = int(os.getenv("PLAYLIST_POOL_MIN", 5))
+PROVISION_MAX = int(os.getenv("PLAYLIST_POOL_MAX", 100))
+PROVISION_BATCH = 10  # Playlists created per tick, so a cold pool doesn't burn the quota in one go
+PROVISION_MAX_ATTEMPTS = 3  # Failed claims or fills before a playlist is dropped from the pool
+PROVISION_NAME = "AR Music Land"
+PLAYLIST_DESCRIPTION = "Created by @AR_MUSICLAND_BOT"
+ADD_ITEMS_CHUNK = 100  # Spotify's limit per add/replace call
+
+provisioner_stats = {'claimed': 0, 'empty': 0, 'created': 0, 'recycled': 0, 'dropped': 0, 'errors': 0}
+
+
+def target_pool_size(claims_in_window: int) -> int:
+    """Playlists to keep ready for the claim rate seen over the last PROVISION_RATE_WINDOW."""
+    rate = claims_in_window / PROVISION_RATE_WINDOW
+    return max(PROVISION_MIN, min(PROVISION_MAX, math.ceil(rate * PROVISION_LEAD)))
+
+
+def _is_permanent(error: Exception) -> bool:
+    # A 4xx other than 429 (e.g. a 404 for a deleted playlist) won't go away by retrying
+    status = getattr(error, 'http_status', None)
+    return status is not None and 400 <= status < 500 and status != 429
+
+
+async def _requeue(entry: Dict[str, Any]) -> None:
+    # Claims pop from the right, so a requeued playlist is tried after every one already waiting
+    attempts = entry.get('attempts', 0) + 1
+    if attempts > PROVISION_MAX_ATTEMPTS:
+        provisioner_stats['dropped'] += 1
+        logger.warning(f"Dropping playlist {entry['id']} from the pool after {attempts - 1} failed attempts")
+        return
+    try:
+        redis = await get_redis_pool()
+        await redis.lpush(PROVISION_POOL_KEY, json.dumps({**entry, 'attempts': attempts}))
+        provisioner_stats['recycled'] += 1
+    except Exception as e:
+        logger.error(f"Error recycling playlist {entry['id']}: {str(e)}")
+
+
+async def claim_playlist(name: str, description: str = PLAYLIST_DESCRIPTION) -> Optional[Dict[str, Any]]:
+    """Take a pre-created playlist off the pool and give it its real name, or None if none could be claimed."""
+    try:
+        redis = await get_redis_pool()
+        raw = await redis.rpop(PROVISION_POOL_KEY)
+    except Exception as e:
+        logger.error(f"Error claiming a provisioned playlist: {str(e)}")
+        return None
+    if raw is None:
+        provisioner_stats['empty'] += 1
+        return None
+    entry = json.loads(raw)
+    try:
+        await sp.playlist_change_details(entry['id'], name=name, public=True, description=description)
+    except Exception as e:
+        provisioner_stats['errors'] += 1
+        logger.error(f"Error claiming playlist {entry['id']}: {str(e)}")
+        if _is_permanent(e):
+            provisioner_stats['dropped'] += 1
+        else:
+            await _requeue(entry)
+        return None
+    provisioner_stats['claimed'] += 1
+    try:
+        now = time.time()
+        pipe = redis.pipeline(transaction=False)
+        pipe.zadd(PROVISION_CLAIMS_KEY, {entry['id']: now})
+        pipe.zremrangebyscore(PROVISION_CLAIMS_KEY, 0, now - PROVISION_RATE_WINDOW)
+        await pipe.execute()
+    except Exception as e:
+        logger.error(f"Error recording playlist claim: {str(e)}")
+    return entry
+
+
+async def release_playlist(entry: Dict[str, Any]) -> None:
+    """Put a claimed but unused playlist back as a private placeholder; the next claim replaces its items."""
+    try:
+        await sp.playlist_change_details(entry['id'], name=PROVISION_NAME, public=False, description=PLAYLIST_DESCRIPTION)
+    except Exception as e:
+        # Left public under the failed request's name, or gone altogether; either way it can't go back
+        provisioner_stats['dropped'] += 1
+        logger.error(f"Error resetting playlist {entry['id']}, dropping it: {str(e)}")
+        return
+    await _requeue(entry)
+
+
+def _chunks(tracks: List[str]) -> List[List[str]]:
+    return [tracks[i:i + ADD_ITEMS_CHUNK] for i in range(0, len(tracks), ADD_ITEMS_CHUNK)]
+
+
+async def fill_playlist(playlist_id: str, tracks: List[str]) -> None:
+    # The first chunk replaces whatever a recycled playlist still holds; the rest are appended concurrently,
+    # so beyond the first 100 tracks Spotify may store the chunks out of order
+    chunks = _chunks(tracks)
+    await sp.playlist_replace_items(playlist_id, chunks[0])
+    await extend_playlist(playlist_id, [track for chunk in chunks[1:] for track in chunk])
+
+
+async def extend_playlist(playlist: str, tracks: List[str]) -> None:
+    """Append `tracks` to a published playlist (id, URI or link), one concurrent add call per chunk."""
+    await asyncio.gather(*(sp.playlist_add_items(playlist, chunk) for chunk in _chunks(tracks)))
+
+
+async def publish_playlist(name: str, tracks: List[str]) -> str:
+    """Publish `tracks` as a playlist on the bot account and return its link."""
+    if not tracks:
+        raise ValueError(f"No tracks to publish for {name}")
+    entry = await claim_playlist(name)
+    if entry is None:
+        playlist = await sp.user_playlist_create(SPOTIFY_USERNAME, name, public=True, description=PLAYLIST_DESCRIPTION)
+        entry = {'id': playlist['id'], 'url': playlist['external_urls']['spotify']}
+    try:
+        await fill_playlist(entry['id'], tracks)
+    except Exception:
+        await release_playlist(entry)
+        raise
+    return entry['url']
+
+
+async def provision_playlists() -> int:
+    """Create playlists until the pool reaches its target size; returns how many were created."""
+    redis = await get_redis_pool()
+    pipe = redis.pipeline(transaction=False)
+    pipe.zcount(PROVISION_CLAIMS_KEY, time.time() - PROVISION_RATE_WINDOW, '+inf')
+    pipe.llen(PROVISION_POOL_KEY)
+    claims, ready = await pipe.execute()
+    missing = min(PROVISION_BATCH, target_pool_size(claims) - ready)
+    created = 0
+    for _ in range(max(0, missing)):
+        if spotify_quota.is_paused() or not spotify_circuit.can_execute():
+            break
+        try:
+            # Private until claimed, so empty playlists don't show up on the bot's profile
+            playlist = await sp.user_playlist_create(SPOTIFY_USERNAME, PROVISION_NAME, public=False, description=PLAYLIST_DESCRIPTION)
+        except Exception as e:
+            provisioner_stats['errors'] += 1
+            logger.error(f"Error provisioning a playlist: {str(e)}")
+            break
+        entry = {'id': playlist['id'], 'url': playlist['external_urls']['spotify'], 'created_at': time.time()}
+        # Claims pop from the right, so new playlists join on the left, as recycled ones do
+        await redis.lpush(PROVISION_POOL_KEY, json.dumps(entry))
+        created += 1
+    provisioner_stats['created'] += created
+    if created:
+        logger.debug(f"Provisioned {created} playlists ({ready + created} ready, {claims} claimed in the last hour)")
+    return created
+
+
+async def run_playlist_provisioner() -> None:
+    """Top up the playlist pool every interval; only one process in the cluster provisions per interval."""
+    while True:
+        try:
+            redis = await get_redis_pool()
+            if await redis.set(PROVISION_LOCK_KEY, PROCESS_ID, nx=True, ex=max(10, PROVISION_INTERVAL - 5)):
+                await provision_playlists()
+        except Exception as e:
+            logger.error(f"Error in playlist provisioner: {str(e)}")
+        await asyncio.sleep(PROVISION_INTERVAL)
+
+
+def get_provisioner_stats() -> Dict[str, int]:
+    return dict(provisioner_stats)
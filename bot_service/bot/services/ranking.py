@@ -0,0 +1,155 @@
+#ranking.py
+from operator import itemgetter
+from typing import Dict, List, Mapping, Optional, Sequence
+import numpy as np
+
+# Audio features compared with the seed and their weight in the distance
+FEATURE_WEIGHTS = {
+    'danceability': 1.0,
+    'energy': 1.0,
+    'valence': 1.0,
+    'acousticness': 1.0,
+    'instrumentalness': 1.0,
+    'tempo': 0.5,
+    'loudness': 0.5,
+}
+FEATURE_NAMES = tuple(FEATURE_WEIGHTS)
+# Features Spotify does not report on a 0..1 scale are mapped onto it from these ranges (then clipped)
+FEATURE_RANGES = {
+    'tempo': (50.0, 200.0),  # BPM
+    'loudness': (-60.0, 0.0),  # dB
+}
+
+_WEIGHTS = np.array([FEATURE_WEIGHTS[name] for name in FEATURE_NAMES], dtype=np.float32)
+_WEIGHTS /= _WEIGHTS.sum()
+_RANGES = np.array([FEATURE_RANGES.get(name, (0.0, 1.0)) for name in FEATURE_NAMES], dtype=np.float32)
+_OFFSETS, _SCALES = _RANGES[:, 0], _RANGES[:, 1] - _RANGES[:, 0]
+MMR_DIVERSITY = 0.3  # Weight of "unlike the tracks already picked" against "like the seed"
+MMR_POOL_FACTOR = 3  # Candidates considered per playlist slot, most relevant first
+_row = itemgetter(*FEATURE_NAMES)
+_EMPTY_ROW = (None,) * len(FEATURE_NAMES)
+
+
+def feature_matrix(features: Sequence[Optional[Mapping[str, float]]]) -> np.ndarray:
+    """Pack audio-feature dicts into a contiguous (n, d) float32 matrix scaled to 0..1; missing values count as 0."""
+    try:
+        rows = [_row(feature) if feature else _EMPTY_ROW for feature in features]
+    except KeyError:
+        rows = [tuple((feature or {}).get(name) for name in FEATURE_NAMES) for feature in features]
+    # None becomes NaN here and 0 below
+    matrix = np.array(rows, dtype=np.float32).reshape(len(features), len(FEATURE_NAMES))
+    np.nan_to_num(matrix, copy=False, nan=0.0)
+    matrix -= _OFFSETS
+    matrix /= _SCALES
+    return np.clip(matrix, 0.0, 1.0, out=matrix)
+
+
+def similarities(seeds: np.ndarray, candidates: np.ndarray) -> np.ndarray:
+    """(k, n) similarity of every seed row to every candidate row: 1 - weighted mean absolute difference."""
+    seeds = np.atleast_2d(seeds)
+    scores = np.empty((seeds.shape[0], candidates.shape[0]), dtype=np.float32)
+    # One seed at a time keeps the temporary at (n, d) instead of (k, n, d)
+    for i, seed in enumerate(seeds):
+        np.subtract(1.0, np.abs(candidates - seed) @ _WEIGHTS, out=scores[i])
+    return scores
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first, without sorting the whole array."""
+    k = min(k, scores.shape[-1])
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    if k < scores.shape[-1]:
+        indices = np.argpartition(-scores, k - 1)[:k]
+    else:
+        indices = np.arange(scores.shape[-1])
+    # Stable so equal scores keep candidate order, like sorted() did
+    return indices[np.argsort(-scores[indices], kind='stable')]
+
+
+def mmr_select(relevance: np.ndarray, matrix: np.ndarray, k: int, diversity: float = MMR_DIVERSITY) -> np.ndarray:
+    """Greedy maximal-marginal-relevance pick of k rows: each trades relevance against likeness to those already picked."""
+    if diversity <= 0:
+        return top_k(relevance, k)
+    # Only the most relevant candidates can make the cut, which bounds the work at k * pool
+    pool = top_k(relevance, k * MMR_POOL_FACTOR)
+    k = min(k, len(pool))
+    relevance, rows = relevance[pool], matrix[pool]
+    redundancy = np.zeros(len(pool), dtype=np.float32)  # Highest similarity to any picked row
+    picked = np.zeros(len(pool), dtype=bool)
+    picks = []
+    for _ in range(k):
+        scores = (1.0 - diversity) * relevance - diversity * redundancy
+        scores[picked] = -np.inf
+        best = int(np.argmax(scores))
+        picks.append(best)
+        picked[best] = True
+        np.maximum(redundancy, similarities(rows[best], rows)[0], out=redundancy)
+    return pool[picks]
+
+
+class DiversityStats:
+    """Per-feature mean, standard deviation and range of a playlist, updated one batch of matrix rows at a time."""
+
+    def __init__(self):
+        self.count = 0
+        self._mean = np.zeros(len(FEATURE_NAMES))
+        self._m2 = np.zeros(len(FEATURE_NAMES))  # Sum of squared deviations from the mean
+        self._min = np.full(len(FEATURE_NAMES), np.inf)
+        self._max = np.full(len(FEATURE_NAMES), -np.inf)
+
+    def update(self, rows: np.ndarray) -> None:
+        rows = np.atleast_2d(rows).astype(np.float64)
+        n = rows.shape[0]
+        if n == 0:
+            return
+        # Chan et al.'s pairwise merge of the running and the batch moments
+        batch_mean = rows.mean(axis=0)
+        delta = batch_mean - self._mean
+        total = self.count + n
+        self._m2 += ((rows - batch_mean) ** 2).sum(axis=0) + delta ** 2 * self.count * n / total
+        self._mean += delta * n / total
+        self.count = total
+        np.minimum(self._min, rows.min(axis=0), out=self._min)
+        np.maximum(self._max, rows.max(axis=0), out=self._max)
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        """Statistics in each feature's own unit (BPM for tempo, dB for loudness)."""
+        if not self.count:
+            return {}
+        mean = self._mean * _SCALES + _OFFSETS
+        std = np.sqrt(self._m2 / self.count) * _SCALES
+        spread = (self._max - self._min) * _SCALES
+        return {name: {'mean': float(mean[i]), 'std': float(std[i]), 'range': float(spread[i])}
+                for i, name in enumerate(FEATURE_NAMES)}
+
+
+def rank_tracks(seed_features: Mapping[str, float], candidates: Mapping[str, Mapping[str, float]], k: int,
+                diversity: float = 0.0, stats: Optional['DiversityStats'] = None) -> List[str]:
+    """Ids of k candidates close to the seed, best first; with `diversity` > 0 they are also kept apart from each other.
+
+    The picked rows of the candidate matrix are merged into `stats`, if given, so a playlist's diversity
+    is tracked from the matrix ranking already built.
+    """
+    if diversity <= 0 and stats is None:
+        return rank_tracks_for_seeds({'seed': seed_features}, candidates, k)['seed']
+    track_ids = list(candidates)
+    if not track_ids:
+        return []
+    matrix = feature_matrix([candidates[track_id] for track_id in track_ids])
+    relevance = similarities(feature_matrix([seed_features]), matrix)[0]
+    picks = mmr_select(relevance, matrix, k, diversity)
+    if stats is not None:
+        stats.update(matrix[picks])
+    return [track_ids[i] for i in picks]
+
+
+def rank_tracks_for_seeds(seeds: Mapping[str, Mapping[str, float]], candidates: Mapping[str, Mapping[str, float]],
+                          k: int) -> Dict[str, List[str]]:
+    """Rank one candidate pool against several seeds at once; the candidate matrix is built only once."""
+    track_ids = list(candidates)
+    if not track_ids:
+        return {seed_id: [] for seed_id in seeds}
+    matrix = feature_matrix([candidates[track_id] for track_id in track_ids])
+    scores = similarities(feature_matrix(list(seeds.values())), matrix)
+    return {seed_id: [track_ids[i] for i in top_k(row, k)] for seed_id, row in zip(seeds, scores)}
@@ -0,0 +1,47 @@
+#registry.py
+import json
+import os
+import time
+from typing import Any, Dict, Optional
+from spotify_service.spotify.redis_client import get_redis_pool
+from logging_config import setup_logging
+
+logger = setup_logging(logstash_host='localhost', logstash_port=5000)
+
+GENERATION_VERSION = 1  # Bump whenever generation changes, so playlists built the old way stop being reused
+PLAYLIST_FRESHNESS = int(os.getenv("PLAYLIST_FRESHNESS", 6 * 3600))  # Seconds a generated playlist is handed out again
+REGISTRY_PREFIX = "generated_playlist"
+
+registry_stats = {'hits': 0, 'misses': 0}
+
+
+def registry_key(data_type: str, data_id: str, track_count: int) -> str:
+    # 'track' and 'song' both mean "inspired by this track"
+    data_type = 'song' if data_type == 'track' else data_type
+    return f"{REGISTRY_PREFIX}:{data_type}:{data_id}:{track_count}:v{GENERATION_VERSION}"
+
+
+async def find_generated_playlist(data_type: str, data_id: str, track_count: int) -> Optional[Dict[str, Any]]:
+    """The playlist generated for the same request within PLAYLIST_FRESHNESS, if any."""
+    try:
+        redis = await get_redis_pool()
+        entry = await redis.get(registry_key(data_type, data_id, track_count))
+    except Exception as e:
+        logger.error(f"Error reading generated playlist registry: {str(e)}")
+        return None
+    registry_stats['hits' if entry else 'misses'] += 1
+    return json.loads(entry) if entry else None
+
+
+async def register_generated_playlist(data_type: str, data_id: str, track_count: int, name: str, link: str,
+                                      playlist_id: str) -> None:
+    entry = {'name': name, 'link': link, 'playlist_id': playlist_id, 'created_at': time.time()}
+    try:
+        redis = await get_redis_pool()
+        await redis.setex(registry_key(data_type, data_id, track_count), PLAYLIST_FRESHNESS, json.dumps(entry))
+    except Exception as e:
+        logger.error(f"Error registering generated playlist: {str(e)}")
+
+
+def get_registry_stats() -> Dict[str, int]:
+    return dict(registry_stats)
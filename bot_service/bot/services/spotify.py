@@ -1,29 +1,40 @@
 #local spotify.py
 from logging_config import setup_logging
-import spotipy
-from spotipy.oauth2 import SpotifyClientCredentials
 from spotipy.exceptions import SpotifyException
 from spotipy.oauth2 import SpotifyOauthError
-from config import SPOTIFY_CLIENT_ID, SPOTIFY_CLIENT_SECRET, SPOTIFY_REDIRECT_URI, SPOTIFY_USERNAME
+from config import SPOTIFY_USERNAME
 import random
-from collections import defaultdict
 import asyncio
-from functools import lru_cache
-from spotify_service.spotify.redis_client import get_redis_client
-import json
+import math
+from spotify_service.spotify.client import spotify_client, spotify_circuit
+from spotify_service.spotify.quota import spotify_quota, endpoint_cost
+from spotify_service.spotify.catalog import get_audio_features as get_catalog_audio_features, get_tracks_metadata, store_tracks_metadata
+from spotify_service.spotify.cache import (cached_operation, cached_get_artist, cached_get_artist_top_tracks, cached_spotify_search,
+                                           tombstoned_operation)
+from .ranking import feature_matrix, similarities, rank_tracks, DiversityStats, MMR_DIVERSITY, FEATURE_NAMES
+from .feature_index import feature_index
+from .candidates import remember_candidates, draw_variant
+from .genre import MOOD_PROFILES
+from .provisioner import publish_playlist
 
 
 logger = setup_logging(logstash_host='localhost', logstash_port=5000)
-auth_manager = SpotifyClientCredentials(
-    client_id=SPOTIFY_CLIENT_ID,
-    client_secret=SPOTIFY_CLIENT_SECRET
-)
 
-sp = spotipy.Spotify(auth_manager=auth_manager)
+sp = spotify_client
+
+FANOUT_CONCURRENCY = 4  # Recommendation rounds in flight per playlist
+FANOUT_TOKEN_BUDGET = 12  # Quota tokens one playlist's recommendation rounds may spend
+FANOUT_JITTER = 0.2  # Max spread of the jittered target_* values around the seed's
+SEED_PROFILE_TTL = 86400  # 24 hours
+RECOMMENDATION_DEADLINE = 8  # Seconds to wait for Spotify before the local feature index fills the playlist
+CANDIDATE_SURPLUS = 2  # Candidates gathered per playlist slot; the spare ones serve "Create Another Playlist"
+STREAM_FIRST_BATCH = 20  # Tracks in the first streamed batch, so the link goes out after one round
+MIN_PLAYLIST_FILL = 0.8  # Share of the requested tracks a generated playlist needs before it is published
+SEED_FEATURES = ['danceability', 'energy', 'valence', 'acousticness', 'instrumentalness']
+
 # Update the authentication setup
 # در spotify.py، یک تابع برای بازسازی توکن اضافه کنید
 async def refresh_spotify_auth():
-    global sp, auth_manager
     try:
         # حذف کش فعلی
         import os
@@ -31,55 +42,32 @@ async def refresh_spotify_auth():
         if os.path.exists(cache_path):
             os.remove(cache_path)
         
-        # بازسازی مدیر احراز هویت
-        auth_manager = SpotifyClientCredentials(
-            client_id=SPOTIFY_CLIENT_ID,
-            client_secret=SPOTIFY_CLIENT_SECRET)
-
-        sp = spotipy.Spotify(auth_manager=auth_manager)
+        # بازسازی توکن
+        await sp.invalidate_token()
+        await sp.get_access_token()
         return True
     except Exception as e:
         logger.error(f"Failed to refresh Spotify auth: {str(e)}")
         return False
 
-@lru_cache(maxsize=1000)
-def get_audio_features(track_id):
-    features = sp.audio_features([track_id])[0]
-    return features if features else {}
-
 async def get_audio_features_batch(track_ids):
-    redis = await get_redis_client()
-    features = {}
-    missing_ids = []
-
-    # Try to get features from cache
-    for track_id in track_ids:
-        cached_feature = await redis.get(f"audio_feature:{track_id}")
-        if cached_feature:
-            features[track_id] = json.loads(cached_feature)
-        else:
-            missing_ids.append(track_id)
-
-    # Fetch missing features from Spotify API
-    if missing_ids:
-        batch_features = await asyncio.to_thread(sp.audio_features, missing_ids)
-        for track_id, feature in zip(missing_ids, batch_features):
-            if feature:
-                features[track_id] = feature
-                await redis.setex(f"audio_feature:{track_id}", 86400, json.dumps(feature))  # Cache for 24 hours
-
+    # One MGET, then Spotify-sized chunks of the misses fetched concurrently and written back in one pipeline
+    features = await get_catalog_audio_features(track_ids)
+    feature_index.add(features)
     return features
 
 def calculate_similarity(seed_features, track_features):
-    similarity = 0
-    for key in ['danceability', 'energy', 'valence', 'acousticness', 'instrumentalness']:
-        similarity += abs(seed_features.get(key, 0) - track_features.get(key, 0))
-    return 1 - (similarity / 5)  # Normalized to a scale of 0 to 1
+    # Single pair; rank many candidates with ranking.rank_tracks instead
+    return float(similarities(feature_matrix([seed_features]), feature_matrix([track_features]))[0, 0])
+
+def recommendation_limit(limit):
+    # Request more tracks for further filtering, up to Spotify's cap
+    return min(limit * 2, 100)
 
 async def get_recommendations(seed_tracks=None, seed_artists=None, seed_genres=None, limit=20, retry_auth=True, **kwargs):
     try:
         essential_params = {
-            'limit': min(limit * 2, 100)  # Request more tracks for further filtering
+            'limit': recommendation_limit(limit)
         }
         if seed_tracks:
             essential_params['seed_tracks'] = seed_tracks[:2]
@@ -93,7 +81,11 @@ async def get_recommendations(seed_tracks=None, seed_artists=None, seed_genres=N
             elif key in ['min_popularity', 'max_popularity', 'target_popularity'] and 0 <= value <= 100:
                 essential_params[key] = value
 
-        recommendations = await asyncio.to_thread(sp.recommendations, **essential_params)
+        # Results stay live, but a request Spotify rejects as invalid is remembered and not sent again. The key
+        # covers every parameter, so a rejected set of targets doesn't block the same seeds with other targets
+        params_key = '&'.join(f"{key}={','.join(sorted(value)) if isinstance(value, list) else value}"
+                              for key, value in sorted(essential_params.items()))
+        recommendations = await tombstoned_operation(sp.recommendations, f"recommendation_params:{params_key}", **essential_params)
         return [rec['id'] for rec in recommendations['tracks']]
     except SpotifyOauthError as se:
         if retry_auth:
@@ -106,133 +98,332 @@ async def get_recommendations(seed_tracks=None, seed_artists=None, seed_genres=N
         logger.error(f"Unexpected error in get_recommendations: {str(e)}")
         raise
 
-async def filter_and_rank_tracks(seed_track_id, recommended_track_ids, target_count):
-    seed_features = await asyncio.to_thread(get_audio_features, seed_track_id)
+def rounds_needed(shortfall, per_round, concurrency):
+    """Rounds to have in flight for `shortfall` more ids when a round adds `per_round` new ones."""
+    if per_round <= 0:
+        return concurrency
+    return min(concurrency, math.ceil(shortfall / per_round))
+
+async def stream_rounds(run_round, target_count, max_rounds, concurrency=FANOUT_CONCURRENCY, timeout=None, round_yield=None):
+    """Run `run_round(i)` for up to `max_rounds` rounds, at most `concurrency` at a time, yielding as rounds finish.
+
+    Each round returns track ids; every yield is the ids not seen in an earlier
+    round. Only as many rounds run as the shortfall needs: the first rounds
+    assume each adds `round_yield` ids (default: the whole target), later ones
+    go by how many new ids finished rounds actually added. The rounds also fit
+    FANOUT_TOKEN_BUDGET quota tokens. Outstanding rounds are cancelled once
+    `target_count` unique ids are in, `timeout` seconds have passed or the
+    consumer stops iterating. No new round starts while Spotify has us paused.
+    Failed rounds are logged and skipped; the first error is raised if nothing
+    was collected, and a 429 if the quota pause kept every round from starting.
+    """
+    max_rounds = min(max_rounds, max(1, FANOUT_TOKEN_BUDGET // endpoint_cost('recommendations')))
+    collected = {}
+    pending = set()
+    errors = []
+    next_round = 0
+    succeeded = 0
+    deadline = asyncio.get_running_loop().time() + timeout if timeout is not None else None
+    try:
+        while len(collected) < target_count:
+            per_round = len(collected) / succeeded if succeeded else (round_yield or target_count)
+            needed = rounds_needed(target_count - len(collected), per_round, concurrency)
+            while next_round < max_rounds and len(pending) < needed and not spotify_quota.is_paused():
+                pending.add(asyncio.create_task(run_round(next_round)))
+                next_round += 1
+            if not pending:
+                break
+            remaining = deadline - asyncio.get_running_loop().time() if deadline is not None else None
+            if remaining is not None and remaining <= 0:
+                logger.warning(f"Recommendation rounds timed out with {len(collected)} tracks")
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    errors.append(task.exception())
+                    logger.warning(f"Recommendation round failed: {str(task.exception())}")
+                    continue
+                new_ids = [track_id for track_id in dict.fromkeys(task.result()) if track_id not in collected]
+                collected.update(dict.fromkeys(new_ids))
+                succeeded += 1
+                if new_ids:
+                    yield new_ids
+    finally:
+        for task in pending:
+            task.cancel()
+    if not collected and errors:
+        raise errors[0]
+    if not collected and spotify_quota.is_paused():
+        raise SpotifyException(429, -1, "Spotify quota is paused, no recommendation round started")
+    logger.info(f"{len(collected)} recommendations generated in {next_round} rounds")
+
+async def fan_out_rounds(run_round, target_count, max_rounds, concurrency=FANOUT_CONCURRENCY, timeout=None, round_yield=None):
+    """All of `stream_rounds`' track ids in one list, first seen first."""
+    collected = []
+    async for new_ids in stream_rounds(run_round, target_count, max_rounds, concurrency, timeout, round_yield):
+        collected += new_ids
+    return collected
+
+def require_fill(tracks, target_count, source):
+    """`tracks`, or a 503 when they fall well short of `target_count`; a thin playlist is not worth publishing."""
+    if len(tracks) < target_count * MIN_PLAYLIST_FILL:
+        raise SpotifyException(503, -1, f"Only {len(tracks)} of {target_count} tracks found for {source}")
+    return tracks
+
+def _jittered(params, round_index):
+    """Round 0 asks with the seed's own targets; later rounds widen popularity and jitter the moods."""
+    params = dict(params)
+    if round_index == 0:
+        return params
+    if 'min_popularity' in params:
+        params['min_popularity'] = max(0, params['min_popularity'] - 5 * round_index)
+        params['max_popularity'] = min(100, params['max_popularity'] + 5 * round_index)
+    for param in ['target_danceability', 'target_energy', 'target_valence']:
+        if param in params:
+            params[param] = max(0, min(1, params[param] + (random.random() - 0.5) * FANOUT_JITTER))
+    return params
+
+async def _build_seed_profile(track_id):
+    metadata = (await get_tracks_metadata([track_id])).get(track_id)
+    if metadata is None:
+        raise SpotifyException(404, -1, f"Unknown seed track {track_id}")
+    # Features, artist genres and the similar-track search only depend on the metadata, so fetch them together
+    features, artist, similar = await asyncio.gather(
+        get_audio_features_batch([track_id]),
+        cached_get_artist(metadata['artist_id']) if metadata['artist_id'] else asyncio.sleep(0, result={}),
+        cached_spotify_search(f"track:{metadata['name']} artist:{metadata['artist']}", 'track', 2, reuse_prefix=False),
+    )
+    # The search returned full track objects; keep them so the similar track's metadata isn't fetched again
+    await store_tracks_metadata(similar['tracks']['items'])
+    return {
+        'id': track_id,
+        'name': metadata['name'],
+        'artist': metadata['artist'],
+        'artist_id': metadata['artist_id'],
+        'popularity': metadata['popularity'] or 0,
+        'features': features.get(track_id) or {},
+        'genres': ((artist or {}).get('genres') or [])[:2],
+        'similar_track_ids': [track['id'] for track in similar['tracks']['items'][:1]],
+    }
+
+async def get_seed_profile(track_id):
+    """Everything song-based generation needs about a seed track, cached per track id."""
+    return await cached_operation(_build_seed_profile, f"seed_profile:{track_id}", track_id, expiration=SEED_PROFILE_TTL)
+
+async def filter_and_rank_tracks(seed_track_id, recommended_track_ids, target_count, seed_features=None, stats=None):
+    if seed_features is None:
+        seed_features = (await get_audio_features_batch([seed_track_id])).get(seed_track_id) or {}
     recommended_features = await get_audio_features_batch(recommended_track_ids)
     
-    similarities = [(track_id, calculate_similarity(seed_features, features))
-                    for track_id, features in recommended_features.items()]
-    
-    # Sort by similarity and select the best matches
-    sorted_tracks = sorted(similarities, key=lambda x: x[1], reverse=True)
-    return [track_id for track_id, _ in sorted_tracks[:target_count]]
+    # One vectorized distance per candidate, then an MMR pick so the playlist doesn't repeat itself
+    return rank_tracks(seed_features, recommended_features, target_count, diversity=MMR_DIVERSITY, stats=stats)
+
+def track_indexed_rows(stats, track_ids):
+    # Tracks that skipped ranking (variants, index fills) are already in the feature index
+    if stats is not None and track_ids:
+        stats.update(feature_index.vectors(track_ids)[1])
+
+def nearest_indexed_tracks(profile, count, exclude=()):
+    """Tracks close to the seed from the local feature index; prefers the seed's genres and popularity band."""
+    exclude = set(exclude) | {profile['id']}
+    popularity = {'min_popularity': max(0, profile['popularity'] - 20), 'max_popularity': min(100, profile['popularity'] + 20)}
+    tracks = []
+    # Relax the filters step by step until there are enough tracks
+    for filters in ({'genres': profile['genres'] or None, **popularity}, {'genres': profile['genres'] or None}, {}):
+        tracks += feature_index.nearest(profile['features'], count - len(tracks), exclude=exclude | set(tracks), **filters)
+        if len(tracks) >= count:
+            break
+    if tracks:
+        logger.info(f"{len(tracks)} tracks filled from the local feature index")
+    return tracks
 
-async def create_playlist_from_song(track_id, target_count=100, max_iterations=10):
+async def stream_playlist_from_song(track_id, target_count=100, max_iterations=10, fresh=False, progressive=True, stats=None):
+    """Yield the song playlist as batches of ranked track ids.
+
+    With `progressive`, a batch is ranked from the candidates gathered so far
+    each time a recommendation round finishes: first STREAM_FIRST_BATCH tracks,
+    then at most one track per CANDIDATE_SURPLUS candidates, so early batches
+    don't use up a thin candidate list. The last batch tops the playlist up to
+    `target_count`, from the local feature index if Spotify came up short.
+    Every yielded batch is merged into `stats`, if given, for the diversity report.
+    """
     try:
-        seed_track = await asyncio.to_thread(sp.track, track_id)
-        seed_artists = [artist['id'] for artist in seed_track['artists']]
-        seed_track_features = await asyncio.to_thread(get_audio_features, track_id)
-        
-        logger.info(f"Seed track: {seed_track['name']} by {seed_track['artists'][0]['name']}")
-        
-        artist_genres = (await asyncio.to_thread(sp.artist, seed_artists[0]))['genres']
-        seed_genres = artist_genres[:2] if artist_genres else []
+        profile = await get_seed_profile(track_id)
+        if fresh:
+            # A new variant comes from the candidates left over from earlier generations while they last
+            variant = await draw_variant(f"song:{track_id}", profile['features'], target_count)
+            if variant:
+                track_indexed_rows(stats, variant)
+                yield variant
+                return
+        seed_artists = [profile['artist_id']] if profile['artist_id'] else []
+        seed_genres = profile['genres']
         
+        logger.info(f"Seed track: {profile['name']} by {profile['artist']}")
         logger.info(f"Seed genres: {seed_genres}")
         
-        base_params = {
-            'target_danceability': seed_track_features['danceability'],
-            'target_energy': seed_track_features['energy'],
-            'target_valence': seed_track_features['valence'],
-            'target_acousticness': seed_track_features['acousticness'],
-            'target_instrumentalness': seed_track_features['instrumentalness'],
-            'min_popularity': max(0, seed_track['popularity'] - 20),
-            'max_popularity': min(100, seed_track['popularity'] + 20),
-        }
+        base_params = {f"target_{key}": profile['features'][key] for key in SEED_FEATURES
+                       if profile['features'].get(key) is not None}
+        base_params['min_popularity'] = max(0, profile['popularity'] - 20)
+        base_params['max_popularity'] = min(100, profile['popularity'] + 20)
         
-        all_recommended_tracks = set()
-        iteration = 0
+        seed_tracks = [track_id] + profile['similar_track_ids']
         
-        while len(all_recommended_tracks) < target_count and iteration < max_iterations:
-            remaining = target_count - len(all_recommended_tracks)
-            
-            similar_tracks = (await asyncio.to_thread(sp.search, q=f"track:{seed_track['name']} artist:{seed_track['artists'][0]['name']}", type='track', limit=2))['tracks']['items']
-            seed_tracks = [track_id] + [track['id'] for track in similar_tracks[:1]]
-            
+        async def run_round(round_index):
             try:
-                new_tracks = await get_recommendations(seed_tracks, seed_artists[:1], seed_genres, remaining, **base_params)
-                all_recommended_tracks.update(new_tracks)
+                return await get_recommendations(seed_tracks, seed_artists[:1], seed_genres, target_count, **_jittered(base_params, round_index))
             except SpotifyException:
                 simplified_params = {'seed_tracks': seed_tracks, 'seed_artists': seed_artists[:1], 'seed_genres': seed_genres}
-                new_tracks = await get_recommendations(**simplified_params, limit=remaining)
-                all_recommended_tracks.update(new_tracks)
-            
-            if len(all_recommended_tracks) < target_count:
-                base_params['min_popularity'] = max(0, base_params['min_popularity'] - 5)
-                base_params['max_popularity'] = min(100, base_params['max_popularity'] + 5)
-                
-                for param in ['target_danceability', 'target_energy', 'target_valence']:
-                    base_params[param] = max(0, min(1, base_params[param] + (random.random() - 0.5) * 0.2))
-            
-            iteration += 1
-        
-        logger.info(f"{len(all_recommended_tracks)} recommendations generated after {iteration} iterations")
+                return await get_recommendations(**simplified_params, limit=target_count)
         
-        # Filter and rank the recommended tracks
-        filtered_tracks = await filter_and_rank_tracks(track_id, list(all_recommended_tracks), target_count)
+        all_recommended_tracks = []
+        served = []
+        if spotify_quota.is_paused() or not spotify_circuit.can_execute():
+            logger.warning("Spotify is throttled or unavailable, serving the playlist from the local feature index")
+        else:
+            try:
+                async for new_ids in stream_rounds(run_round, target_count * CANDIDATE_SURPLUS, max_iterations,
+                                                   timeout=RECOMMENDATION_DEADLINE, round_yield=recommendation_limit(target_count)):
+                    all_recommended_tracks += new_ids
+                    if not progressive:
+                        continue
+                    share = min(target_count, len(all_recommended_tracks) // CANDIDATE_SURPLUS) - len(served)
+                    if not served:
+                        share = min(share, STREAM_FIRST_BATCH)
+                    if share > 0:
+                        served_ids = set(served)
+                        unserved = [candidate for candidate in all_recommended_tracks if candidate not in served_ids]
+                        batch = await filter_and_rank_tracks(track_id, unserved, share, profile['features'], stats=stats)
+                        served += batch
+                        yield batch
+            except SpotifyException as e:
+                logger.warning(f"Spotify recommendations failed, falling back to the local feature index: {str(e)}")
         
-        return filtered_tracks
+        # Rank whatever the batches didn't use, then fill any shortfall from the index
+        batch = []
+        if all_recommended_tracks:
+            served_ids = set(served)
+            unserved = [candidate for candidate in all_recommended_tracks if candidate not in served_ids]
+            if unserved and len(served) < target_count:
+                batch = await filter_and_rank_tracks(track_id, unserved, target_count - len(served), profile['features'], stats=stats)
+            feature_index.tag(all_recommended_tracks, seed_genres)
+            await remember_candidates(f"song:{track_id}", all_recommended_tracks, served + batch)
+        if len(served) + len(batch) < target_count:
+            filled = nearest_indexed_tracks(profile, target_count - len(served) - len(batch), exclude=set(served + batch))
+            track_indexed_rows(stats, filled)
+            batch += filled
+        if not served and not batch:
+            raise SpotifyException(503, -1, f"No recommendations available for {track_id}")
+        if batch:
+            yield batch
     except Exception as e:
-        logger.error(f"Unexpected error in create_playlist_from_song: {str(e)}")
+        logger.error(f"Unexpected error in stream_playlist_from_song: {str(e)}")
         raise
 
+async def create_playlist_from_song(track_id, target_count=100, max_iterations=10, fresh=False, stats=None):
+    # Ranked once over every candidate, as a single batch
+    tracks = []
+    async for batch in stream_playlist_from_song(track_id, target_count, max_iterations, fresh, progressive=False, stats=stats):
+        tracks += batch
+    return tracks
+
 async def create_playlist_from_genre(genre, target_count=100, max_iterations=10):
     try:
-        all_recommended_tracks = set()
-        iteration = 0
-        
-        while len(all_recommended_tracks) < target_count and iteration < max_iterations:
-            remaining = target_count - len(all_recommended_tracks)
-            
-            try:
-                new_tracks = await get_recommendations(seed_genres=[genre], limit=remaining)
-                all_recommended_tracks.update(new_tracks)
-            except SpotifyException:
-                logger.error(f"Error getting recommendations for genre {genre}")
-                break
-            
-            iteration += 1
+        async def run_round(round_index):
+            # Identical requests mostly return the same tracks, so later rounds aim at different moods
+            targets = {} if round_index == 0 else {
+                'target_energy': random.uniform(0.2, 0.8),
+                'target_valence': random.uniform(0.2, 0.8),
+            }
+            return await get_recommendations(seed_genres=[genre], limit=target_count, **targets)
         
-        logger.info(f"{len(all_recommended_tracks)} recommendations generated after {iteration} iterations")
+        all_recommended_tracks = await fan_out_rounds(run_round, target_count, max_iterations, round_yield=recommendation_limit(target_count))
+        feature_index.tag(all_recommended_tracks, [genre])
         
         # Additional filtering or ranking could be added here if needed
-        return list(all_recommended_tracks)[:target_count]
+        return require_fill(all_recommended_tracks[:target_count], target_count, f"genre {genre}")
     except Exception as e:
         logger.error(f"Unexpected error in create_playlist_from_genre: {str(e)}")
         raise
 
+async def create_playlist_from_mood(mood, target_count=100, max_iterations=10, seed_tracks=None):
+    """Live mood playlist from the mood's seed genres and target features; `seed_tracks` sharpen the seeds."""
+    if mood not in MOOD_PROFILES:
+        raise ValueError(f"Unknown mood {mood}")
+    profile = MOOD_PROFILES[mood]
+    
+    async def run_round(round_index):
+        return await get_recommendations(seed_tracks, None, profile['seed_genres'], target_count, **_jittered(profile['targets'], round_index))
+    
+    all_recommended_tracks = await fan_out_rounds(run_round, target_count, max_iterations, round_yield=recommendation_limit(target_count))
+    feature_index.tag(all_recommended_tracks, profile['seed_genres'])
+    return require_fill(all_recommended_tracks[:target_count], target_count, f"mood {mood}")
+
+async def _build_artist_profile(artist_id):
+    artist, top_tracks = await asyncio.gather(cached_get_artist(artist_id), cached_get_artist_top_tracks(artist_id))
+    top_track_ids = [track['id'] for track in top_tracks['tracks']]
+    features = [feature for feature in (await get_audio_features_batch(top_track_ids)).values() if feature]
+    # The artist's sound: mean of its top tracks' features
+    centroid = {key: sum(feature.get(key) or 0 for feature in features) / len(features) for key in FEATURE_NAMES} if features else None
+    return {
+        'id': artist_id,
+        'name': artist['name'],
+        'genres': (artist.get('genres') or [])[:2],
+        'top_track_ids': top_track_ids,
+        'features': centroid,
+    }
+
+async def get_artist_profile(artist_id):
+    """Artist metadata, top tracks and feature centroid, built from cached Spotify data and cached for a day."""
+    return await cached_operation(_build_artist_profile, f"artist_profile:{artist_id}", artist_id, expiration=SEED_PROFILE_TTL)
+
+async def create_playlist_from_artist(artist_id, target_count=100, max_iterations=10):
+    try:
+        profile = await get_artist_profile(artist_id)
+        seed_tracks = profile['top_track_ids'][:2]
+        base_params = {f"target_{key}": profile['features'][key] for key in SEED_FEATURES} if profile['features'] else {}
+        
+        async def run_round(round_index):
+            return await get_recommendations(seed_tracks, [artist_id], None, target_count, **_jittered(base_params, round_index))
+        
+        all_recommended_tracks = await fan_out_rounds(run_round, target_count, max_iterations, round_yield=recommendation_limit(target_count))
+        feature_index.tag(all_recommended_tracks, profile['genres'])
+        if not profile['features']:
+            return require_fill(all_recommended_tracks[:target_count], target_count, f"artist {artist_id}")
+        ranked = await filter_and_rank_tracks(None, all_recommended_tracks, target_count, profile['features'])
+        return require_fill(ranked, target_count, f"artist {artist_id}")
+    except Exception as e:
+        logger.error(f"Unexpected error in create_playlist_from_artist: {str(e)}")
+        raise
+
 async def create_playlist(name, tracks):
     try:
-        playlist = await asyncio.to_thread(sp.user_playlist_create, SPOTIFY_USERNAME, name, public=True, description="Created by @AR_MUSICLAND_BOT")
-        await asyncio.to_thread(sp.playlist_add_items, playlist['id'], tracks)
-        logger.info(f"Playlist successfully created: {playlist['external_urls']['spotify']}")
-        return playlist['external_urls']['spotify']
+        playlist_link = await publish_playlist(name, tracks)
+        logger.info(f"Playlist successfully created: {playlist_link}")
+        return playlist_link
     except Exception as e:
         logger.error(f"Error in create_playlist: {str(e)}")
         raise
 
 async def analyze_playlist_diversity(tracks):
-    features = await get_audio_features_batch(tracks)
-    diversity_scores = defaultdict(list)
-    
-    for feature in features.values():
-        for key in ['danceability', 'energy', 'valence', 'acousticness', 'instrumentalness']:
-            diversity_scores[key].append(feature.get(key, 0))
-    
-    diversity_report = {}
-    for key, values in diversity_scores.items():
-        diversity_report[key] = {
-            'mean': sum(values) / len(values),
-            'range': max(values) - min(values)
-        }
-    
-    return diversity_report
+    # For a playlist built elsewhere: indexed tracks are read from the index, only the rest are fetched
+    stats = DiversityStats()
+    found, matrix = feature_index.vectors(tracks)
+    found = set(found)
+    missing = [track_id for track_id in tracks if track_id not in found]
+    if missing:
+        features = await get_audio_features_batch(missing)
+        stats.update(feature_matrix([features[track_id] for track_id in missing if features.get(track_id)]))
+    stats.update(matrix)
+    return stats.report()
 
 # Use the diversity analysis function
 async def create_and_analyze_playlist(name, seed_track_id, target_count=100):
-    tracks = await create_playlist_from_song(seed_track_id, target_count)
+    # The report is merged from ranking's own matrix as the playlist is built, with no second pass
+    stats = DiversityStats()
+    tracks = await create_playlist_from_song(seed_track_id, target_count, stats=stats)
     playlist_url = await create_playlist(name, tracks)
-    diversity_report = await analyze_playlist_diversity(tracks)
+    diversity_report = stats.report()
     
     logger.info(f"Playlist diversity analysis:\n{diversity_report}")
     return playlist_url, diversity_report
\ No newline at end of file
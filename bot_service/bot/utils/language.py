@@ -33,7 +33,14 @@ LANGS = {
         'create_playlist': "Create Another Playlist",
         'explore_more_music': "Explore More Music",
         'playlist_created': "Your personalized playlist '{}' has been created with high precision! 🎉\nEnjoy your music here: {}",
-        'playlist_creation_error': "Oops! We encountered an issue while crafting your perfect playlist. Let's try again!"
+        'playlist_creation_error': "Oops! We encountered an issue while crafting your perfect playlist. Let's try again!",
+        'playlist_queued': "⏳ Your playlist is in the queue and will appear here shortly.",
+        'playlist_job_duplicate': "⏳ This playlist is already being prepared. It will appear in the message where you requested it.",
+        'playlist_job_limit': "⏳ You already have playlists being prepared. Please wait for them to finish before starting another.",
+        'playlist_progress_tracks': "🎧 Picking tracks for your playlist...",
+        'playlist_progress_spotify': "🎶 Creating your playlist on Spotify...",
+        'playlist_progress_streaming': "🎶 Your playlist is taking shape: {}\n\n{} of {} tracks added so far, more are on the way...",
+        'playlist_progress_saving': "💾 Almost done, saving your playlist..."
     },
     
     'fa': {
@@ -68,7 +75,14 @@ LANGS = {
         'create_playlist': "ایجاد پلی‌لیست دیگر",
         'explore_more_music': "کاوش موسیقی بیشتر",
         'playlist_created': "پلی‌لیست شخصی‌سازی شده شما با نام '{}' با دقت بالا ایجاد شد! 🎉\nموسیقی خود را اینجا گوش دهید: {}",
-        'playlist_creation_error': "اوه! در ساخت پلی‌لیست دلخواه شما مشکلی پیش آمد. دوباره امتحان کنیم!"
+        'playlist_creation_error': "اوه! در ساخت پلی‌لیست دلخواه شما مشکلی پیش آمد. دوباره امتحان کنیم!",
+        'playlist_queued': "⏳ پلی‌لیست شما در صف است و به‌زودی همین‌جا نمایش داده می‌شود.",
+        'playlist_job_duplicate': "⏳ این پلی‌لیست در حال آماده شدن است و در پیامی که آن را درخواست کردید نمایش داده می‌شود.",
+        'playlist_job_limit': "⏳ پلی‌لیست‌های دیگری از شما در حال آماده شدن هستند. لطفاً پیش از شروع پلی‌لیست جدید منتظر بمانید.",
+        'playlist_progress_tracks': "🎧 در حال انتخاب آهنگ‌های پلی‌لیست شما...",
+        'playlist_progress_spotify': "🎶 در حال ساخت پلی‌لیست شما در اسپاتیفای...",
+        'playlist_progress_streaming': "🎶 پلی‌لیست شما در حال شکل‌گیری است: {}\n\n{} از {} آهنگ تا اینجا اضافه شده، بقیه در راه است...",
+        'playlist_progress_saving': "💾 تقریباً تمام است، در حال ذخیره پلی‌لیست شما..."
     }
 }
 
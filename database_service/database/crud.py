@@ -1,11 +1,12 @@
 #crud.py
 from sqlalchemy.orm import Session, joinedload
 from . import models, redis_client, user_cache, language_cache
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Tuple
 import json
 from logging_config import setup_logging
 from sqlalchemy.exc import SQLAlchemyError
-from datetime import datetime
+from datetime import datetime, timedelta
+from sqlalchemy import func
 from cachetools import cached
 import uuid
 
@@ -112,6 +113,16 @@ def update_playlist_track_count(db: Session, spotify_playlist_id: str, track_cou
         db.rollback()
         raise
 
+def get_most_added_tracks(db: Session, limit: int, days: int = 30) -> List[Tuple[str, int]]:
+    """(spotify_track_id, times added) for the tracks added to playlists most often in the last `days`."""
+    since = datetime.utcnow() - timedelta(days=days)
+    track_count = func.count(models.PlaylistTrack.id)
+    return db.query(models.PlaylistTrack.spotify_track_id, track_count)\
+        .filter(models.PlaylistTrack.added_at >= since)\
+        .group_by(models.PlaylistTrack.spotify_track_id)\
+        .order_by(track_count.desc())\
+        .limit(limit).all()
+
 # Other functions remain the same...
 
 # Placeholder function for notifying clients about language updates
@@ -1,32 +1,41 @@
 #api.py
-import spotipy
-from spotipy.oauth2 import SpotifyClientCredentials
-import os
-import asyncio
 from logging_config import setup_logging
-from asyncio_throttle import Throttler
 from typing import Dict, Any
-from tenacity import retry, stop_after_attempt, wait_exponential
-from config import SPOTIFY_CLIENT_ID, SPOTIFY_CLIENT_SECRET
+from spotipy.exceptions import SpotifyException
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential
+from .client import spotify_client, CIRCUIT_OPEN_REASON
+from .quota import retry_after_seconds
 
-client_credentials_manager = SpotifyClientCredentials(
-    client_id=SPOTIFY_CLIENT_ID,
-    client_secret=SPOTIFY_CLIENT_SECRET
-)
-
-sp = spotipy.Spotify(client_credentials_manager=client_credentials_manager)
+sp = spotify_client
 
 logger = setup_logging(logstash_host='localhost', logstash_port=5000)
 
-throttler = Throttler(rate_limit=1000, period=3600)  # 1000 requests per hour
-
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
-async def retry_with_backoff(coroutine):
-    return await coroutine
-
+backoff = wait_exponential(multiplier=1, min=4, max=10)
+MAX_RETRY_WAIT = 3  # Longer Retry-Afters fail fast; the shared quota pause keeps everyone off Spotify meanwhile
+
+def is_retryable(exc):
+    # 4xx other than 429 will fail the same way again and only burn quota
+    if not isinstance(exc, SpotifyException):
+        return True
+    if exc.reason == CIRCUIT_OPEN_REASON:
+        return False
+    if exc.http_status == 429:
+        # Callers are waiting on a Telegram answer; don't sit out a long rate-limit window for them
+        return retry_after_seconds(exc) <= MAX_RETRY_WAIT
+    return exc.http_status >= 500
+
+def wait_retry_after(retry_state):
+    retry_after = retry_after_seconds(retry_state.outcome.exception())
+    return retry_after if retry_after is not None else backoff(retry_state)
+
+# Takes the function rather than a coroutine: an awaited coroutine cannot be awaited again on retry
+@retry(stop=stop_after_attempt(3), wait=wait_retry_after, retry=retry_if_exception(is_retryable), reraise=True)
+async def retry_with_backoff(func, *args, **kwargs):
+    return await func(*args, **kwargs)
+
+# Every request through spotify_client already draws from the cluster-wide quota (see quota.py)
 async def throttled_spotify_request(func, *args, **kwargs):
-    async with throttler:
-        return await retry_with_backoff(asyncio.to_thread(func, *args, **kwargs))
+    return await retry_with_backoff(func, *args, **kwargs)
 
 async def search_track(query):
     return await throttled_spotify_request(sp.search, q=query, type='track', limit=10)
@@ -34,6 +43,9 @@ async def search_track(query):
 async def get_artist(artist_id):
     return await throttled_spotify_request(sp.artist, artist_id)
 
+async def get_artist_top_tracks(artist_id):
+    return await throttled_spotify_request(sp.artist_top_tracks, artist_id)
+
 async def get_recommendations(seed_tracks, limit=100):
     return await throttled_spotify_request(sp.recommendations, seed_tracks=seed_tracks, limit=limit)
 
@@ -44,5 +56,5 @@ async def spotify_search(query: str, search_type: str, limit: int):
 CACHE_EXPIRATION = 86400  # 24 hours
 
 async def cached_spotify_search(query: str, search_type: str, limit: int) -> Dict[str, Any]:
-    from .cache import cached_operation
-    return await cached_operation(spotify_search, f"spotify_search:{query}:{search_type}:{limit}", query, search_type, limit, expiration=CACHE_EXPIRATION)
+    from .cache import cached_spotify_search as _cached_spotify_search
+    return await _cached_spotify_search(query, search_type, limit)
@@ -0,0 +1,144 @@
+#auth.py
+import asyncio
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+from redis.exceptions import RedisError
+from .redis_client import get_redis_pool
+from logging_config import setup_logging
+
+logger = setup_logging(logstash_host='localhost', logstash_port=5000)
+
+TOKEN_KEY = "spotify_token"  # Hash: access_token, expires_at (epoch seconds)
+TOKEN_LOCK_KEY = "spotify_token:lock"
+TOKEN_LOCK_TTL = 10
+TOKEN_REFRESH_MARGIN = 300  # Start refreshing in the background this many seconds before expiry
+TOKEN_MIN_VALIDITY = 30  # Never hand out a token that expires sooner than this
+TOKEN_POLL_INTERVAL = 0.05
+
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# Drop the shared token only if it is still the one that was rejected
+DISCARD_TOKEN_SCRIPT = """
+if redis.call('hget', KEYS[1], 'access_token') == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class SpotifyTokenManager:
+    """Client-credentials access token shared by every process through Redis.
+
+    `fetch_token()` must return Spotify's token response (access_token, expires_in).
+    One process refreshes under an NX lock while the token still has
+    TOKEN_REFRESH_MARGIN seconds left; the others keep using the current token and
+    pick up the new one from Redis. With `shared=False`, or while Redis is down,
+    the token is fetched and kept per process.
+    """
+
+    def __init__(self, fetch_token: Callable[[], Awaitable[Dict[str, Any]]], shared: bool = True):
+        self.fetch_token = fetch_token
+        self.shared = shared
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.stats = {'fetches': 0, 'shared_reads': 0, 'background_refreshes': 0}
+
+    def _valid(self, expires_at: float, margin: float = TOKEN_MIN_VALIDITY) -> bool:
+        return time.time() + margin < expires_at
+
+    async def get_token(self) -> str:
+        if self._token and self._valid(self._expires_at, TOKEN_REFRESH_MARGIN):
+            return self._token
+        async with self._lock:
+            if not (self._token and self._valid(self._expires_at)):
+                await self._load()
+            if self.shared and not self._valid(self._expires_at, TOKEN_REFRESH_MARGIN):
+                self._schedule_refresh()
+            return self._token
+
+    async def invalidate(self, token: Optional[str] = None) -> None:
+        """Forget `token` (default: the current one) here and, if it is still shared, in Redis."""
+        token = token or self._token
+        if token == self._token:
+            self._token, self._expires_at = None, 0.0
+        if self.shared and token:
+            try:
+                redis = await get_redis_pool()
+                await redis.eval(DISCARD_TOKEN_SCRIPT, 1, TOKEN_KEY, token)
+            except Exception as e:
+                logger.error(f"Error discarding shared Spotify token: {str(e)}")
+
+    async def _load(self) -> None:
+        """Adopt a valid shared token, or fetch one; waits for another process's refresh if one is running."""
+        if not self.shared:
+            await self._fetch()
+            return
+        try:
+            redis = await get_redis_pool()
+            deadline = time.monotonic() + TOKEN_LOCK_TTL
+            while True:
+                if await self._read_shared(redis):
+                    return
+                if await self._refresh_shared(redis):
+                    return
+                if time.monotonic() > deadline:
+                    break
+                await asyncio.sleep(TOKEN_POLL_INTERVAL)
+        except RedisError as e:
+            logger.error(f"Shared Spotify token unavailable, fetching locally: {str(e)}")
+        await self._fetch()
+
+    async def _read_shared(self, redis) -> bool:
+        token, expires_at = await redis.hmget(TOKEN_KEY, 'access_token', 'expires_at')
+        if token and expires_at and self._valid(float(expires_at)):
+            self._token, self._expires_at = token, float(expires_at)
+            self.stats['shared_reads'] += 1
+            return True
+        return False
+
+    async def _refresh_shared(self, redis) -> bool:
+        """Fetch and publish a new token if this process wins the lock; False if another process holds it."""
+        lock_token = uuid.uuid4().hex
+        if not await redis.set(TOKEN_LOCK_KEY, lock_token, nx=True, ex=TOKEN_LOCK_TTL):
+            return False
+        try:
+            await self._fetch()
+            pipe = redis.pipeline(transaction=True)
+            pipe.hset(TOKEN_KEY, mapping={'access_token': self._token, 'expires_at': self._expires_at})
+            pipe.expireat(TOKEN_KEY, int(self._expires_at))
+            await pipe.execute()
+            return True
+        finally:
+            await redis.eval(RELEASE_LOCK_SCRIPT, 1, TOKEN_LOCK_KEY, lock_token)
+
+    async def _fetch(self) -> None:
+        token_info = await self.fetch_token()
+        self.stats['fetches'] += 1
+        self._token = token_info['access_token']
+        self._expires_at = time.time() + token_info.get('expires_in', 3600)
+
+    def _schedule_refresh(self) -> None:
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+        self._refresh_task = asyncio.create_task(self._background_refresh())
+
+    async def _background_refresh(self) -> None:
+        try:
+            redis = await get_redis_pool()
+            # Someone may already have refreshed; only fetch if the shared token is also close to expiry
+            token, expires_at = await redis.hmget(TOKEN_KEY, 'access_token', 'expires_at')
+            if token and expires_at and self._valid(float(expires_at), TOKEN_REFRESH_MARGIN):
+                self._token, self._expires_at = token, float(expires_at)
+                return
+            if await self._refresh_shared(redis):
+                self.stats['background_refreshes'] += 1
+        except Exception as e:
+            logger.error(f"Error refreshing shared Spotify token: {str(e)}")
@@ -1,56 +1,406 @@
-#cache.py
-import json
-from typing import Dict, Any, List
-from .api import search_track, get_artist, get_recommendations, spotify_search
-from .redis_client import get_redis_pool
-from logging_config import setup_logging
-
-CACHE_EXPIRATION = 3600  # 1 hour in seconds
-
-logger = setup_logging(logstash_host='localhost', logstash_port=5000)
-
-async def cached_operation(operation, cache_key, *args, **kwargs):
-    redis = await get_redis_pool()
-    try:
-        cached_result = await redis.get(cache_key)
-        if cached_result:
-            return json.loads(cached_result)
-        
-        result = await operation(*args, **kwargs)
-        await redis.setex(cache_key, CACHE_EXPIRATION, json.dumps(result))
-        return result
-    except Exception as e:
-        logger.error(f"Error in cached operation: {str(e)}")
-        return await operation(*args, **kwargs)
-
-async def cached_search_track(query: str) -> List[Dict[str, Any]]:
-    return await cached_operation(search_track, f"search_track:{query}", query)
-
-async def cached_get_artist(artist_id: str) -> Dict[str, Any]:
-    return await cached_operation(get_artist, f"artist:{artist_id}", artist_id)
-
-async def cached_get_recommendations(seed_tracks_key: str, limit: int = 100) -> List[Dict[str, Any]]:
-    return await cached_operation(get_recommendations, f"recommendations:{seed_tracks_key}:{limit}", seed_tracks_key.split(','), limit)
-
-async def cached_spotify_search(query: str, search_type: str, limit: int) -> Dict[str, Any]:
-    return await cached_operation(spotify_search, f"spotify_search:{query}:{search_type}:{limit}", query, search_type, limit)
-
-async def bulk_cache_operation(operations):
-    redis = await get_redis_pool()
-    pipe = redis.pipeline()
-    results = []
-    for op, cache_key, args, kwargs in operations:
-        try:
-            cached_result = await redis.get(cache_key)
-            if cached_result:
-                results.append(json.loads(cached_result))
-            else:
-                result = await op(*args, **kwargs)
-                results.append(result)
-                pipe.setex(cache_key, CACHE_EXPIRATION, json.dumps(result))
-        except Exception as e:
-            logger.error(f"Error in bulk cache operation: {str(e)}")
-            results.append(await op(*args, **kwargs))
-    
-    await pipe.execute()
+#cache.py
+import asyncio
+import time
+from collections import Counter
+from typing import Dict, Any, List, Optional, Tuple
+from spotipy.exceptions import SpotifyException
+from .api import search_track, get_artist, get_artist_top_tracks, get_recommendations, spotify_search
+from .redis_client import get_redis_pool, get_binary_redis_client
+from .singleflight import SingleFlight
+from .near_cache import near_cache, publish_invalidation, ensure_invalidation_listener, key_family, INVALIDATION_CHANNEL, PROCESS_ID
+from .codec import encode, decode, project, encode_tombstone, is_empty, Tombstone
+from .query import clean_query, normalize_query, prefix_candidates, filter_results
+from logging_config import setup_logging
+
+CACHE_EXPIRATION = 3600  # 1 hour in seconds
+# Stale-while-revalidate: entries are fresh for the soft TTL and may be served stale until the hard TTL
+SWR_HARD_TTL = 86400  # 24 hours
+SWR_REFRESH_LEASE = 30  # Seconds one process owns the background refresh of a key
+# A longer query is answered from a cached prefix's results when at least this many still match
+PREFIX_REUSE_MIN_RESULTS = 3
+BATCH_CONCURRENCY = 4  # Spotify calls in flight per batch lookup
+# Negative caching: empty results and deterministic Spotify errors are remembered briefly as tombstones
+NEGATIVE_TTL_EMPTY = 300  # Empty search/recommendation results; the catalog grows, so keep this short
+NEGATIVE_TTL_ERROR = 900  # 404s and 400 "invalid ..." errors (unknown ids, bad seeds)
+NEGATIVE_NEAR_TTL = 60  # Seconds a tombstone read from Redis is also kept in memory
+
+logger = setup_logging(logstash_host='localhost', logstash_port=5000)
+
+single_flight = SingleFlight()
+_refresh_tasks: Dict[str, asyncio.Task] = {}
+swr_stats = {'stale_hits': 0, 'refreshes': 0, 'refresh_errors': 0}
+prefix_stats = {'prefix_hits': 0, 'prefix_misses': 0}
+negative_stats = {'negative_hits': 0, 'negative_stored': 0}
+# Reads per cache key since the last drain; the warm-up scheduler (warmup.py) ranks keys by them
+access_counts: Counter = Counter()
+
+def _encode(result, soft_ttl=None) -> bytes:
+    return encode(result, time.time() + soft_ttl if soft_ttl is not None else None)
+
+def _decode(cached_result) -> Optional[Tuple[Any, bool]]:
+    """Return (value, is_stale), or None when there is no readable entry; entries written without SWR are never stale."""
+    decoded = decode(cached_result)
+    if decoded is None:
+        return None
+    value, fresh_until = decoded
+    return value, fresh_until is not None and time.time() > fresh_until
+
+def _negative_ttl(exc) -> Optional[int]:
+    """TTL for caching `exc` as a tombstone, or None when the same call may succeed on retry."""
+    if not isinstance(exc, SpotifyException):
+        return None
+    if exc.http_status == 404 or (exc.http_status == 400 and 'invalid' in str(exc.msg).lower()):
+        return NEGATIVE_TTL_ERROR
+    return None
+
+def _resolve(value):
+    """Turn a tombstone back into what the original call did: raise its error or return its empty result."""
+    if isinstance(value, Tombstone):
+        negative_stats['negative_hits'] += 1
+        if value.status >= 400:
+            raise SpotifyException(value.status, -1, value.message)
+        return value.value
+    return value
+
+async def _store_negative(redis, cache_key, tombstone: Tombstone, ttl: int) -> None:
+    payload = encode_tombstone(tombstone)
+    near_cache.set(cache_key, tombstone, len(payload), ttl=min(ttl, NEGATIVE_NEAR_TTL))
+    negative_stats['negative_stored'] += 1
+    if redis is not None:
+        try:
+            await redis.setex(cache_key, ttl, payload)
+        except Exception as e:
+            logger.error(f"Error writing negative cache entry for {cache_key}: {str(e)}")
+
+async def _refresh(cache_key, load, redis):
+    try:
+        # Only one process refreshes a stale key; the rest keep serving the stale value
+        if not await redis.set(f"swr_refresh:{cache_key}", 1, nx=True, ex=SWR_REFRESH_LEASE):
+            return
+        swr_stats['refreshes'] += 1
+        await single_flight.do(cache_key, load)
+    except Exception as e:
+        swr_stats['refresh_errors'] += 1
+        logger.error(f"Error refreshing stale cache entry {cache_key}: {str(e)}")
+
+def _schedule_refresh(cache_key, load, redis):
+    if cache_key in _refresh_tasks:
+        return
+    task = asyncio.create_task(_refresh(cache_key, load, redis))
+    _refresh_tasks[cache_key] = task
+    task.add_done_callback(lambda t: _refresh_tasks.pop(cache_key, None))
+
+async def cached_operation(operation, cache_key, *args, expiration=CACHE_EXPIRATION, soft_ttl=None, on_miss=None, **kwargs):
+    """Read-through cache for a Spotify call.
+
+    With soft_ttl set the entry lives for `expiration` seconds in Redis but is only
+    fresh for `soft_ttl`; in between, the stale value is returned immediately and
+    refreshed in a background task. `on_miss(redis)` may answer a Redis miss from
+    other cached data before Spotify is called; its answer is not cached, and the
+    exact key is loaded in the background so later reads get the real results.
+    Empty results, 404s and invalid-argument errors are cached briefly as
+    tombstones and replayed (returned or raised again) without calling Spotify.
+    """
+    access_counts[cache_key] += 1
+    result = near_cache.get(cache_key)
+    if result is not None:
+        return _resolve(result)
+
+    redis = await get_binary_redis_client()
+
+    async def load():
+        try:
+            # Only the fields callers read are kept (see codec.PROJECTIONS), for fresh loads and hits alike
+            result = project(key_family(cache_key), await operation(*args, **kwargs))
+        except Exception as e:
+            ttl = _negative_ttl(e)
+            if ttl is not None:
+                await _store_negative(redis, cache_key, Tombstone(e.http_status, e.msg), ttl)
+            raise
+        if is_empty(result):
+            await _store_negative(redis, cache_key, Tombstone(200, '', result), NEGATIVE_TTL_EMPTY)
+            return result
+        payload = _encode(result, soft_ttl)
+        near_cache.set(cache_key, result, len(payload))
+        if redis is not None:
+            try:
+                await redis.setex(cache_key, expiration, payload)
+                await publish_invalidation(redis, cache_key)
+            except Exception as e:
+                logger.error(f"Error writing cache for {cache_key}: {str(e)}")
+        return result
+
+    cached = None
+    try:
+        ensure_invalidation_listener(get_redis_pool)
+        cached_result = await redis.get(cache_key)
+        decoded = _decode(cached_result)
+        if decoded is not None:
+            cached, stale = decoded
+            if isinstance(cached, Tombstone):
+                near_cache.set(cache_key, cached, len(cached_result), ttl=NEGATIVE_NEAR_TTL)
+            elif stale:
+                swr_stats['stale_hits'] += 1
+                _schedule_refresh(cache_key, load, redis)
+            else:
+                near_cache.set(cache_key, cached, len(cached_result))
+        elif on_miss is not None:
+            result = await on_miss(redis)
+            if result is not None:
+                _schedule_refresh(cache_key, load, redis)
+                return result
+    except Exception as e:
+        logger.error(f"Error in cached operation: {str(e)}")
+        # Redis is unavailable; still coalesce callers in this process, just skip the cross-process lease
+        redis = None
+    if cached is not None:
+        return _resolve(cached)
+
+    async def probe():
+        decoded = _decode(await redis.get(cache_key))
+        return decoded[0] if decoded is not None else None
+
+    # Waiters on another process's load may be handed the tombstone it wrote
+    return _resolve(await single_flight.do(cache_key, load, redis=redis, probe=probe))
+
+async def tombstoned_operation(operation, cache_key, *args, **kwargs):
+    """Call `operation` without caching its results, but remember deterministic failures.
+
+    For calls whose results must stay live (e.g. jittered recommendations): a
+    404 or invalid-argument error is stored as a tombstone under `cache_key` and
+    raised again for repeat calls without reaching Spotify.
+    """
+    tombstone = near_cache.get(cache_key)
+    redis = None
+    try:
+        redis = await get_binary_redis_client()
+        if tombstone is None:
+            decoded = _decode(await redis.get(cache_key))
+            if decoded is not None and isinstance(decoded[0], Tombstone):
+                tombstone = decoded[0]
+                near_cache.set(cache_key, tombstone, len(encode_tombstone(tombstone)), ttl=NEGATIVE_NEAR_TTL)
+    except Exception as e:
+        logger.error(f"Error reading negative cache entry for {cache_key}: {str(e)}")
+    if isinstance(tombstone, Tombstone):
+        return _resolve(tombstone)
+    try:
+        return await operation(*args, **kwargs)
+    except Exception as e:
+        ttl = _negative_ttl(e)
+        if ttl is not None:
+            await _store_negative(redis, cache_key, Tombstone(e.http_status, e.msg), ttl)
+        raise
+
+def get_single_flight_stats() -> Dict[str, int]:
+    return single_flight.stats()
+
+def get_near_cache_stats() -> Dict[str, int]:
+    return near_cache.stats()
+
+def get_swr_stats() -> Dict[str, int]:
+    return dict(swr_stats, refreshing=len(_refresh_tasks))
+
+def get_prefix_stats() -> Dict[str, int]:
+    return dict(prefix_stats)
+
+def get_negative_cache_stats() -> Dict[str, int]:
+    return dict(negative_stats)
+
+def drain_access_counts() -> Dict[str, int]:
+    counts = dict(access_counts)
+    access_counts.clear()
+    return counts
+
+def forget_access(cache_keys) -> None:
+    """Take back reads the bot made itself (e.g. while warming) so they do not count as demand."""
+    access_counts.subtract(cache_keys)
+    for cache_key in [key for key, count in access_counts.items() if count <= 0]:
+        del access_counts[cache_key]
+
+def _search_key(query: str, search_type: str, limit: int) -> str:
+    return f"spotify_search:{query}:{search_type}:{limit}"
+
+def _prefix_lookup(query: str, search_type: str, limit: int):
+    async def lookup(redis):
+        candidates = prefix_candidates(query)
+        if not candidates:
+            return None
+        cached_results = await redis.mget([_search_key(prefix, search_type, limit) for prefix in candidates])
+        for cached_result in cached_results:
+            decoded = _decode(cached_result)
+            if decoded is None or isinstance(decoded[0], Tombstone):
+                continue
+            items = filter_results(decoded[0], search_type, query)
+            if len(items) >= min(limit, PREFIX_REUSE_MIN_RESULTS):
+                prefix_stats['prefix_hits'] += 1
+                return {f"{search_type}s": {'items': items}}
+        prefix_stats['prefix_misses'] += 1
+        return None
+    return lookup
+
+async def cached_search_track(query: str) -> List[Dict[str, Any]]:
+    # Spellings that normalize alike share one entry, but Spotify gets the text as typed
+    return await cached_operation(search_track, f"search_track:{normalize_query(query)}", clean_query(query),
+                                  expiration=SWR_HARD_TTL, soft_ttl=CACHE_EXPIRATION)
+
+async def cached_get_artist(artist_id: str) -> Dict[str, Any]:
+    return await cached_operation(get_artist, f"artist:{artist_id}", artist_id, expiration=SWR_HARD_TTL, soft_ttl=CACHE_EXPIRATION)
+
+async def cached_get_artist_top_tracks(artist_id: str) -> Dict[str, Any]:
+    return await cached_operation(get_artist_top_tracks, f"artist_top_tracks:{artist_id}", artist_id, expiration=SWR_HARD_TTL, soft_ttl=CACHE_EXPIRATION)
+
+async def cached_get_recommendations(seed_tracks_key: str, limit: int = 100) -> List[Dict[str, Any]]:
+    return await cached_operation(get_recommendations, f"recommendations:{seed_tracks_key}:{limit}", seed_tracks_key.split(','), limit)
+
+async def cached_spotify_search(query: str, search_type: str, limit: int, reuse_prefix: bool = True) -> Dict[str, Any]:
+    normalized = normalize_query(query)
+    on_miss = _prefix_lookup(normalized, search_type, limit) if reuse_prefix else None
+    return await cached_operation(spotify_search, _search_key(normalized, search_type, limit), clean_query(query), search_type, limit,
+                                  expiration=SWR_HARD_TTL, soft_ttl=CACHE_EXPIRATION, on_miss=on_miss)
+
+async def cached_batch_lookup(ids, key_prefix: str, fetch_chunk, chunk_size: int, expiration: int,
+                              concurrency: int = BATCH_CONCURRENCY) -> Dict[str, Any]:
+    """Resolve many ids against `{key_prefix}:{id}` keys in three steps.
+
+    One MGET finds the cached ids. The misses are split into chunks of `chunk_size`
+    and `fetch_chunk(chunk)` runs concurrently for them; it must return values in
+    chunk order. One pipeline writes the new values back. Ids Spotify has no data
+    for are left out of the result and remembered as tombstones for a while.
+    """
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        return {}
+    redis = await get_binary_redis_client()
+    try:
+        cached_results = await redis.mget([f"{key_prefix}:{item_id}" for item_id in ids])
+    except Exception as e:
+        logger.error(f"Error reading {key_prefix} batch from cache: {str(e)}")
+        cached_results, redis = [None] * len(ids), None
+
+    found, missing = {}, []
+    for item_id, cached_result in zip(ids, cached_results):
+        decoded = _decode(cached_result)
+        if decoded is None:
+            missing.append(item_id)
+        elif isinstance(decoded[0], Tombstone):
+            negative_stats['negative_hits'] += 1
+        else:
+            found[item_id] = decoded[0]
+    if not missing:
+        return found
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(chunk):
+        async with semaphore:
+            return chunk, await fetch_chunk(chunk)
+
+    chunks = [missing[i:i + chunk_size] for i in range(0, len(missing), chunk_size)]
+    fetched = await asyncio.gather(*[fetch(chunk) for chunk in chunks], return_exceptions=True)
+    errors = [item for item in fetched if isinstance(item, Exception)]
+    if len(errors) == len(chunks):
+        raise errors[0]
+
+    pipe = redis.pipeline(transaction=False) if redis is not None else None
+    for item in fetched:
+        if isinstance(item, Exception):
+            logger.error(f"Error fetching {key_prefix} batch: {str(item)}")
+            continue
+        chunk, values = item
+        for item_id, value in zip(chunk, values or []):
+            if value:
+                value = project(key_prefix, value)
+                found[item_id] = value
+                if pipe is not None:
+                    pipe.setex(f"{key_prefix}:{item_id}", expiration, _encode(value))
+            elif pipe is not None:
+                negative_stats['negative_stored'] += 1
+                pipe.setex(f"{key_prefix}:{item_id}", NEGATIVE_TTL_ERROR, encode_tombstone(Tombstone(404, 'not found')))
+    if pipe is not None:
+        try:
+            await pipe.execute()
+        except Exception as e:
+            logger.error(f"Error writing {key_prefix} batch to cache: {str(e)}")
+    return found
+
+def _hit(value) -> Dict[str, Any]:
+    try:
+        return {'status': 'hit', 'value': _resolve(value), 'error': None}
+    except SpotifyException as e:
+        return {'status': 'error', 'value': None, 'error': e}
+
+async def bulk_cache_operation(operations, expiration=CACHE_EXPIRATION, concurrency=BATCH_CONCURRENCY) -> List[Dict[str, Any]]:
+    """Resolve unrelated `(operation, cache_key, args, kwargs)` tuples in one batch.
+
+    One MGET reads every key, the misses run concurrently (at most `concurrency`
+    at a time) and one pipeline writes their results. Returns, in input order,
+    `{'status': 'hit' | 'miss' | 'error', 'value': ..., 'error': ...}` per operation;
+    a failed operation does not fail the others. Negative entries are replayed as
+    hits, or as errors when the tombstone holds one.
+    """
+    results: List[Dict[str, Any]] = [None] * len(operations)
+    pending = []
+    for index, (op, cache_key, args, kwargs) in enumerate(operations):
+        value = near_cache.get(cache_key)
+        if value is not None:
+            results[index] = _hit(value)
+        else:
+            pending.append(index)
+    if not pending:
+        return results
+
+    redis = await get_binary_redis_client()
+    try:
+        ensure_invalidation_listener(get_redis_pool)
+        cached_results = await redis.mget([operations[index][1] for index in pending])
+    except Exception as e:
+        logger.error(f"Error reading bulk cache operation keys: {str(e)}")
+        cached_results, redis = [None] * len(pending), None
+
+    misses = []
+    for index, cached_result in zip(pending, cached_results):
+        decoded = _decode(cached_result)
+        if decoded is not None:
+            ttl = NEGATIVE_NEAR_TTL if isinstance(decoded[0], Tombstone) else None
+            near_cache.set(operations[index][1], decoded[0], len(cached_result), ttl=ttl)
+            results[index] = _hit(decoded[0])
+        else:
+            misses.append(index)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(index):
+        op, cache_key, args, kwargs = operations[index]
+        async with semaphore:
+            # Identical keys in one batch (or in concurrent callers) share a single Spotify call
+            return await single_flight.do(cache_key, lambda: op(*args, **(kwargs or {})))
+
+    outcomes = await asyncio.gather(*[run(index) for index in misses], return_exceptions=True)
+    pipe = redis.pipeline(transaction=False) if redis is not None else None
+    for index, outcome in zip(misses, outcomes):
+        cache_key = operations[index][1]
+        if isinstance(outcome, Exception):
+            logger.error(f"Error in bulk cache operation for {cache_key}: {str(outcome)}")
+            results[index] = {'status': 'error', 'value': None, 'error': outcome}
+            ttl = _negative_ttl(outcome)
+            if ttl is not None and pipe is not None:
+                negative_stats['negative_stored'] += 1
+                pipe.setex(cache_key, ttl, encode_tombstone(Tombstone(outcome.http_status, outcome.msg)))
+            continue
+        value = project(key_family(cache_key), outcome)
+        if is_empty(value):
+            payload, ttl, near_ttl = encode_tombstone(Tombstone(200, '', value)), NEGATIVE_TTL_EMPTY, NEGATIVE_NEAR_TTL
+            negative_stats['negative_stored'] += 1
+        else:
+            payload, ttl, near_ttl = _encode(value), expiration, None
+        near_cache.set(cache_key, value, len(payload), ttl=near_ttl)
+        if pipe is not None:
+            pipe.setex(cache_key, ttl, payload)
+            pipe.publish(INVALIDATION_CHANNEL, f"{PROCESS_ID}|{cache_key}")
+        results[index] = {'status': 'miss', 'value': value, 'error': None}
+    if pipe is not None and misses:
+        try:
+            await pipe.execute()
+        except Exception as e:
+            logger.error(f"Error writing bulk cache operation results: {str(e)}")
     return results
\ No newline at end of file
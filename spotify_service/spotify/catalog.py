@@ -0,0 +1,61 @@
+#catalog.py
+from typing import Any, Dict, List, Optional
+from .cache import cached_batch_lookup
+from .client import spotify_client
+from .codec import encode
+from .redis_client import get_binary_redis_client
+from logging_config import setup_logging
+
+logger = setup_logging(logstash_host='localhost', logstash_port=5000)
+
+TRACK_META_PREFIX = "track_meta"
+TRACK_META_TTL = 7 * 86400  # Track metadata practically never changes
+TRACKS_CHUNK_SIZE = 50  # Spotify's per-call limit for /tracks
+AUDIO_FEATURE_PREFIX = "audio_feature"
+AUDIO_FEATURES_TTL = 86400  # 24 hours
+AUDIO_FEATURES_CHUNK_SIZE = 100  # Spotify's per-call limit for /audio-features
+
+
+def track_metadata(track: Dict[str, Any]) -> Dict[str, Any]:
+    """The slice of a Spotify track object the bot stores and displays."""
+    artists = track.get('artists') or []
+    return {
+        'id': track['id'],
+        'name': track['name'],
+        'artist': artists[0]['name'] if artists else 'Unknown Artist',
+        'artist_id': artists[0]['id'] if artists else None,
+        'album': (track.get('album') or {}).get('name') or 'Unknown Album',
+        'duration_ms': track.get('duration_ms'),
+        'popularity': track.get('popularity'),
+    }
+
+
+async def _fetch_tracks(track_ids: List[str]) -> List[Optional[Dict[str, Any]]]:
+    response = await spotify_client.tracks(track_ids)
+    return [track_metadata(track) if track else None for track in response['tracks']]
+
+
+async def get_tracks_metadata(track_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Metadata for each known track id; misses are fetched 50 at a time, concurrently."""
+    return await cached_batch_lookup(track_ids, TRACK_META_PREFIX, _fetch_tracks, TRACKS_CHUNK_SIZE, TRACK_META_TTL)
+
+
+async def get_audio_features(track_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Audio features for each track id Spotify has them for; misses are fetched 100 at a time, concurrently."""
+    return await cached_batch_lookup(track_ids, AUDIO_FEATURE_PREFIX, spotify_client.audio_features,
+                                     AUDIO_FEATURES_CHUNK_SIZE, AUDIO_FEATURES_TTL)
+
+
+async def store_tracks_metadata(tracks: List[Dict[str, Any]]) -> None:
+    """Add full track objects we already fetched for another reason to the catalog."""
+    tracks = [track for track in tracks if track and track.get('id')]
+    if not tracks:
+        return
+    try:
+        redis = await get_binary_redis_client()
+        pipe = redis.pipeline(transaction=False)
+        for track in tracks:
+            pipe.setex(f"{TRACK_META_PREFIX}:{track['id']}", TRACK_META_TTL, encode(track_metadata(track)))
+        await pipe.execute()
+    except Exception as e:
+        logger.error(f"Error storing track metadata: {str(e)}")
@@ -0,0 +1,230 @@
+#client.py
+import asyncio
+import json
+import time
+from typing import Any, Dict, List, Optional
+import aiohttp
+from spotipy.exceptions import SpotifyException
+from spotipy.oauth2 import SpotifyOauthError
+from config import SPOTIFY_CLIENT_ID, SPOTIFY_CLIENT_SECRET
+from logging_config import setup_logging
+from .auth import SpotifyTokenManager
+from .quota import spotify_quota, retry_after_seconds
+
+logger = setup_logging(logstash_host='localhost', logstash_port=5000)
+
+SPOTIFY_API_BASE = "https://api.spotify.com/v1"
+SPOTIFY_TOKEN_URL = "https://accounts.spotify.com/api/token"
+MAX_CONNECTIONS = 100
+KEEPALIVE_TIMEOUT = 60
+REQUEST_TIMEOUT = 10
+CIRCUIT_BREAKER_THRESHOLD = 5  # Consecutive 5xx/network failures that open the circuit
+CIRCUIT_BREAKER_TIMEOUT = 60  # seconds
+CIRCUIT_OPEN_REASON = 'CIRCUIT_OPEN'
+
+
+def _get_id(kind: str, value: str) -> str:
+    """Accept a bare id, a spotify:kind:id URI or an open.spotify.com URL, like spotipy does."""
+    if value.startswith('spotify:'):
+        return value.split(':')[-1]
+    if '/' in value:
+        return value.rstrip('/').split('/')[-1].split('?')[0]
+    return value
+
+
+def _get_uri(kind: str, value: str) -> str:
+    if value.startswith('spotify:'):
+        return value
+    return f"spotify:{kind}:{_get_id(kind, value)}"
+
+
+class CircuitBreaker:
+    """Same policy as the API gateway's breaker: open after `threshold` failures, retry after `timeout`."""
+
+    def __init__(self, threshold=CIRCUIT_BREAKER_THRESHOLD, timeout=CIRCUIT_BREAKER_TIMEOUT):
+        self.threshold = threshold
+        self.timeout = timeout
+        self.failures = 0
+        self.last_failure_time = 0
+        self.is_open = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.last_failure_time = time.time()
+        if self.failures >= self.threshold:
+            self.is_open = True
+
+    def record_success(self):
+        self.failures = 0
+        self.is_open = False
+
+    def can_execute(self):
+        if not self.is_open:
+            return True
+        if time.time() - self.last_failure_time >= self.timeout:
+            self.is_open = False
+            self.failures = 0
+            return True
+        return False
+
+
+class AsyncSpotifyClient:
+    """Asyncio-native Spotify Web API client on one pooled keep-alive aiohttp session.
+
+    Method names and return values mirror the spotipy calls the bot used, so a
+    `sp.search(...)` becomes `await sp.search(...)`. Errors are raised as
+    spotipy's SpotifyException/SpotifyOauthError so existing handlers keep working.
+    """
+
+    def __init__(self, client_id: str, client_secret: str, api_base: str = SPOTIFY_API_BASE,
+                 token_url: str = SPOTIFY_TOKEN_URL, max_connections: int = MAX_CONNECTIONS,
+                 timeout: float = REQUEST_TIMEOUT, rate_limiter=None, shared_token: bool = False,
+                 circuit_breaker: Optional[CircuitBreaker] = None):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.api_base = api_base.rstrip('/')
+        self.token_url = token_url
+        self.max_connections = max_connections
+        # Anything with `acquire(endpoint)` and `pause(seconds)`, e.g. the shared DistributedTokenBucket
+        self.rate_limiter = rate_limiter
+        # While open, requests fail fast with a 503 instead of waiting on a struggling Spotify
+        self.circuit_breaker = circuit_breaker
+        self._timeout = aiohttp.ClientTimeout(total=timeout)
+        self._session: Optional[aiohttp.ClientSession] = None
+        # With shared_token, one access token in Redis serves every process (see auth.py)
+        self.tokens = SpotifyTokenManager(self._request_token, shared=shared_token)
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        # Created lazily so the session binds to the running event loop
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=KEEPALIVE_TIMEOUT, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self._timeout)
+        return self._session
+
+    async def aclose(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+
+    async def invalidate_token(self, token: Optional[str] = None) -> None:
+        await self.tokens.invalidate(token)
+
+    async def get_access_token(self) -> str:
+        return await self.tokens.get_token()
+
+    async def _request_token(self) -> Dict[str, Any]:
+        try:
+            async with self.session.post(self.token_url, data={'grant_type': 'client_credentials'},
+                                         auth=aiohttp.BasicAuth(self.client_id, self.client_secret)) as response:
+                body = await response.text()
+                status = response.status
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise SpotifyOauthError(f"Error requesting Spotify access token: {str(e)}")
+        if status != 200:
+            raise SpotifyOauthError(f"Spotify token request failed: {status} {body}")
+        return json.loads(body)
+
+    async def _request(self, method: str, path: str, params: Optional[Dict[str, Any]] = None,
+                       payload: Optional[Dict[str, Any]] = None, retry_auth: bool = True) -> Any:
+        url = f"{self.api_base}/{path.lstrip('/')}"
+        if params:
+            params = {key: str(value) for key, value in params.items() if value is not None}
+        if self.circuit_breaker is not None and not self.circuit_breaker.can_execute():
+            raise SpotifyException(503, -1, f"{url}:\n Spotify circuit is open", reason=CIRCUIT_OPEN_REASON)
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire(path.lstrip('/').split('/')[0])
+        token = await self.get_access_token()
+        try:
+            async with self.session.request(method, url, params=params, json=payload,
+                                            headers={'Authorization': f"Bearer {token}"}) as response:
+                status = response.status
+                headers = dict(response.headers)
+                body = await response.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.record_failure()
+            raise SpotifyException(599, -1, f"{url}:\n {str(e)}")
+        if self.circuit_breaker is not None:
+            if status >= 500:
+                self.circuit_breaker.record_failure()
+            else:
+                self.circuit_breaker.record_success()
+
+        if status == 401 and retry_auth:
+            await self.invalidate_token(token)
+            return await self._request(method, path, params, payload, retry_auth=False)
+        if status >= 400:
+            try:
+                error = json.loads(body).get('error', {})
+                message = error.get('message', '') if isinstance(error, dict) else str(error)
+                reason = error.get('reason') if isinstance(error, dict) else None
+            except ValueError:
+                message, reason = body.decode(errors='replace'), None
+            error = SpotifyException(status, -1, f"{url}:\n {message}", reason=reason, headers=headers)
+            if status == 429 and self.rate_limiter is not None:
+                await self.rate_limiter.pause(retry_after_seconds(error))
+            raise error
+        if status == 204 or not body:
+            return None
+        return json.loads(body)
+
+    async def search(self, q: str, limit: int = 10, offset: int = 0, type: str = 'track', market: Optional[str] = None):
+        return await self._request('GET', 'search', {'q': q, 'limit': limit, 'offset': offset, 'type': type, 'market': market})
+
+    async def track(self, track_id: str, market: Optional[str] = None):
+        return await self._request('GET', f"tracks/{_get_id('track', track_id)}", {'market': market})
+
+    async def tracks(self, tracks: List[str], market: Optional[str] = None):
+        ids = ','.join(_get_id('track', track) for track in tracks)
+        return await self._request('GET', 'tracks', {'ids': ids, 'market': market})
+
+    async def artist(self, artist_id: str):
+        return await self._request('GET', f"artists/{_get_id('artist', artist_id)}")
+
+    async def artist_top_tracks(self, artist_id: str, country: str = 'US'):
+        return await self._request('GET', f"artists/{_get_id('artist', artist_id)}/top-tracks", {'market': country})
+
+    async def recommendations(self, seed_artists=None, seed_genres=None, seed_tracks=None, limit: int = 20,
+                              country: Optional[str] = None, **kwargs):
+        params = {'limit': limit, 'market': country}
+        if seed_artists:
+            params['seed_artists'] = ','.join(_get_id('artist', artist) for artist in seed_artists)
+        if seed_genres:
+            params['seed_genres'] = ','.join(seed_genres)
+        if seed_tracks:
+            params['seed_tracks'] = ','.join(_get_id('track', track) for track in seed_tracks)
+        for key, value in kwargs.items():
+            if key.startswith(('min_', 'max_', 'target_')):
+                params[key] = value
+        return await self._request('GET', 'recommendations', params)
+
+    async def audio_features(self, tracks: List[str]):
+        ids = ','.join(_get_id('track', track) for track in tracks)
+        results = await self._request('GET', 'audio-features', {'ids': ids})
+        return results['audio_features'] if results and 'audio_features' in results else results
+
+    async def user_playlist_create(self, user: str, name: str, public: bool = True, collaborative: bool = False,
+                                   description: str = ""):
+        payload = {'name': name, 'public': public, 'collaborative': collaborative, 'description': description}
+        return await self._request('POST', f"users/{user}/playlists", payload=payload)
+
+    async def playlist_add_items(self, playlist_id: str, items: List[str], position: Optional[int] = None):
+        payload = {'uris': [_get_uri('track', item) for item in items]}
+        if position is not None:
+            payload['position'] = position
+        return await self._request('POST', f"playlists/{_get_id('playlist', playlist_id)}/tracks", payload=payload)
+
+    async def playlist_replace_items(self, playlist_id: str, items: List[str]):
+        payload = {'uris': [_get_uri('track', item) for item in items]}
+        return await self._request('PUT', f"playlists/{_get_id('playlist', playlist_id)}/tracks", payload=payload)
+
+    async def playlist_change_details(self, playlist_id: str, name: Optional[str] = None, public: Optional[bool] = None,
+                                      collaborative: Optional[bool] = None, description: Optional[str] = None):
+        payload = {'name': name, 'public': public, 'collaborative': collaborative, 'description': description}
+        payload = {key: value for key, value in payload.items() if value is not None}
+        return await self._request('PUT', f"playlists/{_get_id('playlist', playlist_id)}", payload=payload)
+
+
+spotify_circuit = CircuitBreaker()
+spotify_client = AsyncSpotifyClient(SPOTIFY_CLIENT_ID, SPOTIFY_CLIENT_SECRET, rate_limiter=spotify_quota, shared_token=True,
+                                    circuit_breaker=spotify_circuit)
@@ -0,0 +1,155 @@
+#codec.py
+import struct
+import zlib
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+import msgpack
+
+# Bump CODEC_VERSION whenever a projection or the encoding changes; older entries then read as misses
+CODEC_MAGIC = 0xC5
+CODEC_VERSION = 1
+FLAG_COMPRESSED = 0x01
+FLAG_TOMBSTONE = 0x02
+HEADER = struct.Struct('>BBBd')  # magic, version, flags, fresh_until (0 = no soft TTL)
+COMPRESS_MIN_BYTES = 1024
+COMPRESS_LEVEL = 3
+
+AUDIO_FEATURE_FIELDS = ('id', 'danceability', 'energy', 'key', 'loudness', 'mode', 'speechiness', 'acousticness',
+                        'instrumentalness', 'liveness', 'valence', 'tempo', 'time_signature', 'duration_ms')
+
+
+def _image(images):
+    # Callers only ever read images[0]
+    return [{'url': images[0]['url']}] if images else []
+
+
+def project_track(track):
+    if not track:
+        return track
+    album = track.get('album') or {}
+    return {
+        'id': track.get('id'),
+        'name': track.get('name'),
+        'uri': track.get('uri'),
+        'popularity': track.get('popularity'),
+        'duration_ms': track.get('duration_ms'),
+        'artists': [{'id': artist.get('id'), 'name': artist.get('name')} for artist in track.get('artists') or []],
+        'album': {'id': album.get('id'), 'name': album.get('name'), 'images': _image(album.get('images'))},
+    }
+
+
+def project_artist(artist):
+    if not artist:
+        return artist
+    return {
+        'id': artist.get('id'),
+        'name': artist.get('name'),
+        'uri': artist.get('uri'),
+        'genres': artist.get('genres') or [],
+        'popularity': artist.get('popularity'),
+        'followers': {'total': (artist.get('followers') or {}).get('total', 0)},
+        'images': _image(artist.get('images')),
+    }
+
+
+def _project_item(item):
+    if not item:
+        return item
+    return {'id': item.get('id'), 'name': item.get('name'), 'uri': item.get('uri'), 'images': _image(item.get('images'))}
+
+
+ITEM_PROJECTIONS = {'tracks': project_track, 'artists': project_artist}
+
+
+def project_search(result):
+    if not isinstance(result, dict):
+        return result
+    projected = {}
+    for kind, page in result.items():
+        project = ITEM_PROJECTIONS.get(kind, _project_item)
+        projected[kind] = {'items': [project(item) for item in (page or {}).get('items') or []],
+                           'total': (page or {}).get('total')}
+    return projected
+
+
+def project_recommendations(result):
+    if not isinstance(result, dict):
+        return result
+    return {'tracks': [project_track(track) for track in result.get('tracks') or []]}
+
+
+def project_audio_feature(feature):
+    if not feature:
+        return feature
+    return {field: feature.get(field) for field in AUDIO_FEATURE_FIELDS}
+
+
+class Tombstone(NamedTuple):
+    """A cached negative answer: the Spotify error (status >= 400) or the empty result (status 200) a key got."""
+    status: int
+    message: str = ''
+    value: Any = None
+
+
+def is_empty(value: Any) -> bool:
+    """True for None/empty values, search pages without items and recommendations without tracks."""
+    if not value:
+        return True
+    if isinstance(value, dict):
+        pages = list(value.values())
+        if all(isinstance(page, dict) and 'items' in page for page in pages):
+            return not any(page['items'] for page in pages)
+        if set(value) == {'tracks'} and isinstance(value['tracks'], list):
+            return not value['tracks']
+    return False
+
+
+# Per key family (the cache-key prefix before the first ':'); families not listed are stored as-is
+PROJECTIONS: Dict[str, Callable[[Any], Any]] = {
+    'spotify_search': project_search,
+    'search_track': project_search,
+    'artist': project_artist,
+    'recommendations': project_recommendations,
+    'artist_top_tracks': project_recommendations,
+    'audio_feature': project_audio_feature,
+}
+
+
+def project(family: str, value: Any) -> Any:
+    projection = PROJECTIONS.get(family)
+    return projection(value) if projection is not None else value
+
+
+def encode(value: Any, fresh_until: Optional[float] = None) -> bytes:
+    body = msgpack.packb(value, use_bin_type=True)
+    flags = 0
+    if len(body) >= COMPRESS_MIN_BYTES:
+        body = zlib.compress(body, COMPRESS_LEVEL)
+        flags |= FLAG_COMPRESSED
+    return HEADER.pack(CODEC_MAGIC, CODEC_VERSION, flags, fresh_until or 0.0) + body
+
+
+def encode_tombstone(tombstone: Tombstone) -> bytes:
+    body = msgpack.packb(list(tombstone), use_bin_type=True)
+    return HEADER.pack(CODEC_MAGIC, CODEC_VERSION, FLAG_TOMBSTONE, 0.0) + body
+
+
+def decode(raw: Optional[bytes]) -> Optional[Tuple[Any, Optional[float]]]:
+    """Return (value, fresh_until), or None for a miss, a foreign format or another codec version.
+
+    Negative entries come back as (Tombstone, None).
+    """
+    if not raw or len(raw) < HEADER.size:
+        return None
+    magic, version, flags, fresh_until = HEADER.unpack_from(raw)
+    if magic != CODEC_MAGIC or version != CODEC_VERSION:
+        return None
+    body = raw[HEADER.size:]
+    try:
+        if flags & FLAG_COMPRESSED:
+            body = zlib.decompress(body)
+        value = msgpack.unpackb(body, raw=False)
+        if flags & FLAG_TOMBSTONE:
+            return Tombstone(*value), None
+        return value, fresh_until or None
+    except (zlib.error, ValueError, TypeError, msgpack.UnpackException):
+        return None
@@ -0,0 +1,151 @@
+#near_cache.py
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from logging_config import setup_logging
+
+logger = setup_logging(logstash_host='localhost', logstash_port=5000)
+
+NEAR_CACHE_MAX_BYTES = int(os.getenv("NEAR_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+NEAR_CACHE_MAX_ENTRIES = int(os.getenv("NEAR_CACHE_MAX_ENTRIES", 20000))
+NEAR_CACHE_DEFAULT_TTL = 60
+
+# Seconds an entry may be served from memory, per key family (the prefix before the first ':')
+NEAR_CACHE_TTLS = {
+    'spotify_search': 300,
+    'search_track': 300,
+    'artist': 1800,
+    'artist_top_tracks': 1800,
+    'artist_profile': 1800,
+    'recommendations': 600,
+    'seed_profile': 1800,
+}
+
+INVALIDATION_CHANNEL = "spotify_cache:invalidate"
+# Set NEAR_CACHE_KEYSPACE_EVENTS=1 when Redis runs with notify-keyspace-events "Kgxe",
+# so deletes, expiries and evictions done outside the bot also reach every process
+KEYSPACE_EVENTS = os.getenv("NEAR_CACHE_KEYSPACE_EVENTS", "").lower() in ('true', '1', 't')
+
+PROCESS_ID = uuid.uuid4().hex[:12]
+
+
+def key_family(key: str) -> str:
+    return key.split(':', 1)[0]
+
+
+class NearCache:
+    """Bounded in-process LRU that sits in front of Redis.
+
+    Values are stored decoded, so a hit skips both the Redis round trip and
+    json.loads. Callers get the cached object itself and must not mutate it.
+    """
+
+    def __init__(self, max_bytes: int = NEAR_CACHE_MAX_BYTES, max_entries: int = NEAR_CACHE_MAX_ENTRIES,
+                 ttls: Optional[Dict[str, int]] = None, default_ttl: int = NEAR_CACHE_DEFAULT_TTL):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.ttls = NEAR_CACHE_TTLS if ttls is None else ttls
+        self.default_ttl = default_ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self._stats['misses'] += 1
+            return None
+        value, size, expires_at = entry
+        if expires_at <= time.monotonic():
+            self._drop(key)
+            self._stats['misses'] += 1
+            return None
+        self._entries.move_to_end(key)
+        self._stats['hits'] += 1
+        return value
+
+    def set(self, key: str, value: Any, size: int, ttl: Optional[int] = None) -> None:
+        ttl = self.ttls.get(key_family(key), self.default_ttl) if ttl is None else ttl
+        if ttl <= 0 or size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = (value, size, time.monotonic() + ttl)
+        self._bytes += size
+        while self._bytes > self.max_bytes or len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self._stats['evictions'] += 1
+
+    def invalidate(self, key: str) -> None:
+        if key in self._entries:
+            self._drop(key)
+            self._stats['invalidations'] += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def _drop(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def stats(self) -> Dict[str, int]:
+        stats = dict(self._stats)
+        stats['entries'] = len(self._entries)
+        stats['bytes'] = self._bytes
+        return stats
+
+
+near_cache = NearCache()
+_listener_task: Optional[asyncio.Task] = None
+
+
+async def publish_invalidation(redis, key: str) -> None:
+    try:
+        await redis.publish(INVALIDATION_CHANNEL, f"{PROCESS_ID}|{key}")
+    except Exception as e:
+        logger.error(f"Error publishing near-cache invalidation for {key}: {str(e)}")
+
+
+async def _listen_for_invalidations(get_redis):
+    while True:
+        pubsub = None
+        try:
+            redis = await get_redis()
+            pubsub = redis.pubsub()
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            if KEYSPACE_EVENTS:
+                await pubsub.psubscribe("__keyspace@*__:*")
+            while True:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is None:
+                    continue
+                if message['type'] == 'message':
+                    origin, _, key = message['data'].partition('|')
+                    if origin != PROCESS_ID:
+                        near_cache.invalidate(key)
+                elif message['type'] == 'pmessage' and message['data'] in ('del', 'expired', 'evicted'):
+                    near_cache.invalidate(message['channel'].split(':', 1)[1])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Near-cache invalidation listener failed, reconnecting: {str(e)}")
+            # Entries may have changed while we were disconnected
+            near_cache.clear()
+            await asyncio.sleep(1)
+        finally:
+            if pubsub is not None:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+
+def ensure_invalidation_listener(get_redis) -> None:
+    global _listener_task
+    if _listener_task is None or _listener_task.done():
+        _listener_task = asyncio.create_task(_listen_for_invalidations(get_redis))
@@ -0,0 +1,65 @@
+#query.py
+import re
+import unicodedata
+from typing import Any, Dict, List
+
+# Arabic-keyboard forms folded onto the Persian letters our users expect
+CHARACTER_MAP = str.maketrans({
+    '\u064a': '\u06cc', '\u0649': '\u06cc', '\u0626': '\u06cc',  # Arabic yeh forms -> Persian yeh
+    '\u0643': '\u06a9',  # Arabic kaf -> Persian keheh
+    '\u0629': '\u0647', '\u06c0': '\u0647',  # Teh marbuta, heh with yeh -> heh
+    '\u0623': '\u0627', '\u0625': '\u0627', '\u0671': '\u0627',  # Hamza/wasla alef forms -> alef
+    '\u0624': '\u0648',  # Waw with hamza -> waw
+    '\u200c': ' ',  # ZWNJ: half-space and full-space spellings of a word share a key
+    '\u200b': None, '\u200d': None, '\ufeff': None,
+    '\u0640': None,  # Tatweel
+    **{chr(0x06F0 + i): str(i) for i in range(10)},  # Persian digits
+    **{chr(0x0660 + i): str(i) for i in range(10)},  # Arabic-Indic digits
+})
+DIACRITICS = re.compile('[\u064b-\u065f\u0670]')
+WHITESPACE = re.compile(r'\s+')
+
+PREFIX_MIN_LENGTH = 3
+PREFIX_MAX_CANDIDATES = 20
+
+
+def clean_query(query: str) -> str:
+    """A search query as the user typed it, trimmed and with whitespace runs collapsed; this is what Spotify gets."""
+    return WHITESPACE.sub(' ', query).strip()
+
+
+def normalize_query(query: str) -> str:
+    """Canonical form of a search query, used as cache key and for matching cached results; never sent to Spotify."""
+    query = unicodedata.normalize('NFKC', query)
+    query = DIACRITICS.sub('', query.translate(CHARACTER_MAP))
+    return WHITESPACE.sub(' ', query.casefold()).strip()
+
+
+def prefix_candidates(query: str) -> List[str]:
+    """Shorter queries a user has likely typed on the way to `query`, longest first."""
+    candidates = []
+    for end in range(len(query) - 1, PREFIX_MIN_LENGTH - 1, -1):
+        prefix = query[:end].rstrip()
+        if prefix and prefix not in candidates:
+            candidates.append(prefix)
+        if len(candidates) >= PREFIX_MAX_CANDIDATES:
+            break
+    return candidates
+
+
+def _item_text(item: Dict[str, Any], search_type: str) -> str:
+    parts = [item.get('name') or '']
+    if search_type == 'track':
+        parts.extend(artist.get('name') or '' for artist in item.get('artists') or [])
+        parts.append((item.get('album') or {}).get('name') or '')
+    return normalize_query(' '.join(parts))
+
+
+def filter_results(results: Dict[str, Any], search_type: str, query: str) -> List[Dict[str, Any]]:
+    """Items of a cached search response that contain every word of `query`.
+
+    Words are matched as substrings, so a half-typed last word still matches.
+    """
+    words = query.split()
+    items = (results.get(f"{search_type}s") or {}).get('items') or []
+    return [item for item in items if item and all(word in _item_text(item, search_type) for word in words)]
@@ -0,0 +1,163 @@
+#quota.py
+import asyncio
+import os
+import time
+from typing import Optional
+from asyncio_throttle import Throttler
+from spotipy.exceptions import SpotifyException
+from .redis_client import get_redis_pool
+from logging_config import setup_logging
+
+logger = setup_logging(logstash_host='localhost', logstash_port=5000)
+
+SPOTIFY_QUOTA_PER_HOUR = int(os.getenv("SPOTIFY_QUOTA_PER_HOUR", 1000))
+SPOTIFY_QUOTA_BURST = int(os.getenv("SPOTIFY_QUOTA_BURST", 20))  # Bucket capacity shared by every process
+LOCAL_BURST = int(os.getenv("SPOTIFY_QUOTA_LOCAL_BURST", 3))  # Most tokens a process takes per round trip for queued requests
+LOCAL_TOKEN_TTL = 2.0  # Seconds prefetched tokens stay usable before they are dropped
+QUOTA_MAX_WAIT = 30.0
+MAX_RETRY_AFTER = 600
+
+BUCKET_KEY = "spotify_quota:bucket"
+PAUSE_KEY = "spotify_quota:pause"
+
+# Relative weight of each endpoint (first path segment) in the shared budget
+ENDPOINT_COSTS = {
+    'search': 1,
+    'tracks': 1,
+    'artists': 1,
+    'audio-features': 1,
+    'recommendations': 2,
+    'playlists': 2,
+    'users': 2,
+}
+
+# Refill, then take between ARGV[4] and ARGV[3] tokens in one atomic step.
+# Returns {granted, wait_ms}; wait_ms is the pause TTL or the time until enough tokens refill.
+TOKEN_BUCKET_SCRIPT = """
+local pause = redis.call('pttl', KEYS[2])
+if pause > 0 then
+    return {0, pause}
+end
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local wanted = tonumber(ARGV[3])
+local needed = tonumber(ARGV[4])
+local clock = redis.call('time')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local bucket = redis.call('hmget', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local granted = 0
+local wait = 0
+if tokens >= needed then
+    granted = math.min(wanted, math.floor(tokens))
+    tokens = tokens - granted
+else
+    wait = math.ceil((needed - tokens) / rate)
+end
+redis.call('hset', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('pexpire', KEYS[1], math.ceil(capacity / rate) + 1000)
+return {granted, wait}
+"""
+
+
+def endpoint_cost(endpoint: str) -> int:
+    return ENDPOINT_COSTS.get(endpoint, 1)
+
+
+def retry_after_seconds(exc) -> Optional[float]:
+    """Retry-After of a Spotify 429, in seconds, if the exception carries one."""
+    if not isinstance(exc, SpotifyException) or exc.http_status != 429:
+        return None
+    headers = {key.lower(): value for key, value in (exc.headers or {}).items()}
+    try:
+        return min(float(headers.get('retry-after', 1)), MAX_RETRY_AFTER)
+    except ValueError:
+        return 1.0
+
+
+class DistributedTokenBucket:
+    """One Spotify request budget shared by every bot process through Redis.
+
+    Tokens refill continuously at `per_hour / 3600` per second up to `capacity`.
+    A round trip takes tokens for the requests already queued in this process
+    (at most `local_burst`), which spend them locally; a lone request takes only
+    its own cost, so light traffic doesn't strand prefetched tokens. A 429
+    pauses every process until Retry-After passes.
+    If Redis is unreachable the process falls back to its own in-memory throttler.
+    """
+
+    def __init__(self, per_hour: int = SPOTIFY_QUOTA_PER_HOUR, capacity: int = SPOTIFY_QUOTA_BURST,
+                 local_burst: int = LOCAL_BURST, max_wait: float = QUOTA_MAX_WAIT):
+        self.capacity = capacity
+        self.rate_per_ms = per_hour / 3600 / 1000
+        self.local_burst = max(1, local_burst)
+        self.max_wait = max_wait
+        self._local_tokens = 0
+        self._local_expires_at = 0.0
+        self._queued = 0
+        self._paused_until = 0.0
+        self._fallback = Throttler(rate_limit=per_hour, period=3600)
+        self._lock = asyncio.Lock()
+
+    def is_paused(self) -> bool:
+        return time.time() < self._paused_until
+
+    async def acquire(self, endpoint: str = '') -> None:
+        cost = endpoint_cost(endpoint)
+        deadline = time.monotonic() + self.max_wait
+        self._queued += 1
+        try:
+            while True:
+                wait = await self._try_acquire(cost)
+                if wait is None:
+                    return
+                if time.monotonic() + wait > deadline:
+                    raise SpotifyException(429, -1, f"Spotify quota exhausted for {endpoint}",
+                                           headers={'Retry-After': str(int(wait) + 1)})
+                await asyncio.sleep(wait)
+        finally:
+            self._queued -= 1
+
+    async def _try_acquire(self, cost: int) -> Optional[float]:
+        """Take `cost` tokens; return None on success or the seconds to wait before retrying."""
+        now = time.time()
+        if now < self._paused_until:
+            return self._paused_until - now
+        async with self._lock:
+            if self._local_tokens >= cost and time.monotonic() < self._local_expires_at:
+                self._local_tokens -= cost
+                return None
+            # Prefetch only for requests already waiting here; unused local tokens are lost when they expire
+            wanted = max(cost, min(cost * self._queued, self.local_burst))
+            try:
+                redis = await get_redis_pool()
+                granted, wait_ms = await redis.eval(TOKEN_BUCKET_SCRIPT, 2, BUCKET_KEY, PAUSE_KEY,
+                                                    self.capacity, self.rate_per_ms, wanted, cost)
+            except Exception as e:
+                logger.error(f"Spotify quota unavailable, using local throttler: {str(e)}")
+                async with self._fallback:
+                    return None
+            granted, wait_ms = int(granted), int(wait_ms)
+            if granted < cost:
+                return wait_ms / 1000
+            self._local_tokens = granted - cost
+            self._local_expires_at = time.monotonic() + LOCAL_TOKEN_TTL
+            return None
+
+    async def pause(self, seconds: float) -> None:
+        """Stop every process from calling Spotify for `seconds` (a 429's Retry-After)."""
+        if seconds <= 0:
+            return
+        self._paused_until = max(self._paused_until, time.time() + seconds)
+        self._local_tokens = 0
+        logger.warning(f"Spotify rate limit hit, pausing requests for {seconds:.0f}s")
+        try:
+            redis = await get_redis_pool()
+            await redis.set(PAUSE_KEY, 1, px=int(seconds * 1000))
+        except Exception as e:
+            logger.error(f"Error sharing Spotify rate-limit pause: {str(e)}")
+
+
+spotify_quota = DistributedTokenBucket()
@@ -23,11 +23,25 @@ redis_pool = ConnectionPool(
     socket_connect_timeout=5  # Add a connection timeout
 )
 
+# Same server, but values come back as bytes; used for codec-encoded cache entries
+binary_redis_pool = ConnectionPool(
+    host=REDIS_HOST,
+    port=REDIS_PORT,
+    db=REDIS_DB,
+    decode_responses=False,
+    max_connections=100,
+    socket_timeout=5,
+    socket_connect_timeout=5
+)
+
 async def get_redis_pool():
     return Redis(connection_pool=redis_pool)
 
+async def get_binary_redis_client():
+    return Redis(connection_pool=binary_redis_pool)
+
 # Alias for get_redis_pool
 get_redis_client = get_redis_pool
 
 # Make sure to export the functions
-__all__ = ['get_redis_pool', 'get_redis_client']
\ No newline at end of file
+__all__ = ['get_redis_pool', 'get_redis_client', 'get_binary_redis_client']
\ No newline at end of file
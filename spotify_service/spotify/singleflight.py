@@ -0,0 +1,106 @@
+#singleflight.py
+import asyncio
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+from logging_config import setup_logging
+
+logger = setup_logging(logstash_host='localhost', logstash_port=5000)
+
+LOCK_PREFIX = "singleflight:"
+LOCK_LEASE_MS = 10000  # How long a process may hold a key before others take over
+POLL_INTERVAL = 0.05
+
+# Delete the lock only if we still own it, so an expired lease never frees someone else's lock
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class SingleFlight:
+    """Coalesce concurrent loads of the same key into one upstream call.
+
+    Inside a process the first caller becomes the leader and everyone else awaits
+    its future. When a Redis client is passed, the leader also takes a short lease
+    so leaders in other processes wait for the value instead of calling Spotify.
+    """
+
+    def __init__(self, lease_ms: int = LOCK_LEASE_MS, poll_interval: float = POLL_INTERVAL):
+        self.lease_ms = lease_ms
+        self.poll_interval = poll_interval
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._stats = {'leader_calls': 0, 'coalesced': 0, 'remote_hits': 0, 'lock_timeouts': 0}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]], redis=None,
+                 probe: Optional[Callable[[], Awaitable[Any]]] = None) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            # The load runs as its own task so a cancelled caller never cancels it for the others
+            task = asyncio.ensure_future(self._load(key, fn, redis, probe))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        else:
+            self._stats['coalesced'] += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved; every waiter has already received it
+            task.exception()
+
+    async def _load(self, key, fn, redis, probe):
+        if redis is not None and probe is not None:
+            return await self._run_with_lease(key, fn, redis, probe)
+        self._stats['leader_calls'] += 1
+        return await fn()
+
+    async def _run_with_lease(self, key, fn, redis, probe):
+        lock_key = f"{LOCK_PREFIX}{key}"
+        token = uuid.uuid4().hex
+        try:
+            acquired = await redis.set(lock_key, token, nx=True, px=self.lease_ms)
+        except Exception as e:
+            logger.error(f"Error acquiring single-flight lease for {key}: {str(e)}")
+            acquired, token = True, None
+
+        if not acquired:
+            result = await self._wait_for_remote(redis, lock_key, probe)
+            if result is not None:
+                self._stats['remote_hits'] += 1
+                return result
+            self._stats['lock_timeouts'] += 1
+
+        try:
+            self._stats['leader_calls'] += 1
+            return await fn()
+        finally:
+            if acquired and token is not None:
+                try:
+                    await redis.eval(RELEASE_SCRIPT, 1, lock_key, token)
+                except Exception as e:
+                    logger.error(f"Error releasing single-flight lease for {key}: {str(e)}")
+
+    async def _wait_for_remote(self, redis, lock_key, probe):
+        deadline = asyncio.get_running_loop().time() + self.lease_ms / 1000
+        while asyncio.get_running_loop().time() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                result = await probe()
+                if result is not None:
+                    return result
+                if not await redis.exists(lock_key):
+                    # Leader finished without a cacheable value (or died); one last look, then load ourselves
+                    return await probe()
+            except Exception:
+                return None
+        return None
+
+    def stats(self) -> Dict[str, int]:
+        stats = dict(self._stats)
+        stats['saved_calls'] = stats['coalesced'] + stats['remote_hits']
+        stats['inflight'] = len(self._inflight)
+        return stats
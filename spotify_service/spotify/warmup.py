@@ -0,0 +1,215 @@
+#warmup.py
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from database_service.database import SessionLocal
+from database_service.database.crud import get_most_added_tracks
+from .cache import (cached_spotify_search, cached_search_track, cached_get_artist, cached_get_artist_top_tracks,
+                    cached_get_recommendations, drain_access_counts, forget_access)
+from .catalog import get_tracks_metadata, get_audio_features, TRACKS_CHUNK_SIZE
+from .near_cache import key_family, PROCESS_ID
+from .quota import spotify_quota, endpoint_cost, SPOTIFY_QUOTA_PER_HOUR
+from .redis_client import get_redis_pool
+from logging_config import setup_logging
+
+logger = setup_logging(logstash_host='localhost', logstash_port=5000)
+
+# Share of the hourly Spotify quota one warm-up run may spend
+WARMUP_QUOTA_SHARE = float(os.getenv("CACHE_WARMUP_QUOTA_SHARE", 0.1))
+WARMUP_INTERVAL = int(os.getenv("CACHE_WARMUP_INTERVAL", 3600))
+ACCESS_FLUSH_INTERVAL = 300
+WARMUP_TOP_KEYS = 500  # Most-read cache keys considered per run
+WARMUP_TOP_TRACKS = 500  # Most-added playlist tracks considered per run
+WARMUP_CONCURRENCY = 2
+
+ACCESS_STATS_KEY = "cache_access"  # Sorted set: cache key -> decayed read count, shared by every process
+ACCESS_STATS_TTL = 7 * 86400
+ACCESS_STATS_MAX_KEYS = 20000
+ACCESS_DECAY = 0.5  # Applied once per run, so last hour's reads outweigh last week's
+WARMUP_LOCK_KEY = "cache_warmup:lock"
+
+warmup_stats = {'runs': 0, 'warmed': 0, 'skipped': 0, 'errors': 0, 'spent': 0}
+
+# (priority, tie-breaker, cost, name, cache_key or None, warm); warm() may return follow-up candidates
+Candidate = Tuple[float, int, int, str, Optional[str], Callable[[], Awaitable[Optional[List[Any]]]]]
+_sequence = itertools.count()
+
+
+def _candidate(value: float, cost: int, name: str, warm, cache_key: Optional[str] = None) -> Candidate:
+    # heapq is a min-heap: the most valuable reads per quota token come out first
+    return (-value / cost, next(_sequence), cost, name, cache_key, warm)
+
+
+def _key_candidate(cache_key: str, reads: float) -> Optional[Candidate]:
+    """Rebuild the cached call behind a cache key seen in the access stats."""
+    family = key_family(cache_key)
+    rest = cache_key[len(family) + 1:]
+    try:
+        if family == 'spotify_search':
+            query, search_type, limit = rest.rsplit(':', 2)
+            warm = lambda: cached_spotify_search(query, search_type, int(limit), reuse_prefix=False)
+            endpoint = 'search'
+        elif family == 'search_track':
+            warm = lambda: cached_search_track(rest)
+            endpoint = 'search'
+        elif family == 'artist':
+            warm = lambda: cached_get_artist(rest)
+            endpoint = 'artists'
+        elif family == 'artist_top_tracks':
+            warm = lambda: cached_get_artist_top_tracks(rest)
+            endpoint = 'artists'
+        elif family == 'recommendations':
+            seeds, limit = rest.rsplit(':', 1)
+            warm = lambda: cached_get_recommendations(seeds, int(limit))
+            endpoint = 'recommendations'
+        else:
+            return None
+    except ValueError:
+        return None
+    return _candidate(reads, endpoint_cost(endpoint), cache_key, _discard(warm), cache_key)
+
+
+def _discard(warm):
+    async def run():
+        await warm()
+        return None
+    return run
+
+
+def _track_chunk_candidate(counts: Dict[str, int]) -> Candidate:
+    track_ids = list(counts)
+
+    async def warm():
+        metadata = await get_tracks_metadata(track_ids)
+        await get_audio_features(track_ids)
+        artist_reads: Dict[str, int] = {}
+        for track_id, track in metadata.items():
+            if track.get('artist_id'):
+                artist_reads[track['artist_id']] = artist_reads.get(track['artist_id'], 0) + counts.get(track_id, 0)
+        return [_key_candidate(f"artist:{artist_id}", reads) for artist_id, reads in artist_reads.items()]
+
+    cost = endpoint_cost('tracks') + endpoint_cost('audio-features')
+    return _candidate(sum(counts.values()), cost, f"tracks[{len(track_ids)}]", warm)
+
+
+async def flush_access_stats(redis) -> None:
+    """Merge this process's read counts into the shared sorted set."""
+    counts = drain_access_counts()
+    if not counts:
+        return
+    pipe = redis.pipeline(transaction=False)
+    for cache_key, reads in counts.items():
+        pipe.zincrby(ACCESS_STATS_KEY, reads, cache_key)
+    pipe.expire(ACCESS_STATS_KEY, ACCESS_STATS_TTL)
+    await pipe.execute()
+
+
+def _load_database_demand() -> List[Tuple[str, int]]:
+    # Mood and genre playlists are served from the bot's candidate pools, so only track demand is warmed here
+    db = SessionLocal()
+    try:
+        return get_most_added_tracks(db, WARMUP_TOP_TRACKS)
+    finally:
+        db.close()
+
+
+async def _collect_candidates(redis) -> List[Candidate]:
+    # Decay first so a key needs recent reads to stay near the top, then keep the set bounded
+    pipe = redis.pipeline(transaction=False)
+    pipe.zunionstore(ACCESS_STATS_KEY, {ACCESS_STATS_KEY: ACCESS_DECAY})
+    pipe.zremrangebyrank(ACCESS_STATS_KEY, 0, -ACCESS_STATS_MAX_KEYS - 1)
+    pipe.zrevrange(ACCESS_STATS_KEY, 0, WARMUP_TOP_KEYS - 1, withscores=True)
+    top_keys = (await pipe.execute())[-1]
+    candidates = [_key_candidate(cache_key, reads) for cache_key, reads in top_keys]
+
+    try:
+        top_tracks = await asyncio.to_thread(_load_database_demand)
+    except Exception as e:
+        logger.error(f"Error loading playlist demand for cache warm-up: {str(e)}")
+        top_tracks = []
+    for i in range(0, len(top_tracks), TRACKS_CHUNK_SIZE):
+        candidates.append(_track_chunk_candidate(dict(top_tracks[i:i + TRACKS_CHUNK_SIZE])))
+    return [candidate for candidate in candidates if candidate is not None]
+
+
+async def warm_cache(budget: Optional[float] = None) -> Dict[str, int]:
+    """Pre-populate the most valuable cache entries within `budget` quota tokens.
+
+    Candidates come from the shared access stats and from the playlist tables,
+    ranked by expected reads per token. Entries already in Redis are skipped for
+    free; the run stops early when the budget is spent or Spotify pauses us.
+    """
+    if budget is None:
+        budget = SPOTIFY_QUOTA_PER_HOUR * WARMUP_QUOTA_SHARE * WARMUP_INTERVAL / 3600
+    redis = await get_redis_pool()
+    run_stats = {'warmed': 0, 'skipped': 0, 'errors': 0, 'spent': 0}
+    heap = await _collect_candidates(redis)
+    heapq.heapify(heap)
+    warmed_keys: List[str] = []
+    semaphore = asyncio.Semaphore(WARMUP_CONCURRENCY)
+
+    async def run(candidate):
+        _, _, cost, name, cache_key, warm = candidate
+        async with semaphore:
+            try:
+                follow_ups = await warm()
+                run_stats['warmed'] += 1
+                if cache_key is not None:
+                    warmed_keys.append(cache_key)
+                for follow_up in follow_ups or []:
+                    if follow_up is not None:
+                        heapq.heappush(heap, follow_up)
+            except Exception as e:
+                run_stats['errors'] += 1
+                logger.error(f"Error warming {name}: {str(e)}")
+
+    pending = set()
+    while (heap or pending) and not spotify_quota.is_paused():
+        if heap and run_stats['spent'] + heap[0][2] <= budget:
+            candidate = heapq.heappop(heap)
+            if candidate[4] is not None and await redis.exists(candidate[4]):
+                run_stats['skipped'] += 1
+                continue
+            run_stats['spent'] += candidate[2]
+            pending.add(asyncio.create_task(run(candidate)))
+            if len(pending) < WARMUP_CONCURRENCY:
+                continue
+        elif not pending:
+            break
+        # Wait for a slot; finished candidates may push follow-ups onto the heap
+        _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+    for task in pending:
+        task.cancel()
+    forget_access(warmed_keys)
+    for stat, value in run_stats.items():
+        warmup_stats[stat] += value
+    warmup_stats['runs'] += 1
+    logger.info(f"Cache warm-up finished: {run_stats} (budget {budget:.0f})")
+    return run_stats
+
+
+async def run_warmup_scheduler() -> None:
+    """Flush read counts every few minutes and warm the cache right away, then once per interval.
+
+    Only one process in the cluster warms per interval; the others just flush their counts.
+    """
+    next_warmup = 0.0
+    while True:
+        try:
+            redis = await get_redis_pool()
+            await flush_access_stats(redis)
+            if time.monotonic() >= next_warmup:
+                next_warmup = time.monotonic() + WARMUP_INTERVAL
+                if await redis.set(WARMUP_LOCK_KEY, PROCESS_ID, nx=True, ex=max(60, WARMUP_INTERVAL - 60)):
+                    await warm_cache()
+        except Exception as e:
+            logger.error(f"Error in cache warm-up scheduler: {str(e)}")
+        await asyncio.sleep(ACCESS_FLUSH_INTERVAL)
+
+
+def get_warmup_stats() -> Dict[str, int]:
+    return dict(warmup_stats)
@@ -0,0 +1,63 @@
+"""Ranking time of the NumPy engine vs the old per-candidate dict loop + full sort.
+
+    python tests/bench_ranking.py --sizes 100 1000 10000 --top 100
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from bot_service.bot.services.ranking import rank_tracks, rank_tracks_for_seeds, feature_matrix, similarities, top_k
+
+KEYS = ['danceability', 'energy', 'valence', 'acousticness', 'instrumentalness']
+
+
+def random_features():
+    features = {key: random.random() for key in KEYS}
+    features.update(tempo=random.uniform(60, 180), loudness=random.uniform(-30, 0))
+    return features
+
+
+def loop_rank(seed, candidates, k):
+    scores = []
+    for track_id, features in candidates.items():
+        distance = sum(abs(seed.get(key, 0) - features.get(key, 0)) for key in KEYS)
+        scores.append((track_id, 1 - distance / 5))
+    return [track_id for track_id, _ in sorted(scores, key=lambda x: x[1], reverse=True)[:k]]
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--top', type=int, default=100)
+    parser.add_argument('--seeds', type=int, default=5)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        candidates = {f"track{i}": random_features() for i in range(size)}
+        seeds = {f"seed{i}": random_features() for i in range(args.seeds)}
+        seed = seeds['seed0']
+        repeat = max(3, 20000 // size)
+        loop_ms = timed(lambda: loop_rank(seed, candidates, args.top), repeat)
+        numpy_ms = timed(lambda: rank_tracks(seed, candidates, args.top), repeat)
+        batch_ms = timed(lambda: rank_tracks_for_seeds(seeds, candidates, args.top), repeat)
+        # Scoring alone, once the candidate matrix is packed
+        matrix, seed_row = feature_matrix(list(candidates.values())), feature_matrix([seed])
+        score_ms = timed(lambda: top_k(similarities(seed_row, matrix)[0], args.top), repeat)
+        print(f"{size:>6} candidates  loop {loop_ms:7.2f} ms  numpy {numpy_ms:6.2f} ms (score+top-k {score_ms:5.2f} ms)  "
+              f"loop x{args.seeds} seeds {loop_ms * args.seeds:7.2f} ms  batched {batch_ms:6.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
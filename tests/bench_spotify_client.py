@@ -0,0 +1,82 @@
+"""Throughput of the async Spotify client vs spotipy on the default thread pool.
+
+Runs a local fake Spotify API (token + search endpoints with a fixed latency)
+and fires the same number of concurrent searches through both clients:
+
+    python tests/bench_spotify_client.py --requests 500 --latency 0.05
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+for name in ('SPOTIFY_CLIENT_ID', 'SPOTIFY_CLIENT_SECRET', 'SPOTIFY_REDIRECT_URI'):
+    os.environ.setdefault(name, 'bench')
+
+from aiohttp import web
+import spotipy
+from spotify_service.spotify.client import AsyncSpotifyClient
+
+SEARCH_RESPONSE = {'tracks': {'items': [{'id': f"track{i}", 'name': f"Track {i}", 'uri': f"spotify:track:track{i}",
+                                         'artists': [{'id': 'artist', 'name': 'Artist'}],
+                                         'album': {'name': 'Album', 'images': []}} for i in range(10)]}}
+
+
+async def start_fake_spotify(latency: float, port: int):
+    async def token(request):
+        return web.json_response({'access_token': 'fake', 'token_type': 'Bearer', 'expires_in': 3600})
+
+    async def search(request):
+        await asyncio.sleep(latency)
+        return web.json_response(SEARCH_RESPONSE)
+
+    app = web.Application()
+    app.router.add_post('/api/token', token)
+    app.router.add_get('/v1/search', search)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', port).start()
+    return runner
+
+
+async def bench_spotipy(base_url: str, requests: int) -> float:
+    client = spotipy.Spotify(auth='fake')
+    client.prefix = f"{base_url}/v1/"
+    started = time.perf_counter()
+    await asyncio.gather(*[asyncio.to_thread(client.search, q=f"query {i}", type='track', limit=10)
+                           for i in range(requests)])
+    return time.perf_counter() - started
+
+
+async def bench_async_client(base_url: str, requests: int) -> float:
+    client = AsyncSpotifyClient('bench', 'bench', api_base=f"{base_url}/v1", token_url=f"{base_url}/api/token")
+    await client.get_access_token()
+    started = time.perf_counter()
+    await asyncio.gather(*[client.search(q=f"query {i}", type='track', limit=10) for i in range(requests)])
+    elapsed = time.perf_counter() - started
+    await client.aclose()
+    return elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    runner = await start_fake_spotify(args.latency, args.port)
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        for name, bench in (('spotipy + to_thread', bench_spotipy), ('AsyncSpotifyClient', bench_async_client)):
+            elapsed = await bench(base_url, args.requests)
+            print(f"{name:20s} {args.requests} searches in {elapsed:.2f}s ({args.requests / elapsed:.0f} req/s)")
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
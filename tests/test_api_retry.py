@@ -0,0 +1,31 @@
+import unittest
+from unittest.mock import AsyncMock, patch
+import sys
+import os
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from spotipy.exceptions import SpotifyException
+from spotify_service.spotify import api
+
+def rate_limited(seconds):
+    return SpotifyException(429, -1, "too many requests", headers={'Retry-After': str(seconds)})
+
+class TestRetry(unittest.IsolatedAsyncioTestCase):
+    async def test_short_retry_after_is_retried(self):
+        func = AsyncMock(side_effect=[rate_limited(1), {'ok': True}])
+        with patch('asyncio.sleep', AsyncMock()) as sleep:
+            self.assertEqual(await api.retry_with_backoff(func), {'ok': True})
+        sleep.assert_awaited_once_with(1.0)
+
+    async def test_long_retry_after_fails_fast(self):
+        func = AsyncMock(side_effect=rate_limited(120))
+        with patch('asyncio.sleep', AsyncMock()) as sleep:
+            with self.assertRaises(SpotifyException):
+                await api.retry_with_backoff(func)
+        self.assertEqual(func.await_count, 1)
+        sleep.assert_not_awaited()
+
+if __name__ == '__main__':
+    unittest.main()
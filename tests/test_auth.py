@@ -0,0 +1,69 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+import sys
+import os
+import time
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from redis.exceptions import ConnectionError as RedisConnectionError
+from spotify_service.spotify import auth
+
+class TestSpotifyTokenManager(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.redis = MagicMock()
+        self.redis.hmget = AsyncMock(return_value=[None, None])
+        self.redis.set = AsyncMock(return_value=True)
+        self.redis.eval = AsyncMock()
+        self.pipe = MagicMock()
+        self.pipe.execute = AsyncMock()
+        self.redis.pipeline.return_value = self.pipe
+        patcher = patch.object(auth, 'get_redis_pool', AsyncMock(return_value=self.redis))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.fetch = AsyncMock(return_value={'access_token': 'fresh', 'expires_in': 3600})
+
+    async def test_uses_shared_token_without_fetching(self):
+        self.redis.hmget.return_value = ['shared', str(time.time() + 3000)]
+        manager = auth.SpotifyTokenManager(self.fetch)
+
+        self.assertEqual(await manager.get_token(), 'shared')
+        self.assertEqual(await manager.get_token(), 'shared')
+        self.fetch.assert_not_awaited()
+        self.redis.hmget.assert_awaited_once()
+
+    async def test_publishes_fetched_token(self):
+        manager = auth.SpotifyTokenManager(self.fetch)
+
+        self.assertEqual(await manager.get_token(), 'fresh')
+        self.assertEqual(self.pipe.hset.call_args.kwargs['mapping']['access_token'], 'fresh')
+        self.redis.eval.assert_awaited_once()  # Lock released
+
+    async def test_waits_for_another_process_refresh(self):
+        self.redis.set.return_value = False  # Lock held elsewhere
+        self.redis.hmget.side_effect = [[None, None], ['theirs', str(time.time() + 3000)]]
+        manager = auth.SpotifyTokenManager(self.fetch)
+
+        with patch.object(auth.asyncio, 'sleep', AsyncMock()):
+            self.assertEqual(await manager.get_token(), 'theirs')
+        self.fetch.assert_not_awaited()
+
+    async def test_refreshes_in_background_near_expiry(self):
+        self.redis.hmget.return_value = ['expiring', str(time.time() + 120)]
+        manager = auth.SpotifyTokenManager(self.fetch)
+
+        self.assertEqual(await manager.get_token(), 'expiring')
+        await manager._refresh_task
+        self.assertEqual(await manager.get_token(), 'fresh')
+        self.assertEqual(manager.stats['background_refreshes'], 1)
+
+    async def test_falls_back_to_local_fetch_without_redis(self):
+        self.redis.hmget.side_effect = RedisConnectionError("redis down")
+        manager = auth.SpotifyTokenManager(self.fetch)
+
+        self.assertEqual(await manager.get_token(), 'fresh')
+        self.fetch.assert_awaited_once()
+
+if __name__ == '__main__':
+    unittest.main()
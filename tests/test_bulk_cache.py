@@ -0,0 +1,66 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+import sys
+import os
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from spotify_service.spotify import cache
+
+class TestBulkCacheOperation(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        cache.near_cache.clear()
+        self.pipe = MagicMock()
+        self.pipe.execute = AsyncMock()
+        self.redis = MagicMock()
+        self.redis.pipeline.return_value = self.pipe
+        self.redis.mget = AsyncMock()
+        for patcher in (patch.object(cache, 'get_binary_redis_client', AsyncMock(return_value=self.redis)),
+                        patch.object(cache, 'ensure_invalidation_listener')):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def test_one_read_and_one_write_per_batch(self):
+        self.redis.mget.return_value = [cache._encode({'name': 'cached'}), None, None]
+        operation = AsyncMock(side_effect=lambda item: {'name': item})
+
+        results = await cache.bulk_cache_operation([
+            (operation, 'bulk:1', ('one',), {}),
+            (operation, 'bulk:2', ('two',), {}),
+            (operation, 'bulk:3', ('three',), {}),
+        ])
+
+        self.redis.mget.assert_awaited_once_with(['bulk:1', 'bulk:2', 'bulk:3'])
+        self.assertEqual([result['status'] for result in results], ['hit', 'miss', 'miss'])
+        self.assertEqual([result['value']['name'] for result in results], ['cached', 'two', 'three'])
+        self.assertEqual(operation.await_count, 2)
+        self.assertEqual(self.pipe.setex.call_count, 2)
+        self.pipe.execute.assert_awaited_once()
+
+    async def test_errors_are_reported_per_item(self):
+        self.redis.mget.return_value = [None, None]
+        failing = AsyncMock(side_effect=ValueError("not found"))
+        working = AsyncMock(return_value={'name': 'ok'})
+
+        results = await cache.bulk_cache_operation([
+            (failing, 'bulk:bad', (), {}),
+            (working, 'bulk:good', (), {}),
+        ])
+
+        self.assertEqual(results[0]['status'], 'error')
+        self.assertIsInstance(results[0]['error'], ValueError)
+        self.assertEqual(results[1], {'status': 'miss', 'value': {'name': 'ok'}, 'error': None})
+        self.assertEqual(self.pipe.setex.call_count, 1)
+
+    async def test_runs_without_redis(self):
+        self.redis.mget.side_effect = ConnectionError("redis down")
+        operation = AsyncMock(return_value={'name': 'fresh'})
+
+        results = await cache.bulk_cache_operation([(operation, 'bulk:1', (), {})])
+
+        self.assertEqual(results[0]['status'], 'miss')
+        self.redis.pipeline.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+import sys
+import os
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from bot_service.bot.services import candidates
+from bot_service.bot.services import spotify as service
+from bot_service.bot.services.feature_index import FeatureIndex
+
+def features(level):
+    return {'danceability': level, 'energy': level, 'valence': level, 'acousticness': 1 - level,
+            'instrumentalness': 0.0, 'tempo': 50 + 150 * level, 'loudness': -60 + 60 * level}
+
+class FakeRedis:
+    """Just enough Redis for the pool: strings, served sorted sets and the claim script."""
+
+    def __init__(self):
+        self.stored = {}
+        self.served = {}
+
+    def pipeline(self, transaction=False):
+        pipe, calls = MagicMock(), []
+        for name in ('get', 'setex', 'zrange', 'zadd', 'zremrangebyrank', 'expire'):
+            setattr(pipe, name, lambda *args, _name=name: calls.append((_name, args)))
+        async def execute():
+            # Let concurrent draws all read the pool before any of them claims
+            await asyncio.sleep(0)
+            return [getattr(self, name)(*args) for name, args in calls]
+        pipe.execute = execute
+        return pipe
+
+    def get(self, key):
+        return self.stored.get(key)
+
+    def setex(self, key, ttl, value):
+        self.stored[key] = value
+
+    def zrange(self, key, start, end):
+        return sorted(self.served.get(key, {}), key=self.served.get(key, {}).get)
+
+    def zadd(self, key, mapping):
+        self.served.setdefault(key, {}).update(mapping)
+
+    def zremrangebyrank(self, key, start, end):
+        members = self.zrange(key, 0, -1)
+        for member in members[:max(0, len(members) + end + 1)]:
+            del self.served[key][member]
+
+    def expire(self, key, ttl):
+        pass
+
+    async def eval(self, script, numkeys, key, now, count, cap, ttl, *candidates):
+        served = self.served.setdefault(key, {})
+        claimed = [position for position, track_id in enumerate(candidates) if track_id not in served][:count]
+        if len(claimed) < count:
+            return []
+        served.update({candidates[position]: now for position in claimed})
+        self.zremrangebyrank(key, 0, -cap - 1)
+        return claimed
+
+class TestSeedCandidatePool(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.redis = FakeRedis()
+        self.index = FeatureIndex()
+        self.index.add({f"t{n}": features(n / 20) for n in range(20)})
+        for name, mock in [('get_binary_redis_client', AsyncMock(return_value=self.redis)), ('feature_index', self.index)]:
+            patcher = patch.object(candidates, name, mock)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def test_variants_avoid_served_tracks_until_dry(self):
+        await candidates.remember_candidates('song:seed', [f"t{n}" for n in range(20)] + ['unindexed'], ['t0', 't1'])
+
+        first = await candidates.draw_variant('song:seed', features(0.5), 8)
+        second = await candidates.draw_variant('song:seed', features(0.5), 8)
+        self.assertEqual(len(set(first)), 8)
+        self.assertFalse(set(first) & set(second))
+        self.assertFalse({'t0', 't1'} & (set(first) | set(second)))
+        # 20 candidates - 2 served - 16 drawn leaves too few for a third playlist
+        self.assertIsNone(await candidates.draw_variant('song:seed', features(0.5), 8))
+
+    async def test_regeneration_keeps_served_history(self):
+        await candidates.remember_candidates('song:seed', [f"t{n}" for n in range(10)], ['t0'])
+        await candidates.remember_candidates('song:seed', [f"t{n}" for n in range(10, 20)], ['t10'])
+        variant = await candidates.draw_variant('song:seed', features(0.5), 9)
+        self.assertEqual(sorted(variant), sorted(f"t{n}" for n in range(11, 20)))
+
+    async def test_concurrent_draws_never_share_a_track(self):
+        await candidates.remember_candidates('song:seed', [f"t{n}" for n in range(20)], [])
+
+        variants = await asyncio.gather(*(candidates.draw_variant('song:seed', features(0.5), 5) for _ in range(3)))
+        drawn = [track_id for variant in variants for track_id in variant]
+        self.assertEqual(len(drawn), 15)
+        self.assertEqual(len(set(drawn)), 15)
+
+    async def test_served_history_is_capped(self):
+        with patch.object(candidates, 'SERVED_HISTORY_MAX', 5):
+            await candidates.remember_candidates('song:seed', [f"t{n}" for n in range(20)], [f"t{n}" for n in range(8)])
+        self.assertEqual(len(self.redis.served[candidates.served_key('song:seed')]), 5)
+
+    async def test_missing_pool(self):
+        self.assertIsNone(await candidates.draw_variant('song:unknown', features(0.5), 5))
+
+class TestFreshSongPlaylist(unittest.IsolatedAsyncioTestCase):
+    async def test_variant_skips_recommendations(self):
+        profile = {'id': 'seed', 'features': features(0.5)}
+        get_recommendations = AsyncMock()
+        with patch.object(service, 'get_seed_profile', AsyncMock(return_value=profile)), \
+             patch.object(service, 'draw_variant', AsyncMock(return_value=['a', 'b'])) as draw_variant, \
+             patch.object(service, 'get_recommendations', get_recommendations):
+            self.assertEqual(await service.create_playlist_from_song('seed', target_count=2, fresh=True), ['a', 'b'])
+
+        draw_variant.assert_awaited_once_with('song:seed', features(0.5), 2)
+        get_recommendations.assert_not_awaited()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+import json
+import sys
+import os
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from spotify_service.spotify.codec import (encode, decode, project, encode_tombstone, is_empty, Tombstone,
+                                           HEADER, FLAG_COMPRESSED, CODEC_MAGIC)
+
+TRACK = {
+    'id': 't1', 'name': 'Song', 'uri': 'spotify:track:t1', 'popularity': 70, 'duration_ms': 180000,
+    'available_markets': ['US', 'DE', 'IR'] * 60, 'preview_url': 'https://p.scdn.co/mp3-preview/abc',
+    'artists': [{'id': 'a1', 'name': 'Artist', 'href': 'https://api.spotify.com/v1/artists/a1'}],
+    'album': {'id': 'al1', 'name': 'Album', 'available_markets': ['US'] * 100,
+              'images': [{'url': 'https://i.scdn.co/image/big', 'height': 640}, {'url': 'https://i.scdn.co/image/small'}]},
+}
+
+class TestCodec(unittest.TestCase):
+    def test_round_trip_keeps_fresh_until(self):
+        value, fresh_until = decode(encode({'a': [1, 2.5, 'x', None]}, 1234.5))
+        self.assertEqual(value, {'a': [1, 2.5, 'x', None]})
+        self.assertEqual(fresh_until, 1234.5)
+        self.assertIsNone(decode(encode('plain'))[1])
+
+    def test_large_payloads_are_compressed(self):
+        small, large = encode({'a': 1}), encode({'items': ['same text'] * 500})
+        self.assertFalse(HEADER.unpack_from(small)[2] & FLAG_COMPRESSED)
+        self.assertTrue(HEADER.unpack_from(large)[2] & FLAG_COMPRESSED)
+        self.assertEqual(decode(large)[0], {'items': ['same text'] * 500})
+
+    def test_foreign_entries_read_as_misses(self):
+        self.assertIsNone(decode(None))
+        self.assertIsNone(decode(json.dumps({'tracks': []}).encode()))
+        other_version = HEADER.pack(CODEC_MAGIC, 99, 0, 0.0) + b'\x80'
+        self.assertIsNone(decode(other_version))
+
+    def test_search_projection_keeps_displayed_fields(self):
+        projected = project('spotify_search', {'tracks': {'items': [TRACK], 'total': 1, 'href': 'x'}})
+        track = projected['tracks']['items'][0]
+        self.assertEqual(track['album']['images'], [{'url': 'https://i.scdn.co/image/big'}])
+        self.assertEqual(track['artists'], [{'id': 'a1', 'name': 'Artist'}])
+        self.assertNotIn('available_markets', track)
+        self.assertLess(len(encode(projected)), len(json.dumps(TRACK)) / 4)
+
+    def test_tombstones_round_trip(self):
+        tombstone = Tombstone(404, 'non existing id')
+        self.assertEqual(decode(encode_tombstone(tombstone)), (tombstone, None))
+        self.assertLess(len(encode_tombstone(tombstone)), 40)
+
+    def test_is_empty(self):
+        self.assertTrue(is_empty({'tracks': {'items': [], 'total': 0}}))
+        self.assertTrue(is_empty({'tracks': []}))
+        self.assertTrue(is_empty(None))
+        self.assertFalse(is_empty({'tracks': {'items': [TRACK]}}))
+        self.assertFalse(is_empty({'id': 'a1', 'genres': []}))
+
+    def test_unknown_families_are_stored_as_is(self):
+        self.assertIs(project('seed_profile', TRACK), TRACK)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+from unittest.mock import AsyncMock, patch
+import asyncio
+import sys
+import os
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from spotipy.exceptions import SpotifyException
+from bot_service.bot.services import spotify as service
+
+class TestFanOut(unittest.IsolatedAsyncioTestCase):
+    async def test_rounds_run_concurrently_and_stop_early(self):
+        running, peak, started = 0, 0, []
+
+        async def run_round(i):
+            nonlocal running, peak
+            started.append(i)
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return [f"track{i}_{n}" for n in range(30)]
+
+        tracks = await service.fan_out_rounds(run_round, target_count=100, max_rounds=10, concurrency=4, round_yield=30)
+
+        self.assertEqual(peak, 4)
+        self.assertLess(len(started), 10)
+        self.assertGreaterEqual(len(tracks), 100)
+        self.assertEqual(len(tracks), len(set(tracks)))
+
+    async def test_failed_rounds_are_skipped(self):
+        async def run_round(i):
+            if i % 2:
+                raise SpotifyException(500, -1, "server error")
+            return [f"track{i}"]
+
+        tracks = await service.fan_out_rounds(run_round, target_count=3, max_rounds=6)
+        self.assertEqual(sorted(tracks), ['track0', 'track2', 'track4'])
+
+    async def test_later_rounds_follow_the_shortfall(self):
+        started = []
+
+        async def run_round(i):
+            started.append(i)
+            await asyncio.sleep(0)
+            return [f"track{i}_{n}" for n in range(8)]
+
+        # Each round was expected to bring 100 ids, so one runs at a time; 8 per round then needs two more
+        tracks = await service.fan_out_rounds(run_round, target_count=20, max_rounds=10, round_yield=100)
+        self.assertEqual(started, [0, 1, 2])
+        self.assertEqual(len(tracks), 24)
+
+    async def test_rounds_fit_the_token_budget(self):
+        run_round = AsyncMock(return_value=[])
+        self.assertEqual(await service.fan_out_rounds(run_round, target_count=100, max_rounds=50), [])
+        self.assertEqual(run_round.await_count, service.FANOUT_TOKEN_BUDGET // 2)
+
+    async def test_raises_when_every_round_fails(self):
+        run_round = AsyncMock(side_effect=SpotifyException(400, -1, "invalid seed"))
+        with self.assertRaises(SpotifyException):
+            await service.fan_out_rounds(run_round, target_count=3, max_rounds=3)
+
+    async def test_no_rounds_while_paused(self):
+        run_round = AsyncMock(return_value=['track'])
+        with patch.object(service.spotify_quota, 'is_paused', return_value=True):
+            with self.assertRaises(SpotifyException) as ctx:
+                await service.fan_out_rounds(run_round, target_count=3, max_rounds=3)
+        self.assertEqual(ctx.exception.http_status, 429)
+        run_round.assert_not_awaited()
+
+    async def test_short_genre_playlist_fails(self):
+        with patch.object(service, 'get_recommendations', AsyncMock(return_value=['track1', 'track2'])):
+            with self.assertRaises(SpotifyException) as ctx:
+                await service.create_playlist_from_genre('rock', target_count=50, max_iterations=2)
+        self.assertEqual(ctx.exception.http_status, 503)
+
+    async def test_genre_playlist_fans_out(self):
+        rounds = iter(range(100))
+        get_recommendations = AsyncMock(side_effect=lambda **kwargs: [f"track{next(rounds)}_{n}" for n in range(20)])
+        with patch.object(service, 'get_recommendations', get_recommendations):
+            tracks = await service.create_playlist_from_genre('rock', target_count=50)
+
+        self.assertEqual(len(tracks), 50)
+        self.assertEqual(get_recommendations.await_args_list[0].kwargs, {'seed_genres': ['rock'], 'limit': 50})
+
+if __name__ == '__main__':
+    unittest.main()
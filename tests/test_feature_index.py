@@ -0,0 +1,108 @@
+import unittest
+from unittest.mock import AsyncMock, patch
+import sys
+import os
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from bot_service.bot.services import spotify as service
+from bot_service.bot.services.feature_index import FeatureIndex
+from spotify_service.spotify.client import CircuitBreaker
+
+def features(level):
+    return {'danceability': level, 'energy': level, 'valence': level, 'acousticness': 1 - level,
+            'instrumentalness': 0.0, 'tempo': 50 + 150 * level, 'loudness': -60 + 60 * level}
+
+class TestFeatureIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = FeatureIndex(capacity=2)
+        self.index.add({f"t{n}": features(n / 10) for n in range(11)})
+
+    def test_nearest_by_features(self):
+        self.assertEqual(self.index.nearest(features(0.52), 3), ['t5', 't6', 't4'])
+        self.assertEqual(self.index.nearest(features(0.52), 2, exclude={'t5'}), ['t6', 't4'])
+
+    def test_grows_and_updates_in_place(self):
+        self.assertEqual(len(self.index), 11)
+        self.assertEqual(self.index.add({'t0': features(0.9), 'new': features(0.2), 'empty': None}), 1)
+        self.assertEqual(len(self.index), 12)
+        self.assertIn('t0', self.index.nearest(features(0.9), 3))
+
+    def test_capped_size(self):
+        index = FeatureIndex(max_tracks=3)
+        index.add({f"t{n}": features(n / 10) for n in range(5)})
+        self.assertEqual(len(index), 3)
+        self.assertNotIn('t4', index)
+
+    def test_genre_and_popularity_filters(self):
+        self.index.tag(['t1', 't2', 't9', 'not-indexed-yet'], ['rock'])
+        self.index.set_popularity({'t1': 30, 't2': 80, 't9': 50})
+
+        self.assertCountEqual(self.index.nearest(features(0.5), 5, genres=['rock']), ['t1', 't2', 't9'])
+        self.assertEqual(self.index.nearest(features(0.5), 5, genres=['rock'], min_popularity=40, max_popularity=60), ['t9'])
+        self.assertEqual(self.index.nearest(features(0.5), 5, genres=['jazz']), [])
+
+        # Tags may arrive before the features
+        self.index.add({'not-indexed-yet': features(0.5)})
+        self.assertEqual(self.index.nearest(features(0.5), 1, genres=['rock']), ['not-indexed-yet'])
+
+class TestIndexFallback(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.index = FeatureIndex()
+        self.index.add({f"t{n}": features(n / 10) for n in range(11)})
+        self.index.tag(['t3', 't4', 't7'], ['pop'])
+        profile = {'id': 'seed', 'name': 'Song', 'artist': 'Artist', 'artist_id': 'a1', 'popularity': 60, 'features': features(0.4),
+                   'genres': ['pop'], 'similar_track_ids': []}
+        self.get_recommendations = AsyncMock(return_value=['rec1', 'rec2'])
+        patches = [
+            patch.object(service, 'feature_index', self.index),
+            patch.object(service, 'get_seed_profile', AsyncMock(return_value=profile)),
+            patch.object(service, 'get_recommendations', self.get_recommendations),
+            patch.object(service, 'filter_and_rank_tracks', AsyncMock(side_effect=lambda seed, ids, count, features, stats=None: ids[:count])),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def test_serves_from_index_while_paused(self):
+        with patch.object(service.spotify_quota, 'is_paused', return_value=True):
+            tracks = await service.create_playlist_from_song('seed', target_count=4)
+
+        self.get_recommendations.assert_not_awaited()
+        # Seed genre first, then any track; the seed's popularity band is unknown for all of them
+        self.assertEqual(tracks, ['t4', 't3', 't7', 't5'])
+
+    async def test_streamed_report_covers_index_fills(self):
+        stats = service.DiversityStats()
+        with patch.object(service.spotify_quota, 'is_paused', return_value=True):
+            tracks = await service.create_playlist_from_song('seed', target_count=4, stats=stats)
+
+        self.assertEqual(stats.count, len(tracks))
+        self.assertAlmostEqual(stats.report()['energy']['mean'], 0.475, places=5)
+
+    async def test_serves_from_index_while_circuit_is_open(self):
+        circuit = CircuitBreaker(threshold=1)
+        circuit.record_failure()
+        with patch.object(service, 'spotify_circuit', circuit):
+            tracks = await service.create_playlist_from_song('seed', target_count=2)
+
+        self.get_recommendations.assert_not_awaited()
+        self.assertEqual(tracks, ['t4', 't3'])
+
+    async def test_fills_short_recommendations(self):
+        tracks = await service.create_playlist_from_song('seed', target_count=4)
+
+        self.assertEqual(tracks, ['rec1', 'rec2', 't4', 't3'])
+
+    async def test_diversity_report_fetches_only_unindexed_tracks(self):
+        fetch = AsyncMock(return_value={'unseen': features(1.0)})
+        with patch.object(service, 'get_audio_features_batch', fetch):
+            report = await service.analyze_playlist_diversity(['t0', 'unseen'])
+
+        fetch.assert_awaited_once_with(['unseen'])
+        self.assertAlmostEqual(report['energy']['mean'], 0.5, places=5)
+        self.assertAlmostEqual(report['energy']['range'], 1.0, places=5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+import asyncio
+import json
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+import sys
+import os
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from redis.exceptions import ConnectionError as RedisConnectionError
+from bot_service.bot.services import jobs
+from bot_service.bot.handlers import playlist
+
+def callback_update(user_id=7):
+    update = MagicMock()
+    update.effective_user.id = user_id
+    update.callback_query.message.chat_id = 100
+    update.callback_query.message.message_id = 200
+    update.callback_query.inline_message_id = None
+    update.callback_query.edit_message_text = AsyncMock()
+    return update
+
+class TestJobQueue(unittest.IsolatedAsyncioTestCase):
+    async def test_enqueue_passes_keys_and_limits_to_script(self):
+        redis = AsyncMock()
+        redis.eval.return_value = ['queued', 'job1']
+        job = jobs.new_job(7, 'song:abc:50', data_type='song')
+        with patch.object(jobs, 'get_redis_pool', AsyncMock(return_value=redis)):
+            self.assertEqual(await jobs.enqueue_job(job), ('queued', 'job1'))
+
+        args = redis.eval.await_args.args
+        self.assertEqual(args[1:5], (3, 'playlist_jobs:dedupe:7:song:abc:50', 'playlist_jobs:active:7', jobs.JOB_QUEUE_KEY))
+        self.assertEqual(args[6], jobs.JOB_USER_LIMIT)
+
+    async def test_failed_job_still_releases_its_slot(self):
+        process = AsyncMock(side_effect=RuntimeError('boom'))
+        with patch.object(jobs, 'finish_job', AsyncMock()) as finish_job:
+            await jobs.run_job(process, {'id': 'job1'})
+        finish_job.assert_awaited_once_with({'id': 'job1'})
+
+class FakeQueueRedis:
+    """Redis lists and the workers sorted set, as the worker and the stale-job sweep use them."""
+
+    def __init__(self, queue=()):
+        self.lists = {jobs.JOB_QUEUE_KEY: list(queue)}
+        self.workers = {}
+
+    async def zadd(self, key, mapping):
+        self.workers.update(mapping)
+
+    async def zrangebyscore(self, key, low, high):
+        return [member for member, score in self.workers.items() if low <= score <= high]
+
+    async def zrem(self, key, member):
+        self.workers.pop(member, None)
+
+    async def lmove(self, source, destination, src, dest):
+        # Only RIGHT -> LEFT/RIGHT moves are used
+        items = self.lists.get(source) or []
+        if not items:
+            return None
+        item = items.pop()
+        target = self.lists.setdefault(destination, [])
+        if dest == 'LEFT':
+            target.insert(0, item)
+        else:
+            target.append(item)
+        return item
+
+    async def blmove(self, source, destination, timeout, src, dest):
+        if not self.lists.get(source):
+            raise asyncio.CancelledError()  # Ends the worker loop once the queue is drained
+        return await self.lmove(source, destination, src, dest)
+
+    async def lrem(self, key, count, value):
+        self.lists[key].remove(value)
+
+class TestReliableQueue(unittest.IsolatedAsyncioTestCase):
+    async def test_job_stays_in_processing_list_until_done(self):
+        raw = json.dumps({'id': 'job1', 'user_id': 7, 'dedupe_key': 'k'})
+        redis = FakeQueueRedis([raw])
+        seen = []
+        async def process(job):
+            seen.append(list(redis.lists['processing:w0']))
+        with patch.object(jobs, 'get_redis_pool', AsyncMock(return_value=redis)), \
+             patch.object(jobs, 'finish_job', AsyncMock()):
+            with self.assertRaises(asyncio.CancelledError):
+                await jobs._worker(process, 'processing:w0')
+
+        self.assertEqual(seen, [[raw]])
+        self.assertEqual(redis.lists['processing:w0'], [])
+        self.assertIn('processing:w0', redis.workers)
+
+    async def test_stale_workers_jobs_are_requeued(self):
+        redis = FakeQueueRedis(['waiting'])
+        redis.lists['processing:dead'] = ['orphan']
+        redis.lists['processing:alive'] = ['running']
+        redis.workers = {'processing:dead': 0, 'processing:alive': jobs.time.time()}
+        with patch.object(jobs, 'get_redis_pool', AsyncMock(return_value=redis)):
+            self.assertEqual(await jobs.requeue_stale_jobs(), 1)
+
+        # The orphan is taken before jobs that were already waiting
+        self.assertEqual(redis.lists[jobs.JOB_QUEUE_KEY], ['waiting', 'orphan'])
+        self.assertEqual(redis.lists['processing:alive'], ['running'])
+        self.assertEqual(list(redis.workers), ['processing:alive'])
+
+class TestPlaylistHandler(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        for name, mock in [('find_generated_playlist', AsyncMock(return_value=None)), ('register_generated_playlist', AsyncMock())]:
+            patcher = patch.object(playlist, name, mock)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def test_handler_only_queues(self):
+        update, context = callback_update(), MagicMock(user_data={'language': 'fa'})
+        enqueue_job = AsyncMock(return_value=(jobs.JOB_QUEUED, 'job1'))
+        with patch.object(playlist, 'enqueue_job', enqueue_job), \
+             patch.object(playlist, 'generate_playlist', AsyncMock()) as generate:
+            await playlist.create_playlist_with_count(update, context, 50, 'song_abc')
+
+        generate.assert_not_awaited()
+        job = enqueue_job.await_args.args[0]
+        self.assertEqual((job['user_id'], job['dedupe_key'], job['chat_id'], job['message_id']), (7, 'song:abc:50', 100, 200))
+        self.assertEqual(job['language'], 'fa')
+        update.callback_query.edit_message_text.assert_awaited_once()
+
+    async def test_queued_message_is_shown_before_the_job_is_pushed(self):
+        update, context = callback_update(), MagicMock(user_data={})
+        edited_before_push = []
+        async def enqueue(job):
+            edited_before_push.append(update.callback_query.edit_message_text.await_count)
+            return jobs.JOB_QUEUED, job['id']
+        with patch.object(playlist, 'enqueue_job', enqueue):
+            await playlist.create_playlist_with_count(update, context, 50, 'song_abc')
+        self.assertEqual(edited_before_push, [1])
+        self.assertEqual(update.callback_query.edit_message_text.await_args.kwargs['text'], playlist.get_text({}, 'playlist_queued'))
+
+    async def test_duplicate_is_reported(self):
+        update, context = callback_update(), MagicMock(user_data={})
+        with patch.object(playlist, 'enqueue_job', AsyncMock(return_value=(jobs.JOB_DUPLICATE, 'job0'))):
+            await playlist.create_playlist_with_count(update, context, 50, 'song_abc')
+        text = update.callback_query.edit_message_text.await_args.kwargs['text']
+        self.assertEqual(text, playlist.get_text({}, 'playlist_job_duplicate'))
+
+    async def test_runs_inline_without_redis(self):
+        update, context = callback_update(), MagicMock(user_data={})
+        with patch.object(playlist, 'enqueue_job', AsyncMock(side_effect=RedisConnectionError('down'))), \
+             patch.object(playlist, 'process_playlist_job', AsyncMock()) as process:
+            await playlist.create_playlist_with_count(update, context, 50, 'genre_rock')
+        self.assertEqual(process.await_args.args[1]['data_id'], 'rock')
+
+    async def test_worker_reports_progress_then_link(self):
+        bot = MagicMock(edit_message_text=AsyncMock())
+        job = jobs.new_job(7, 'genre:rock:1', chat_id=100, message_id=200, data_type='genre', data_id='rock',
+                           track_count=1, language='en')
+        with patch.object(playlist, 'generate_playlist', AsyncMock(return_value=('Rock', ['t1']))), \
+             patch.object(playlist, 'create_playlist_async', AsyncMock(return_value='https://open.spotify.com/playlist/p1')), \
+             patch.object(playlist, 'save_playlist', AsyncMock()) as save:
+            await playlist.process_playlist_job(bot, job)
+
+        texts = [call.kwargs['text'] for call in bot.edit_message_text.await_args_list]
+        self.assertEqual(len(texts), 4)
+        self.assertIn('https://open.spotify.com/playlist/p1', texts[-1])
+        self.assertEqual(bot.edit_message_text.await_args.kwargs['chat_id'], 100)
+        save.assert_awaited_once_with(7, 'genre', 'rock', 'Rock', 'https://open.spotify.com/playlist/p1', ['t1'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+from unittest.mock import AsyncMock, patch
+import sys
+import os
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from bot_service.bot.services import spotify as service
+from bot_service.bot.services import pools
+from bot_service.bot.handlers import playlist
+
+class TestMoodPlaylist(unittest.IsolatedAsyncioTestCase):
+    async def test_seed_tracks_come_from_the_mood_pool(self):
+        pool = {'tracks': {
+            'gloomy': {'valence': 0.1, 'energy': 0.2, 'danceability': 0.2},
+            'cheerful': {'valence': 0.9, 'energy': 0.7, 'danceability': 0.8},
+            'upbeat': {'valence': 0.7, 'energy': 0.8, 'danceability': 0.6},
+        }}
+        with patch.object(pools, 'load_pool', AsyncMock(return_value=pool)):
+            self.assertEqual(await pools.mood_seed_tracks('happy'), ['cheerful', 'upbeat'])
+        with patch.object(pools, 'load_pool', AsyncMock(return_value=None)):
+            self.assertEqual(await pools.mood_seed_tracks('happy'), [])
+
+    async def test_recommendations_from_the_mood_profile(self):
+        get_recommendations = AsyncMock(return_value=[f"t{n}" for n in range(10)])
+        with patch.object(service, 'get_recommendations', get_recommendations):
+            tracks = await service.create_playlist_from_mood('sad', target_count=5, seed_tracks=['s1'])
+
+        self.assertEqual(tracks, [f"t{n}" for n in range(5)])
+        args, kwargs = get_recommendations.await_args_list[0]
+        self.assertEqual(args[:3], (['s1'], None, ['sad', 'acoustic']))
+        self.assertEqual(kwargs['target_valence'], 0.2)
+
+    async def test_unknown_mood(self):
+        with self.assertRaises(ValueError):
+            await service.create_playlist_from_mood('sleepy')
+
+class TestArtistPlaylist(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        features = {'t1': {'energy': 0.2, 'valence': 0.4}, 't2': {'energy': 0.6, 'valence': 0.8}, 't3': None}
+        self.patches = {
+            'cached_get_artist': AsyncMock(return_value={'name': 'Artist', 'genres': ['indie', 'folk', 'rock']}),
+            'cached_get_artist_top_tracks': AsyncMock(return_value={'tracks': [{'id': 't1'}, {'id': 't2'}, {'id': 't3'}]}),
+            'get_audio_features_batch': AsyncMock(return_value=features),
+        }
+        for name, mock in self.patches.items():
+            patcher = patch.object(service, name, mock)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        async def uncached(operation, cache_key, *args, **kwargs):
+            return await operation(*args)
+        patcher = patch.object(service, 'cached_operation', uncached)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_profile_from_cached_metadata_and_top_tracks(self):
+        profile = await service.get_artist_profile('a1')
+
+        self.assertEqual(profile['name'], 'Artist')
+        self.assertEqual(profile['genres'], ['indie', 'folk'])
+        self.assertEqual(profile['top_track_ids'], ['t1', 't2', 't3'])
+        self.assertAlmostEqual(profile['features']['energy'], 0.4)
+        self.assertAlmostEqual(profile['features']['valence'], 0.6)
+
+    async def test_playlist_is_seeded_and_ranked_by_the_artist_sound(self):
+        get_recommendations = AsyncMock(return_value=['r1', 'r2', 'r3'])
+        filter_and_rank_tracks = AsyncMock(return_value=['r2', 'r1'])
+        with patch.object(service, 'get_recommendations', get_recommendations), \
+             patch.object(service, 'filter_and_rank_tracks', filter_and_rank_tracks):
+            tracks = await service.create_playlist_from_artist('a1', target_count=2)
+
+        self.assertEqual(tracks, ['r2', 'r1'])
+        args, kwargs = get_recommendations.await_args_list[0]
+        self.assertEqual(args[:2], (['t1', 't2'], ['a1']))
+        self.assertAlmostEqual(kwargs['target_energy'], 0.4)
+        self.assertAlmostEqual(filter_and_rank_tracks.await_args.args[3]['valence'], 0.6)
+
+    async def test_handler_names_playlist_from_cached_profile(self):
+        with patch.object(playlist, 'create_playlist_from_artist', AsyncMock(return_value=['r1'])), \
+             patch.object(playlist, 'get_artist_profile', AsyncMock(return_value={'name': 'Artist'})):
+            name, tracks = await playlist.generate_playlist('artist', 'a1', 50)
+        self.assertEqual((name, tracks), ("Playlist inspired by Artist (50 tracks)", ['r1']))
+
+if __name__ == '__main__':
+    unittest.main()
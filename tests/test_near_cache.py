@@ -0,0 +1,60 @@
+import unittest
+from unittest.mock import patch
+import sys
+import os
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from spotify_service.spotify.near_cache import NearCache
+
+class TestNearCache(unittest.TestCase):
+    def test_hit_and_miss(self):
+        cache = NearCache(max_bytes=1000)
+        self.assertIsNone(cache.get("spotify_search:shape of you:track:10"))
+        cache.set("spotify_search:shape of you:track:10", {'tracks': {}}, 100)
+        self.assertEqual(cache.get("spotify_search:shape of you:track:10"), {'tracks': {}})
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_evicts_least_recently_used_over_byte_budget(self):
+        cache = NearCache(max_bytes=250)
+        cache.set("artist:a", 'a', 100)
+        cache.set("artist:b", 'b', 100)
+        cache.get("artist:a")  # "b" is now the least recently used
+        cache.set("artist:c", 'c', 100)
+
+        self.assertEqual(cache.get("artist:a"), 'a')
+        self.assertIsNone(cache.get("artist:b"))
+        self.assertEqual(cache.get("artist:c"), 'c')
+        self.assertEqual(cache.stats()['bytes'], 200)
+
+    def test_entry_limit(self):
+        cache = NearCache(max_bytes=10000, max_entries=2)
+        for key in ("artist:a", "artist:b", "artist:c"):
+            cache.set(key, key, 1)
+        self.assertEqual(cache.stats()['entries'], 2)
+        self.assertIsNone(cache.get("artist:a"))
+
+    def test_family_ttl(self):
+        cache = NearCache(ttls={'spotify_search': 10, 'artist': 0}, default_ttl=5)
+        with patch('spotify_service.spotify.near_cache.time.monotonic', return_value=100.0):
+            cache.set("spotify_search:q:track:10", 'q', 1)
+            cache.set("artist:a", 'a', 1)  # TTL 0 disables the near cache for this family
+            cache.set("other:x", 'x', 1)
+        with patch('spotify_service.spotify.near_cache.time.monotonic', return_value=107.0):
+            self.assertEqual(cache.get("spotify_search:q:track:10"), 'q')
+            self.assertIsNone(cache.get("artist:a"))
+            self.assertIsNone(cache.get("other:x"))
+        with patch('spotify_service.spotify.near_cache.time.monotonic', return_value=111.0):
+            self.assertIsNone(cache.get("spotify_search:q:track:10"))
+
+    def test_invalidate(self):
+        cache = NearCache()
+        cache.set("artist:a", 'a', 10)
+        cache.invalidate("artist:a")
+        self.assertIsNone(cache.get("artist:a"))
+        self.assertEqual(cache.stats()['bytes'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+import sys
+import os
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from spotipy.exceptions import SpotifyException
+from spotify_service.spotify import cache
+from spotify_service.spotify.codec import decode, Tombstone
+from bot_service.bot.services import spotify as service
+
+class TestNegativeCache(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        cache.near_cache.clear()
+        self.store = {}
+        self.redis = MagicMock()
+        self.redis.get = AsyncMock(side_effect=lambda key: self.store.get(key))
+        self.redis.setex = AsyncMock(side_effect=lambda key, ttl, value: self.store.__setitem__(key, value))
+        self.redis.set = AsyncMock(return_value=True)
+        self.redis.exists = AsyncMock(return_value=0)
+        self.redis.eval = AsyncMock()
+        self.redis.publish = AsyncMock()
+        for patcher in (patch.object(cache, 'get_binary_redis_client', AsyncMock(return_value=self.redis)),
+                        patch.object(cache, 'ensure_invalidation_listener')):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def test_empty_results_are_cached_briefly(self):
+        operation = AsyncMock(return_value={'tracks': {'items': [], 'total': 0}})
+
+        for _ in range(2):
+            result = await cache.cached_operation(operation, 'spotify_search:qwzx:track:10')
+            cache.near_cache.clear()
+
+        self.assertEqual(result, {'tracks': {'items': [], 'total': 0}})
+        operation.assert_awaited_once()
+        self.assertEqual(self.redis.setex.await_args.args[1], cache.NEGATIVE_TTL_EMPTY)
+        self.assertIsInstance(decode(self.store['spotify_search:qwzx:track:10'])[0], Tombstone)
+
+    async def test_not_found_is_raised_again_without_calling_spotify(self):
+        operation = AsyncMock(side_effect=SpotifyException(404, -1, "non existing id"))
+
+        for _ in range(2):
+            with self.assertRaises(SpotifyException) as ctx:
+                await cache.cached_operation(operation, 'artist:unknown')
+            cache.near_cache.clear()
+
+        self.assertEqual(ctx.exception.http_status, 404)
+        operation.assert_awaited_once()
+        self.assertGreaterEqual(cache.get_negative_cache_stats()['negative_hits'], 1)
+
+    async def test_transient_errors_are_not_cached(self):
+        operation = AsyncMock(side_effect=SpotifyException(500, -1, "server error"))
+
+        for _ in range(2):
+            with self.assertRaises(SpotifyException):
+                await cache.cached_operation(operation, 'artist:flaky')
+
+        self.assertEqual(operation.await_count, 2)
+        self.redis.setex.assert_not_awaited()
+
+    async def test_invalid_recommendation_seeds_are_remembered(self):
+        recommendations = AsyncMock(side_effect=SpotifyException(400, -1, "invalid request"))
+        with patch.object(service.sp, 'recommendations', recommendations):
+            for seeds in (['t2', 't1'], ['t1', 't2']):
+                with self.assertRaises(SpotifyException) as ctx:
+                    await service.get_recommendations(seed_tracks=seeds, seed_genres=['pop'])
+                cache.near_cache.clear()
+
+        self.assertEqual(ctx.exception.http_status, 400)
+        recommendations.assert_awaited_once()
+        self.assertIn('recommendation_params:limit=40&seed_genres=pop&seed_tracks=t1,t2', self.store)
+
+    async def test_rejected_targets_do_not_block_the_same_seeds(self):
+        recommendations = AsyncMock(side_effect=[SpotifyException(400, -1, "invalid request"), {'tracks': [{'id': 'r1'}]}])
+        with patch.object(service.sp, 'recommendations', recommendations):
+            with self.assertRaises(SpotifyException):
+                await service.get_recommendations(seed_tracks=['t1'], target_energy=0.5)
+            cache.near_cache.clear()
+            self.assertEqual(await service.get_recommendations(seed_tracks=['t1']), ['r1'])
+        self.assertEqual(recommendations.await_count, 2)
+
+    async def test_recommendation_results_stay_live(self):
+        recommendations = AsyncMock(return_value={'tracks': [{'id': 'r1'}]})
+        with patch.object(service.sp, 'recommendations', recommendations):
+            for _ in range(2):
+                self.assertEqual(await service.get_recommendations(seed_tracks=['t1']), ['r1'])
+        self.assertEqual(recommendations.await_count, 2)
+        self.assertEqual(self.store, {})
+
+if __name__ == '__main__':
+    unittest.main()
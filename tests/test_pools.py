@@ -0,0 +1,87 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+import sys
+import os
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from bot_service.bot.services import pools
+from spotify_service.spotify.codec import encode, decode
+
+FEATURES = {'danceability': 0.5, 'energy': 0.5, 'valence': 0.5, 'acousticness': 0.5, 'instrumentalness': 0.0,
+            'tempo': 120.0, 'loudness': -8.0, 'uri': 'ignored'}
+
+class TestCandidatePools(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.stored = {}
+        self.redis = AsyncMock()
+        self.redis.get.side_effect = lambda key: self.stored.get(key)
+        self.pipe = MagicMock()
+        self.pipe.setex.side_effect = lambda key, ttl, value: self.stored.__setitem__(key, value)
+        self.pipe.execute = AsyncMock()
+        self.redis.pipeline = MagicMock(return_value=self.pipe)
+        self.get_recommendations = AsyncMock(side_effect=[[f"new{n}" for n in range(3)], ['new2', 'new3'], SystemError('boom')])
+        patches = [
+            patch.object(pools, 'get_binary_redis_client', AsyncMock(return_value=self.redis)),
+            patch.object(pools, 'get_recommendations', self.get_recommendations),
+            patch.object(pools, 'get_audio_features_batch', AsyncMock(side_effect=lambda ids: {i: FEATURES for i in ids})),
+            patch.object(pools, 'publish_invalidation', AsyncMock()),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        pools.near_cache.clear()
+
+    def store(self, kind, name, track_ids):
+        self.stored[pools.pool_key(kind, name)] = encode({'tracks': {i: {} for i in track_ids}, 'refreshed_at': 0})
+
+    async def test_samples_without_repeats(self):
+        self.store('genre', 'rock', [f"t{n}" for n in range(30)])
+        tracks = await pools.sample_pool('genre', 'rock', 20)
+        self.assertEqual(len(set(tracks)), 20)
+        self.assertLessEqual(set(tracks), {f"t{n}" for n in range(30)})
+
+        # Later samples come from memory
+        self.redis.get.reset_mock()
+        await pools.sample_pool('genre', 'rock', 20)
+        self.redis.get.assert_not_awaited()
+
+    async def test_missing_or_small_pool_is_a_miss(self):
+        self.store('genre', 'jazz', [f"t{n}" for n in range(10)])
+        self.assertIsNone(await pools.sample_pool('genre', 'jazz', 10))
+        self.assertIsNone(await pools.sample_pool('genre', 'polka', 10))
+
+    async def test_refresh_puts_new_tracks_first_and_rotates_old_out(self):
+        self.store('mood', 'happy', ['old1', 'new1', 'old2'])
+        with patch.object(pools, 'POOL_SIZE', 5):
+            self.assertEqual(await pools.refresh_pool('mood', 'happy'), 5)
+
+        pool = decode(self.stored[pools.pool_key('mood', 'happy')])[0]
+        self.assertEqual(list(pool['tracks']), ['new0', 'new1', 'new2', 'new3', 'old1'])
+        self.assertNotIn('uri', pool['tracks']['new0'])
+        args, kwargs = self.get_recommendations.await_args
+        self.assertEqual(kwargs['seed_genres'], ['happy', 'pop'])
+        self.assertIn('target_danceability', kwargs)
+
+class TestRefreshPools(unittest.IsolatedAsyncioTestCase):
+    async def test_missing_then_stalest_within_budget(self):
+        redis = AsyncMock()
+        now = pools.time.time()
+        redis.zrange.return_value = [(f"genre:{genre}", now) for genre in pools.SPOTIFY_GENRES[2:]] + \
+                                    [('genre:acoustic', now - 7 * 3600), ('mood:sad', now)]
+        refresh_pool = AsyncMock(return_value=100)
+        with patch.object(pools, 'get_redis_pool', AsyncMock(return_value=redis)), \
+             patch.object(pools, 'refresh_pool', refresh_pool), \
+             patch.object(pools.spotify_quota, 'is_paused', return_value=False):
+            stats = await pools.refresh_pools(budget=pools.refresh_cost() * 10)
+
+        refreshed = [call.args for call in refresh_pool.await_args_list]
+        # Never refreshed first (afrobeat and every mood but sad), then the stale acoustic pool; fresh ones are skipped
+        self.assertEqual(refreshed[0], ('genre', 'afrobeat'))
+        self.assertEqual(refreshed[-1], ('genre', 'acoustic'))
+        self.assertEqual(len(refreshed), 7)
+        self.assertEqual(stats['spent'], pools.refresh_cost() * 7)
+
+if __name__ == '__main__':
+    unittest.main()
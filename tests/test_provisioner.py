@@ -0,0 +1,113 @@
+import json
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+import sys
+import os
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from spotipy.exceptions import SpotifyException
+from bot_service.bot.services import provisioner
+
+ENTRY = {'id': 'p1', 'url': 'https://open.spotify.com/playlist/p1', 'created_at': 0}
+
+def fake_redis(pooled=None, claims=0):
+    redis = MagicMock()
+    redis.rpop = AsyncMock(return_value=json.dumps(pooled) if pooled else None)
+    redis.rpush = AsyncMock()
+    redis.lpush = AsyncMock()
+    pipe = MagicMock(execute=AsyncMock(return_value=[claims, 0]))
+    redis.pipeline.return_value = pipe
+    return redis
+
+def fake_client():
+    client = MagicMock()
+    for name in ['playlist_change_details', 'playlist_replace_items', 'playlist_add_items']:
+        setattr(client, name, AsyncMock())
+    client.user_playlist_create = AsyncMock(return_value={'id': 'new', 'external_urls': {'spotify': 'https://open.spotify.com/playlist/new'}})
+    return client
+
+class TestPlaylistProvisioner(unittest.IsolatedAsyncioTestCase):
+    def test_pool_follows_claim_rate(self):
+        self.assertEqual(provisioner.target_pool_size(0), provisioner.PROVISION_MIN)
+        self.assertEqual(provisioner.target_pool_size(360), 60)
+        self.assertEqual(provisioner.target_pool_size(10 ** 6), provisioner.PROVISION_MAX)
+
+    async def test_publish_claims_renames_and_fills_in_chunks(self):
+        redis, client = fake_redis(pooled=ENTRY), fake_client()
+        tracks = [f"t{n}" for n in range(250)]
+        with patch.object(provisioner, 'get_redis_pool', AsyncMock(return_value=redis)), \
+             patch.object(provisioner, 'sp', client):
+            link = await provisioner.publish_playlist('Rock', tracks)
+
+        self.assertEqual(link, ENTRY['url'])
+        client.user_playlist_create.assert_not_awaited()
+        client.playlist_change_details.assert_awaited_once_with('p1', name='Rock', public=True,
+                                                                description=provisioner.PLAYLIST_DESCRIPTION)
+        client.playlist_replace_items.assert_awaited_once_with('p1', tracks[:100])
+        self.assertEqual([call.args[1] for call in client.playlist_add_items.await_args_list], [tracks[100:200], tracks[200:]])
+
+    async def test_empty_track_list_is_rejected_before_claiming(self):
+        redis, client = fake_redis(pooled=ENTRY), fake_client()
+        with patch.object(provisioner, 'get_redis_pool', AsyncMock(return_value=redis)), \
+             patch.object(provisioner, 'sp', client):
+            with self.assertRaises(ValueError):
+                await provisioner.publish_playlist('Rock', [])
+        redis.rpop.assert_not_awaited()
+        client.playlist_change_details.assert_not_awaited()
+
+    async def test_empty_pool_creates_directly(self):
+        redis, client = fake_redis(), fake_client()
+        with patch.object(provisioner, 'get_redis_pool', AsyncMock(return_value=redis)), \
+             patch.object(provisioner, 'sp', client):
+            link = await provisioner.publish_playlist('Rock', ['t1'])
+        self.assertEqual(link, 'https://open.spotify.com/playlist/new')
+        client.playlist_replace_items.assert_awaited_once_with('new', ['t1'])
+
+    async def test_failed_fill_recycles_the_playlist_as_a_private_placeholder(self):
+        redis, client = fake_redis(pooled=ENTRY), fake_client()
+        client.playlist_replace_items.side_effect = RuntimeError('boom')
+        with patch.object(provisioner, 'get_redis_pool', AsyncMock(return_value=redis)), \
+             patch.object(provisioner, 'sp', client):
+            with self.assertRaises(RuntimeError):
+                await provisioner.publish_playlist('Rock', ['t1'])
+        client.playlist_change_details.assert_awaited_with('p1', name=provisioner.PROVISION_NAME, public=False,
+                                                           description=provisioner.PLAYLIST_DESCRIPTION)
+        requeued = json.loads(redis.lpush.await_args.args[1])
+        self.assertEqual((requeued['id'], requeued['attempts']), ('p1', 1))
+
+    async def test_deleted_playlist_is_dropped_and_publish_creates_one(self):
+        redis, client = fake_redis(pooled=ENTRY), fake_client()
+        client.playlist_change_details.side_effect = SpotifyException(404, -1, "Not found")
+        with patch.object(provisioner, 'get_redis_pool', AsyncMock(return_value=redis)), \
+             patch.object(provisioner, 'sp', client):
+            link = await provisioner.publish_playlist('Rock', ['t1'])
+        self.assertEqual(link, 'https://open.spotify.com/playlist/new')
+        redis.lpush.assert_not_awaited()
+
+    async def test_transient_claim_failure_requeues_until_the_cap(self):
+        redis, client = fake_redis(pooled=ENTRY), fake_client()
+        client.playlist_change_details.side_effect = SpotifyException(502, -1, "Bad gateway")
+        with patch.object(provisioner, 'get_redis_pool', AsyncMock(return_value=redis)), \
+             patch.object(provisioner, 'sp', client):
+            self.assertIsNone(await provisioner.claim_playlist('Rock'))
+            self.assertEqual(json.loads(redis.lpush.await_args.args[1])['attempts'], 1)
+
+            redis.lpush.reset_mock()
+            redis.rpop.return_value = json.dumps({**ENTRY, 'attempts': provisioner.PROVISION_MAX_ATTEMPTS})
+            self.assertIsNone(await provisioner.claim_playlist('Rock'))
+            redis.lpush.assert_not_awaited()
+
+    async def test_provisioning_tops_up_to_target(self):
+        redis, client = fake_redis(claims=0), fake_client()
+        with patch.object(provisioner, 'get_redis_pool', AsyncMock(return_value=redis)), \
+             patch.object(provisioner, 'sp', client), \
+             patch.object(provisioner.spotify_quota, 'is_paused', return_value=False):
+            created = await provisioner.provision_playlists()
+        self.assertEqual(created, provisioner.PROVISION_MIN)
+        self.assertFalse(client.user_playlist_create.await_args.kwargs['public'])
+        self.assertEqual(redis.lpush.await_count, provisioner.PROVISION_MIN)
+
+if __name__ == '__main__':
+    unittest.main()
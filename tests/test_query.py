@@ -0,0 +1,87 @@
+import unittest
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+import sys
+import os
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from spotify_service.spotify.query import clean_query, normalize_query, prefix_candidates, filter_results
+from spotify_service.spotify import cache
+
+class TestNormalizeQuery(unittest.TestCase):
+    def test_case_and_whitespace(self):
+        variants = ["Shape of you", "shape of you ", "SHAPE OF YOU", "  shape   of\tyou"]
+        self.assertEqual({normalize_query(v) for v in variants}, {"shape of you"})
+
+    def test_unicode_compatibility_forms(self):
+        self.assertEqual(normalize_query("Ｓｈａｐｅ"), "shape")
+        self.assertEqual(normalize_query("Straße"), "strasse")
+
+    def test_arabic_and_persian_letters_unified(self):
+        # "Arabic" yeh/kaf typed on an Arabic keyboard vs the Persian letters
+        self.assertEqual(normalize_query("كيهان"), normalize_query("کیهان"))
+
+    def test_zwnj_tatweel_and_diacritics(self):
+        plain = normalize_query("می خوام")
+        self.assertEqual(normalize_query("می‌خوام"), plain)
+        self.assertEqual(normalize_query("می خـوام"), plain)
+        self.assertEqual(normalize_query("مِی خوام"), plain)
+
+    def test_clean_query_keeps_the_spelling(self):
+        self.assertEqual(clean_query("  می‌خوام   Shape\tOf "), "می‌خوام Shape Of")
+
+    def test_persian_digits(self):
+        self.assertEqual(normalize_query("۲۰۲۴"), "2024")
+
+class TestPrefixReuse(unittest.TestCase):
+    def setUp(self):
+        self.results = {'tracks': {'items': [
+            {'name': 'Shape of You', 'artists': [{'name': 'Ed Sheeran'}], 'album': {'name': '÷'}},
+            {'name': 'Shape of My Heart', 'artists': [{'name': 'Sting'}], 'album': {'name': 'Ten Summoner\'s Tales'}},
+            {'name': 'Shallow', 'artists': [{'name': 'Lady Gaga'}], 'album': {'name': 'A Star Is Born'}},
+        ]}}
+
+    def test_prefix_candidates_longest_first(self):
+        self.assertEqual(prefix_candidates("shape o"), ["shape", "shap", "sha"])
+        self.assertEqual(prefix_candidates("sh"), [])
+
+    def test_filter_matches_every_word(self):
+        names = [item['name'] for item in filter_results(self.results, 'track', "shape of")]
+        self.assertEqual(names, ['Shape of You', 'Shape of My Heart'])
+
+    def test_filter_matches_artist_and_partial_last_word(self):
+        names = [item['name'] for item in filter_results(self.results, 'track', "shape ed sh")]
+        self.assertEqual(names, ['Shape of You'])
+
+    def test_filter_artists_by_name(self):
+        results = {'artists': {'items': [{'name': 'Ed Sheeran'}, {'name': 'Eminem'}]}}
+        self.assertEqual(len(filter_results(results, 'artist', "ed she")), 1)
+
+class TestPrefixAnswer(unittest.IsolatedAsyncioTestCase):
+    async def test_prefix_answer_loads_the_exact_query_in_background(self):
+        cache.near_cache.clear()
+        items = [{'name': f"Shape of You {n}", 'artists': [{'name': 'Ed Sheeran'}], 'album': {'name': '÷'}} for n in range(3)]
+        store = {cache._search_key('shape', 'track', 10): cache._encode({'tracks': {'items': items}}, 3600)}
+        redis = MagicMock()
+        redis.get = AsyncMock(side_effect=lambda key: store.get(key))
+        redis.mget = AsyncMock(side_effect=lambda keys: [store.get(key) for key in keys])
+        redis.setex = AsyncMock(side_effect=lambda key, ttl, value: store.__setitem__(key, value))
+        redis.set = AsyncMock(return_value=True)
+        redis.publish = AsyncMock()
+        exact = {'tracks': {'items': [{'name': 'Shape of You', 'artists': [{'name': 'Ed Sheeran'}], 'album': {'name': '÷'}}]}}
+        with patch.object(cache, 'get_binary_redis_client', AsyncMock(return_value=redis)), \
+             patch.object(cache, 'ensure_invalidation_listener'), \
+             patch.object(cache, 'spotify_search', AsyncMock(return_value=exact)) as spotify_search:
+            result = await cache.cached_spotify_search("  Shape   of ", 'track', 10)
+            self.assertEqual(len(result['tracks']['items']), 3)
+            await asyncio.gather(*list(cache._refresh_tasks.values()))
+
+        # Cached under the normalized text, fetched with the text as typed
+        spotify_search.assert_awaited_once_with('Shape of', 'track', 10)
+        self.assertIn(cache._search_key('shape of', 'track', 10), store)
+        cache.near_cache.clear()
+
+if __name__ == '__main__':
+    unittest.main()
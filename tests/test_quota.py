@@ -0,0 +1,91 @@
+import unittest
+import asyncio
+from unittest.mock import AsyncMock, patch
+import sys
+import os
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from spotipy.exceptions import SpotifyException
+from spotify_service.spotify.quota import DistributedTokenBucket, retry_after_seconds, endpoint_cost
+
+class TestDistributedTokenBucket(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.redis = AsyncMock()
+        patcher = patch('spotify_service.spotify.quota.get_redis_pool', AsyncMock(return_value=self.redis))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_queued_requests_share_a_round_trip(self):
+        bucket = DistributedTokenBucket(per_hour=3600, capacity=10, local_burst=3)
+
+        async def grant(*args):
+            await asyncio.sleep(0)
+            return [args[-2], 0]
+        self.redis.eval.side_effect = grant
+
+        await asyncio.gather(*(bucket.acquire('search') for _ in range(4)))
+
+        # The first round trip is for the first request alone; the rest queue behind it and share the next
+        self.assertEqual([call.args[-2:] for call in self.redis.eval.await_args_list], [(1, 1), (3, 1)])
+
+    async def test_lone_requests_take_only_their_cost(self):
+        bucket = DistributedTokenBucket(per_hour=3600, capacity=10, local_burst=3)
+        self.redis.eval.return_value = [1, 0]
+        for _ in range(3):
+            await bucket.acquire('search')
+        self.assertEqual([call.args[-2:] for call in self.redis.eval.await_args_list], [(1, 1)] * 3)
+
+    async def test_endpoint_cost(self):
+        bucket = DistributedTokenBucket(per_hour=3600, capacity=10, local_burst=1)
+        self.redis.eval.return_value = [2, 0]
+        await bucket.acquire('recommendations')
+        self.assertEqual(self.redis.eval.await_args.args[-1], endpoint_cost('recommendations'))
+
+    async def test_waits_for_refill(self):
+        bucket = DistributedTokenBucket(per_hour=3600, capacity=10, local_burst=1)
+        self.redis.eval.side_effect = [[0, 20], [1, 0]]
+        with patch('spotify_service.spotify.quota.asyncio.sleep', AsyncMock()) as sleep:
+            await bucket.acquire('search')
+        sleep.assert_awaited_once_with(0.02)
+
+    async def test_gives_up_after_max_wait(self):
+        bucket = DistributedTokenBucket(per_hour=3600, capacity=10, local_burst=1, max_wait=1)
+        self.redis.eval.return_value = [0, 5000]
+        with self.assertRaises(SpotifyException) as ctx:
+            await bucket.acquire('search')
+        self.assertEqual(ctx.exception.http_status, 429)
+
+    async def test_pause_is_shared_and_honored_locally(self):
+        bucket = DistributedTokenBucket(per_hour=3600, capacity=10, local_burst=1)
+        await bucket.pause(30)
+
+        self.redis.set.assert_awaited_once()
+        self.assertEqual(self.redis.set.await_args.kwargs['px'], 30000)
+        self.assertTrue(bucket.is_paused())
+        self.assertGreater(await bucket._try_acquire(1), 29)
+        self.redis.eval.assert_not_called()
+
+    async def test_zero_pause_is_ignored(self):
+        bucket = DistributedTokenBucket(per_hour=3600, capacity=10, local_burst=1)
+        await bucket.pause(0)
+        self.redis.set.assert_not_called()
+        self.assertFalse(bucket.is_paused())
+
+    async def test_falls_back_when_redis_is_down(self):
+        bucket = DistributedTokenBucket(per_hour=3600, capacity=10, local_burst=1)
+        self.redis.eval.side_effect = ConnectionError("redis down")
+        await bucket.acquire('search')
+
+class TestRetryAfter(unittest.TestCase):
+    def test_reads_header_case_insensitively(self):
+        exc = SpotifyException(429, -1, "too many requests", headers={'retry-after': '7'})
+        self.assertEqual(retry_after_seconds(exc), 7)
+
+    def test_ignores_other_errors(self):
+        self.assertIsNone(retry_after_seconds(SpotifyException(404, -1, "not found")))
+        self.assertIsNone(retry_after_seconds(ValueError()))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+import sys
+import os
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import numpy as np
+from bot_service.bot.services.ranking import (feature_matrix, similarities, top_k, rank_tracks, rank_tracks_for_seeds,
+                                              mmr_select, DiversityStats)
+
+SEED = {'danceability': 0.5, 'energy': 0.5, 'valence': 0.5, 'acousticness': 0.5, 'instrumentalness': 0.0,
+        'tempo': 120.0, 'loudness': -8.0}
+
+class TestRanking(unittest.TestCase):
+    def test_matrix_is_contiguous_float32_in_unit_range(self):
+        matrix = feature_matrix([SEED, {'tempo': 400.0, 'loudness': -80.0}, None])
+        self.assertEqual(matrix.dtype, np.float32)
+        self.assertTrue(matrix.flags['C_CONTIGUOUS'])
+        self.assertEqual(matrix.shape, (3, 7))
+        self.assertTrue(((matrix >= 0) & (matrix <= 1)).all())
+        self.assertAlmostEqual(float(matrix[0, 5]), (120 - 50) / 150, places=5)
+
+    def test_tempo_and_loudness_count_after_normalization(self):
+        candidates = {
+            'same': dict(SEED),
+            'faster': dict(SEED, tempo=180.0),
+            'quieter': dict(SEED, loudness=-30.0),
+        }
+        self.assertEqual(rank_tracks(SEED, candidates, 3), ['same', 'quieter', 'faster'])
+
+    def test_matches_unweighted_mean_on_unit_features(self):
+        seed = feature_matrix([SEED])
+        other = feature_matrix([dict(SEED, energy=0.9)])
+        self.assertAlmostEqual(float(similarities(seed, other)[0, 0]), 1 - 0.4 / 6, places=5)
+
+    def test_top_k_orders_best_first(self):
+        scores = np.array([0.1, 0.9, 0.5, 0.7, 0.3], dtype=np.float32)
+        self.assertEqual(top_k(scores, 3).tolist(), [1, 3, 2])
+        self.assertEqual(top_k(scores, 10).tolist(), [1, 3, 2, 4, 0])
+        self.assertEqual(top_k(scores, 0).tolist(), [])
+
+    def test_batch_ranks_each_seed(self):
+        candidates = {'calm': dict(SEED, energy=0.1), 'loud': dict(SEED, energy=0.9)}
+        ranked = rank_tracks_for_seeds({'low': dict(SEED, energy=0.0), 'high': dict(SEED, energy=1.0)}, candidates, 1)
+        self.assertEqual(ranked, {'low': ['calm'], 'high': ['loud']})
+        self.assertEqual(rank_tracks(SEED, {}, 5), [])
+
+    def test_mmr_skips_near_duplicates(self):
+        candidates = {
+            'close': dict(SEED, energy=0.55),
+            'close-copy': dict(SEED, energy=0.56),
+            'different': dict(SEED, energy=0.3, valence=0.7),
+        }
+        self.assertEqual(rank_tracks(SEED, candidates, 2), ['close', 'close-copy'])
+        self.assertEqual(rank_tracks(SEED, candidates, 2, diversity=0.5), ['close', 'different'])
+        self.assertEqual(rank_tracks(SEED, {}, 2, diversity=0.5), [])
+
+    def test_mmr_without_diversity_is_top_k(self):
+        scores = np.array([0.1, 0.9, 0.5], dtype=np.float32)
+        matrix = feature_matrix([SEED] * 3)
+        self.assertEqual(mmr_select(scores, matrix, 2, diversity=0).tolist(), [1, 2])
+        self.assertEqual(sorted(mmr_select(scores, matrix, 5).tolist()), [0, 1, 2])
+
+    def test_streaming_stats_match_whole_playlist(self):
+        tracks = [dict(SEED, energy=e, tempo=t) for e, t in [(0.1, 90.0), (0.4, 120.0), (0.9, 150.0), (0.6, 100.0)]]
+        stats = DiversityStats()
+        stats.update(feature_matrix(tracks[:1]))
+        stats.update(feature_matrix(tracks[1:]))
+        report = stats.report()
+
+        energies = np.array([0.1, 0.4, 0.9, 0.6])
+        self.assertAlmostEqual(report['energy']['mean'], energies.mean(), places=5)
+        self.assertAlmostEqual(report['energy']['std'], energies.std(), places=5)
+        self.assertAlmostEqual(report['energy']['range'], 0.8, places=5)
+        self.assertAlmostEqual(report['tempo']['mean'], 115.0, places=3)
+        self.assertAlmostEqual(report['tempo']['range'], 60.0, places=3)
+        self.assertEqual(DiversityStats().report(), {})
+
+    def test_ranking_feeds_picked_rows_to_stats(self):
+        candidates = {'calm': dict(SEED, energy=0.2), 'loud': dict(SEED, energy=0.8), 'far': dict(SEED, energy=0.0, valence=1.0)}
+        stats = DiversityStats()
+        ranked = rank_tracks(SEED, candidates, 2, stats=stats)
+
+        self.assertEqual(ranked, rank_tracks(SEED, candidates, 2))
+        self.assertEqual(stats.count, 2)
+        self.assertAlmostEqual(stats.report()['energy']['mean'], 0.5, places=5)
+
+if __name__ == '__main__':
+    unittest.main()
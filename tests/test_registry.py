@@ -0,0 +1,102 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+import sys
+import os
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from bot_service.bot.services import registry
+from bot_service.bot.handlers import playlist
+
+EXISTING = {'name': 'Rock Genre Playlist (50 tracks)', 'link': 'https://open.spotify.com/playlist/p1', 'playlist_id': 'p1'}
+
+def callback_update():
+    update = MagicMock()
+    update.effective_user.id = 7
+    update.callback_query.inline_message_id = None
+    update.callback_query.edit_message_text = AsyncMock()
+    return update
+
+class TestRegistry(unittest.IsolatedAsyncioTestCase):
+    def test_key_carries_version_and_normalizes_type(self):
+        self.assertEqual(registry.registry_key('track', 'abc', 50), registry.registry_key('song', 'abc', 50))
+        self.assertTrue(registry.registry_key('genre', 'rock', 100).endswith(f":rock:100:v{registry.GENERATION_VERSION}"))
+
+    async def test_round_trip_with_freshness_window(self):
+        redis = AsyncMock()
+        with patch.object(registry, 'get_redis_pool', AsyncMock(return_value=redis)):
+            await registry.register_generated_playlist('genre', 'rock', 50, EXISTING['name'], EXISTING['link'], 'p1')
+            key, ttl, entry = redis.setex.await_args.args
+            self.assertEqual(ttl, registry.PLAYLIST_FRESHNESS)
+            redis.get.return_value = entry
+            self.assertEqual((await registry.find_generated_playlist('genre', 'rock', 50))['link'], EXISTING['link'])
+
+    async def test_redis_errors_read_as_misses(self):
+        with patch.object(registry, 'get_redis_pool', AsyncMock(side_effect=ConnectionError('down'))):
+            self.assertIsNone(await registry.find_generated_playlist('genre', 'rock', 50))
+
+class TestPlaylistReuse(unittest.IsolatedAsyncioTestCase):
+    async def test_repeat_request_gets_existing_playlist_without_a_job(self):
+        update = callback_update()
+        with patch.object(playlist, 'find_generated_playlist', AsyncMock(return_value=EXISTING)), \
+             patch.object(playlist, 'enqueue_job', AsyncMock()) as enqueue_job:
+            await playlist.create_playlist_with_count(update, MagicMock(user_data={}), 50, 'genre_rock')
+
+        enqueue_job.assert_not_awaited()
+        kwargs = update.callback_query.edit_message_text.await_args.kwargs
+        self.assertIn(EXISTING['link'], kwargs['text'])
+        self.assertEqual(kwargs['reply_markup'].inline_keyboard[0][0].callback_data, 'create_another_genre_rock')
+
+    async def test_fresh_variant_skips_the_registry(self):
+        update = callback_update()
+        with patch.object(playlist, 'find_generated_playlist', AsyncMock(return_value=EXISTING)) as find, \
+             patch.object(playlist, 'enqueue_job', AsyncMock(return_value=('queued', 'job1'))) as enqueue_job:
+            await playlist.create_playlist_with_count(update, MagicMock(user_data={}), 50, 'genre_rock', fresh=True)
+
+        find.assert_not_awaited()
+        self.assertTrue(enqueue_job.await_args.args[0]['fresh'])
+
+    async def test_worker_registers_what_it_built(self):
+        bot = MagicMock(edit_message_text=AsyncMock())
+        job = {'id': 'job1', 'user_id': 7, 'chat_id': 1, 'message_id': 2, 'data_type': 'genre', 'data_id': 'rock',
+               'track_count': 50, 'fresh': True}
+        tracks = [f"t{n}" for n in range(50)]
+        with patch.object(playlist, 'generate_playlist', AsyncMock(return_value=(EXISTING['name'], tracks))), \
+             patch.object(playlist, 'create_playlist_async', AsyncMock(return_value=EXISTING['link'])), \
+             patch.object(playlist, 'save_playlist', AsyncMock(return_value='p1')), \
+             patch.object(playlist, 'register_generated_playlist', AsyncMock()) as register:
+            await playlist.process_playlist_job(bot, job)
+
+        register.assert_awaited_once_with('genre', 'rock', 50, EXISTING['name'], EXISTING['link'], 'p1')
+
+    async def test_short_playlist_is_not_registered(self):
+        bot = MagicMock(edit_message_text=AsyncMock())
+        job = {'id': 'job1', 'user_id': 7, 'chat_id': 1, 'message_id': 2, 'data_type': 'genre', 'data_id': 'rock',
+               'track_count': 50, 'fresh': True}
+        with patch.object(playlist, 'generate_playlist', AsyncMock(return_value=(EXISTING['name'], ['t1']))), \
+             patch.object(playlist, 'create_playlist_async', AsyncMock(return_value=EXISTING['link'])), \
+             patch.object(playlist, 'save_playlist', AsyncMock(return_value='p1')) as save, \
+             patch.object(playlist, 'register_generated_playlist', AsyncMock()) as register:
+            await playlist.process_playlist_job(bot, job)
+
+        save.assert_awaited_once()
+        register.assert_not_awaited()
+
+    async def test_empty_result_fails_the_job(self):
+        bot = MagicMock(edit_message_text=AsyncMock())
+        job = {'id': 'job1', 'user_id': 7, 'chat_id': 1, 'message_id': 2, 'data_type': 'genre', 'data_id': 'rock',
+               'track_count': 50, 'fresh': True}
+        with patch.object(playlist, 'generate_playlist', AsyncMock(return_value=(EXISTING['name'], []))), \
+             patch.object(playlist, 'create_playlist_async', AsyncMock()) as create, \
+             patch.object(playlist, 'save_playlist', AsyncMock()) as save, \
+             patch.object(playlist, 'register_generated_playlist', AsyncMock()) as register:
+            with self.assertRaises(ValueError):
+                await playlist.process_playlist_job(bot, job)
+
+        create.assert_not_awaited()
+        save.assert_not_awaited()
+        register.assert_not_awaited()
+
+if __name__ == '__main__':
+    unittest.main()
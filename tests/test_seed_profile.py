@@ -0,0 +1,65 @@
+import unittest
+from unittest.mock import AsyncMock, patch
+import sys
+import os
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from spotipy.exceptions import SpotifyException
+from bot_service.bot.services import spotify as service
+
+METADATA = {'id': 'seed', 'name': 'Song', 'artist': 'Artist', 'artist_id': 'a1', 'album': 'Album',
+            'duration_ms': 1000, 'popularity': 60}
+FEATURES = {'danceability': 0.4, 'energy': 0.6, 'valence': 0.5, 'acousticness': 0.1, 'instrumentalness': 0.0}
+
+class TestSeedProfile(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.patches = {
+            'get_tracks_metadata': AsyncMock(return_value={'seed': METADATA}),
+            'get_audio_features_batch': AsyncMock(return_value={'seed': FEATURES}),
+            'cached_get_artist': AsyncMock(return_value={'genres': ['pop', 'dance pop', 'electropop']}),
+            'cached_spotify_search': AsyncMock(return_value={'tracks': {'items': [{'id': 'similar'}, {'id': 'other'}]}}),
+            'store_tracks_metadata': AsyncMock(),
+        }
+        for name, mock in self.patches.items():
+            patcher = patch.object(service, name, mock)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        # Build directly instead of through Redis
+        async def uncached(operation, cache_key, *args, **kwargs):
+            return await operation(*args)
+        patcher = patch.object(service, 'cached_operation', uncached)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_profile_has_everything_generation_needs(self):
+        profile = await service.get_seed_profile('seed')
+
+        self.assertEqual(profile['name'], 'Song')
+        self.assertEqual(profile['features'], FEATURES)
+        self.assertEqual(profile['genres'], ['pop', 'dance pop'])
+        self.assertEqual(profile['similar_track_ids'], ['similar'])
+        self.assertEqual(self.patches['cached_spotify_search'].await_args.args, ('track:Song artist:Artist', 'track', 2))
+        self.patches['store_tracks_metadata'].assert_awaited_once_with([{'id': 'similar'}, {'id': 'other'}])
+
+    async def test_unknown_track(self):
+        self.patches['get_tracks_metadata'].return_value = {}
+        with self.assertRaises(SpotifyException) as ctx:
+            await service.get_seed_profile('missing')
+        self.assertEqual(ctx.exception.http_status, 404)
+
+    async def test_song_playlist_uses_profile(self):
+        get_recommendations = AsyncMock(return_value=[f"track{n}" for n in range(10)])
+        with patch.object(service, 'get_recommendations', get_recommendations), \
+             patch.object(service, 'filter_and_rank_tracks', AsyncMock(side_effect=lambda seed, ids, count, features, stats=None: ids[:count])):
+            tracks = await service.create_playlist_from_song('seed', target_count=5)
+
+        self.assertEqual(tracks, [f"track{n}" for n in range(5)])
+        args, kwargs = get_recommendations.await_args_list[0]
+        self.assertEqual(args[:3], (['seed', 'similar'], ['a1'], ['pop', 'dance pop']))
+        self.assertEqual((kwargs['target_energy'], kwargs['min_popularity'], kwargs['max_popularity']), (0.6, 40, 80))
+        self.patches['cached_spotify_search'].assert_awaited_once()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+from unittest.mock import AsyncMock
+import asyncio
+import sys
+import os
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from spotify_service.spotify.singleflight import SingleFlight
+
+class TestSingleFlight(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrent_callers_share_one_call(self):
+        flight = SingleFlight()
+        calls = 0
+
+        async def load():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return {'tracks': calls}
+
+        results = await asyncio.gather(*[flight.do("spotify_search:x", load) for _ in range(10)])
+
+        self.assertEqual(calls, 1)
+        self.assertTrue(all(result == {'tracks': 1} for result in results))
+        self.assertEqual(flight.stats()['saved_calls'], 9)
+        self.assertEqual(flight.stats()['inflight'], 0)
+
+    async def test_errors_reach_every_caller(self):
+        flight = SingleFlight()
+
+        async def load():
+            await asyncio.sleep(0.01)
+            raise ValueError("spotify down")
+
+        results = await asyncio.gather(*[flight.do("k", load) for _ in range(3)], return_exceptions=True)
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+
+        # The key is released, so the next call loads again
+        async def ok():
+            return 1
+        self.assertEqual(await flight.do("k", ok), 1)
+
+    async def test_cancelled_leader_does_not_cancel_followers(self):
+        flight = SingleFlight()
+
+        async def load():
+            await asyncio.sleep(0.05)
+            return "value"
+
+        leader = asyncio.create_task(flight.do("k", load))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("k", load))
+        await asyncio.sleep(0)
+        leader.cancel()
+
+        self.assertEqual(await follower, "value")
+
+    async def test_waits_for_remote_leader(self):
+        flight = SingleFlight(poll_interval=0.01)
+        redis = AsyncMock()
+        redis.set.return_value = False  # Another process holds the lease
+        redis.exists.return_value = True
+        probe = AsyncMock(side_effect=[None, {'cached': True}])
+        load = AsyncMock()
+
+        result = await flight.do("k", load, redis=redis, probe=probe)
+
+        self.assertEqual(result, {'cached': True})
+        load.assert_not_called()
+        self.assertEqual(flight.stats()['remote_hits'], 1)
+
+    async def test_loads_after_remote_leader_gives_up(self):
+        flight = SingleFlight(poll_interval=0.01)
+        redis = AsyncMock()
+        redis.set.return_value = False
+        redis.exists.return_value = False
+        probe = AsyncMock(return_value=None)
+        load = AsyncMock(return_value="fresh")
+
+        self.assertEqual(await flight.do("k", load, redis=redis, probe=probe), "fresh")
+        load.assert_awaited_once()
+
+    async def test_leader_releases_lease(self):
+        flight = SingleFlight()
+        redis = AsyncMock()
+        redis.set.return_value = True
+        load = AsyncMock(return_value="fresh")
+
+        await flight.do("k", load, redis=redis, probe=AsyncMock())
+
+        redis.eval.assert_awaited_once()
+        self.assertEqual(redis.eval.await_args.args[2], "singleflight:k")
+
+if __name__ == '__main__':
+    unittest.main()
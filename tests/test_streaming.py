@@ -0,0 +1,112 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+import asyncio
+import sys
+import os
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from telegram.error import RetryAfter
+from bot_service.bot.services import spotify as service
+from bot_service.bot.services import jobs
+from bot_service.bot.handlers import playlist
+
+PROFILE = {'id': 'seed', 'name': 'Song', 'artist': 'Artist', 'artist_id': 'a1', 'popularity': 60,
+           'features': {'energy': 0.5}, 'genres': ['pop'], 'similar_track_ids': []}
+
+class TestStreamingGeneration(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        rounds = iter(range(100))
+        self.get_recommendations = AsyncMock(side_effect=lambda *args, **kwargs: [f"track{next(rounds)}_{n}" for n in range(30)])
+        patches = [
+            patch.object(service, 'get_seed_profile', AsyncMock(return_value=PROFILE)),
+            patch.object(service, 'get_recommendations', self.get_recommendations),
+            patch.object(service, 'filter_and_rank_tracks', AsyncMock(side_effect=lambda seed, ids, count, features, stats=None: ids[:count])),
+            patch.object(service, 'remember_candidates', AsyncMock()),
+            patch.object(service.spotify_quota, 'is_paused', return_value=False),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def test_batches_arrive_as_rounds_finish(self):
+        batches = [batch async for batch in service.stream_playlist_from_song('seed', target_count=50)]
+
+        self.assertGreater(len(batches), 1)
+        self.assertLessEqual(len(batches[0]), service.STREAM_FIRST_BATCH)
+        tracks = [track for batch in batches for track in batch]
+        self.assertEqual(len(tracks), 50)
+        self.assertEqual(len(tracks), len(set(tracks)))
+
+    async def test_single_batch_without_progressive(self):
+        batches = [batch async for batch in service.stream_playlist_from_song('seed', target_count=50, progressive=False)]
+        self.assertEqual([len(batch) for batch in batches], [50])
+
+    async def test_stopping_early_cancels_outstanding_rounds(self):
+        cancelled = []
+
+        async def run_round(i):
+            try:
+                await asyncio.sleep(0 if i == 0 else 10)
+            except asyncio.CancelledError:
+                cancelled.append(i)
+                raise
+            return [f"track{i}"]
+
+        stream = service.stream_rounds(run_round, target_count=10, max_rounds=3, round_yield=1)
+        self.assertEqual(await stream.__anext__(), ['track0'])
+        await stream.aclose()
+        await asyncio.sleep(0)
+        self.assertEqual(sorted(cancelled), [1, 2])
+
+class TestStreamingDelivery(unittest.IsolatedAsyncioTestCase):
+    async def test_link_goes_out_with_the_first_batch(self):
+        async def stream(*args, **kwargs):
+            yield ['t1', 't2']
+            yield ['t3']
+
+        bot = MagicMock(edit_message_text=AsyncMock())
+        job = jobs.new_job(7, 'song:seed:3', chat_id=100, message_id=200, data_type='song', data_id='seed',
+                           track_count=3, language='en')
+        link = 'https://open.spotify.com/playlist/p1'
+        with patch.object(playlist, 'stream_playlist_from_song', stream), \
+             patch.object(playlist, 'get_seed_profile', AsyncMock(return_value=PROFILE)), \
+             patch.object(playlist, 'find_generated_playlist', AsyncMock(return_value=None)), \
+             patch.object(playlist, 'register_generated_playlist', AsyncMock()), \
+             patch.object(playlist, 'create_playlist_async', AsyncMock(return_value=link)) as create, \
+             patch.object(playlist, 'extend_playlist_async', AsyncMock()) as extend, \
+             patch.object(playlist, 'save_playlist', AsyncMock()) as save:
+            await playlist.process_playlist_job(bot, job)
+
+        create.assert_awaited_once_with("Playlist inspired by Song (3 tracks)", ['t1', 't2'])
+        extend.assert_awaited_once_with(link, ['t3'])
+        texts = [call.kwargs['text'] for call in bot.edit_message_text.await_args_list]
+        self.assertIn(playlist.get_text({}, 'playlist_progress_streaming').format(link, 2, 3), texts)
+        self.assertEqual(save.await_args.args[-1], ['t1', 't2', 't3'])
+
+    async def test_progress_edits_are_throttled_and_never_fail_the_job(self):
+        async def stream(*args, **kwargs):
+            for n in range(4):
+                yield [f"t{n}"]
+
+        bot = MagicMock(edit_message_text=AsyncMock(side_effect=RetryAfter(5)))
+        job = jobs.new_job(7, 'song:seed:4', chat_id=100, message_id=200, data_type='song', data_id='seed',
+                           track_count=4, language='en')
+        with patch.object(playlist, 'stream_playlist_from_song', stream), \
+             patch.object(playlist, 'get_seed_profile', AsyncMock(return_value=PROFILE)), \
+             patch.object(playlist, 'find_generated_playlist', AsyncMock(return_value=None)), \
+             patch.object(playlist, 'register_generated_playlist', AsyncMock()) as register, \
+             patch.object(playlist, 'create_playlist_async', AsyncMock(return_value='https://open.spotify.com/playlist/p1')), \
+             patch.object(playlist, 'extend_playlist_async', AsyncMock()) as extend, \
+             patch.object(playlist, 'save_playlist', AsyncMock()) as save:
+            await playlist.process_playlist_job(bot, job)
+
+        self.assertEqual(extend.await_count, 3)
+        save.assert_awaited_once()
+        register.assert_awaited_once()
+        texts = [call.kwargs['text'] for call in bot.edit_message_text.await_args_list]
+        self.assertEqual(sum('added so far' in text for text in texts), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+from unittest.mock import AsyncMock, patch
+import sys
+import os
+
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from spotify_service.spotify import warmup
+
+class TestWarmCache(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.redis = AsyncMock()
+        self.redis.exists.return_value = 0
+        patcher = patch.object(warmup, 'get_redis_pool', AsyncMock(return_value=self.redis))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_rebuilds_calls_from_cache_keys(self):
+        self.assertEqual(warmup._key_candidate('spotify_search:a:b c:track:10', 4)[2], 1)
+        self.assertEqual(warmup._key_candidate('recommendations:t1,t2:100', 4)[2], 2)
+        self.assertIsNone(warmup._key_candidate('spotify_search:broken', 4))
+        self.assertIsNone(warmup._key_candidate('swr_refresh:artist:1', 4))
+
+    async def test_most_valuable_first_within_budget(self):
+        warmed = []
+
+        def candidate(name, value, cost):
+            async def warm():
+                warmed.append(name)
+            return warmup._candidate(value, cost, name, warm, f"artist:{name}")
+
+        candidates = [candidate('rare', 1, 1), candidate('popular', 50, 1), candidate('pricey', 60, 2)]
+        with patch.object(warmup, '_collect_candidates', AsyncMock(return_value=candidates)):
+            stats = await warmup.warm_cache(budget=3)
+
+        self.assertEqual(warmed, ['popular', 'pricey'])
+        self.assertEqual(stats['spent'], 3)
+
+    async def test_skips_entries_already_cached(self):
+        warm = AsyncMock()
+        candidates = [warmup._candidate(10, 1, 'cached', warm, 'artist:cached')]
+        self.redis.exists.return_value = 1
+        with patch.object(warmup, '_collect_candidates', AsyncMock(return_value=candidates)):
+            stats = await warmup.warm_cache(budget=10)
+
+        warm.assert_not_awaited()
+        self.assertEqual((stats['skipped'], stats['spent']), (1, 0))
+
+    async def test_stops_while_spotify_is_paused(self):
+        warm = AsyncMock()
+        candidates = [warmup._candidate(10, 1, 'artist', warm, 'artist:1')]
+        with patch.object(warmup, '_collect_candidates', AsyncMock(return_value=candidates)), \
+             patch.object(warmup.spotify_quota, 'is_paused', return_value=True):
+            await warmup.warm_cache(budget=10)
+        warm.assert_not_awaited()
+
+if __name__ == '__main__':
+    unittest.main()